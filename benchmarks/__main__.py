@@ -0,0 +1,110 @@
+import argparse
+import sys
+
+from benchmarks.generator import RegistrySpec
+from benchmarks.suite import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SIZES,
+    BenchmarkSuite,
+    compare_results,
+    read_results,
+    write_results,
+)
+from tricount_extractor.saver import EXCEL_WRITERS, OUTPUT_FORMATS
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the registry export on synthetic registries",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and save the results")
+    run.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=DEFAULT_SIZES,
+        help="Registry sizes, in entries (default: 100 to 1M)",
+    )
+    run.add_argument("-o", "--output", required=True, help="Result JSON file")
+    run.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    run.add_argument("--members", type=int, default=RegistrySpec.members)
+    run.add_argument(
+        "--allocations-per-entry", type=int, default=RegistrySpec.allocations_per_entry
+    )
+    run.add_argument(
+        "--attachments-per-entry",
+        type=float,
+        default=RegistrySpec.attachments_per_entry,
+        help="Mean attachment count per entry",
+    )
+    run.add_argument(
+        "--currencies",
+        nargs="+",
+        default=list(RegistrySpec.currencies),
+        help="Currencies of the entries, the first one is the registry currency",
+    )
+    run.add_argument("--seed", type=int, default=RegistrySpec.seed)
+    run.add_argument(
+        "--format",
+        nargs="+",
+        choices=OUTPUT_FORMATS,
+        default=["xlsx"],
+        help="Output formats to save (default: xlsx)",
+    )
+    run.add_argument("--excel-writer", choices=list(EXCEL_WRITERS), default="openpyxl")
+    run.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help="Entries per page served to the Processor",
+    )
+
+    compare = commands.add_parser(
+        "compare", help="Compare the median timings of two result files"
+    )
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=1.1,
+        help="Slowdown ratio reported as a regression (default: 1.1)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.command == "compare":
+        lines, has_regression = compare_results(
+            read_results(args.baseline),
+            read_results(args.current),
+            threshold=args.threshold,
+        )
+        print("\n".join(lines))
+        return 1 if has_regression else 0
+
+    spec = RegistrySpec(
+        members=args.members,
+        allocations_per_entry=args.allocations_per_entry,
+        attachments_per_entry=args.attachments_per_entry,
+        currencies=tuple(args.currencies),
+        seed=args.seed,
+    )
+    suite = BenchmarkSuite(
+        spec=spec,
+        repeat=args.repeat,
+        output_formats=args.format,
+        excel_writer=args.excel_writer,
+        page_size=args.page_size,
+    )
+    results = suite.run(args.sizes)
+    write_results(args.output, suite.metadata(), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
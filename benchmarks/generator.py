@@ -0,0 +1,195 @@
+import datetime
+import itertools
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+REGISTRY_URL = "/v1/user/uid/registry"
+CATEGORIES = ["FOOD", "TRANSPORT", "ACCOMMODATION", "SHOPPING", "OTHER"]
+DESCRIPTIONS = ["Groceries", "Dinner", "Train tickets", "Hotel", "Taxi", "Museum"]
+EXCHANGE_RATES = {"EUR": 1.0, "USD": 1.08, "GBP": 0.85, "JPY": 162.0, "CHF": 0.95}
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+START_DATE = datetime.datetime(2024, 1, 1)
+
+
+@dataclass(frozen=True)
+class RegistrySpec:
+    """Shape of a synthetic registry."""
+
+    entries: int = 1000
+    members: int = 8
+    allocations_per_entry: int = 3
+    attachments_per_entry: float = 0.2
+    currencies: tuple[str, ...] = ("EUR", "USD", "JPY")
+    reimbursement_ratio: float = 0.05
+    income_ratio: float = 0.02
+    seed: int = 0
+
+
+class RegistryGenerator:
+    """
+    Seeded generator of registry API responses.
+
+    The payloads follow the shape of the real API, the first currency is the
+    registry currency and the entries come newest first, like the API pages.
+    The same spec always gives the same payloads.
+    """
+
+    def __init__(self, spec: RegistrySpec, *, registry_id: int = 1):
+        if spec.allocations_per_entry > spec.members:
+            msg = "cannot allocate an entry to more members than the registry has"
+            raise ValueError(msg)
+        unknown = set(spec.currencies) - set(EXCHANGE_RATES)
+        if unknown:
+            msg = f"no exchange rate for currencies: {', '.join(sorted(unknown))}"
+            raise ValueError(msg)
+        self._spec = spec
+        self._registry_id = registry_id
+
+    def generate(self) -> dict:
+        """Whole registry in a single response."""
+        return self._to_response(list(self.iter_entries()), older_url=None)
+
+    def iter_pages(self, page_size: int) -> Iterator[dict]:
+        """Registry responses of `page_size` entries linked by `older_url`."""
+        batches = itertools.batched(self.iter_entries(), page_size)
+        page = next(batches, ())
+        page_index = 0
+        while True:
+            next_page = next(batches, None)
+            page_index += 1
+            older_url = None if next_page is None else self._page_url(page_index)
+            yield self._to_response(list(page), older_url=older_url)
+            if next_page is None:
+                return
+            page = next_page
+
+    def iter_entries(self) -> Iterator[dict]:
+        rng = random.Random(self._spec.seed)
+        members = self._memberships()
+        for index in range(self._spec.entries):
+            yield self._entry(rng, members, index)
+
+    def _to_response(self, entries: list[dict], *, older_url: str | None) -> dict:
+        registry = {
+            "id": self._registry_id,
+            "created": START_DATE.strftime(DATE_FORMAT),
+            "updated": self._date(0).strftime(DATE_FORMAT),
+            "uuid": f"registry-{self._registry_id}",
+            "currency": self._spec.currencies[0],
+            "title": f"Synthetic registry {self._registry_id}",
+            "memberships": self._memberships(with_status=True),
+            "all_registry_entry": entries,
+        }
+        return {
+            "Response": [{"Registry": registry}],
+            "Pagination": {
+                "future_url": None,
+                "newer_url": None,
+                "older_url": older_url,
+            },
+        }
+
+    @staticmethod
+    def _page_url(page_index: int) -> str:
+        return f"{REGISTRY_URL}?page={page_index}"
+
+    def _memberships(self, *, with_status: bool = False) -> list[dict]:
+        memberships = []
+        for index in range(self._spec.members):
+            name = f"Member {index}"
+            membership = {
+                "id": self._registry_id * 1000 + index,
+                "uuid": f"member-{self._registry_id}-{index}",
+                "alias": {
+                    "display_name": name,
+                    "pointer": {"type": "UUID", "value": f"m-{index}", "name": name},
+                },
+            }
+            if with_status:
+                membership["status"] = "ACTIVE"
+            memberships.append({"RegistryMembershipNonUser": membership})
+        return memberships
+
+    def _entry(self, rng: random.Random, members: list[dict], index: int) -> dict:
+        spec = self._spec
+        date = self._date(index).strftime(DATE_FORMAT)
+        local_currency = rng.choice(spec.currencies)
+        cents = rng.randint(100, 50_000)
+        draw = rng.random()
+        if draw < spec.reimbursement_ratio:
+            type_transaction = "BALANCE"
+            participants = rng.sample(members, 1)
+        elif draw < spec.reimbursement_ratio + spec.income_ratio:
+            type_transaction = "INCOME"
+            participants = rng.sample(members, spec.allocations_per_entry)
+        else:
+            type_transaction = "NORMAL"
+            participants = rng.sample(members, spec.allocations_per_entry)
+
+        entry = {
+            "id": index + 1,
+            "uuid": f"entry-{self._registry_id}-{index}",
+            "created": date,
+            "date": date,
+            "description": f"{rng.choice(DESCRIPTIONS)} #{index}",
+            **self._amounts(cents, local_currency),
+            "status": "ACTIVE",
+            "type": "MANUAL",
+            "type_transaction": type_transaction,
+            "category": rng.choice(CATEGORIES),
+            "membership_owned": rng.choice(members),
+            "allocations": [
+                {
+                    **self._amounts(share, local_currency),
+                    "type": "RATIO",
+                    "share_ratio": 1,
+                    "membership": member,
+                }
+                for member, share in zip(participants, _split(cents, len(participants)))
+            ],
+            "attachment": self._attachments(rng, index),
+        }
+        if entry["category"] == "OTHER":
+            entry["category_custom"] = "Miscellaneous"
+        return {"RegistryEntry": entry}
+
+    def _amounts(self, cents: int, local_currency: str) -> dict:
+        currency = self._spec.currencies[0]
+        rate = EXCHANGE_RATES[local_currency] / EXCHANGE_RATES[currency]
+        return {
+            "amount": {"currency": currency, "value": f"{-cents / 100:.2f}"},
+            "amount_local": {
+                "currency": local_currency,
+                "value": f"{-cents * rate / 100:.2f}",
+            },
+        }
+
+    def _attachments(self, rng: random.Random, index: int) -> list[dict]:
+        mean = self._spec.attachments_per_entry
+        count = int(mean) + (rng.random() < mean - int(mean))
+        return [
+            {
+                "id": index * 10 + n,
+                "description": "",
+                "content_type": "image/jpeg",
+                "urls": [
+                    {
+                        "type": "ORIGINAL",
+                        "url": f"https://example.com/receipts/{index}-{n}.jpg",
+                    }
+                ],
+                "uuid": f"attachment-{self._registry_id}-{index}-{n}",
+            }
+            for n in range(count)
+        ]
+
+    def _date(self, index: int) -> datetime.datetime:
+        # newest entry first, one entry every ten minutes
+        newest = START_DATE + datetime.timedelta(minutes=10 * self._spec.entries)
+        return newest - datetime.timedelta(minutes=10 * index)
+
+
+def _split(cents: int, parts: int) -> list[int]:
+    share, remainder = divmod(cents, parts)
+    return [share + (1 if n < remainder else 0) for n in range(parts)]
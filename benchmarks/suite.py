@@ -0,0 +1,277 @@
+import contextlib
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+
+import httpx
+
+from benchmarks.generator import RegistryGenerator, RegistrySpec
+from tricount_extractor.main import Processor
+from tricount_extractor.models.columns import RegistryColumns
+from tricount_extractor.models.registry import Registry
+from tricount_extractor.saver import RegistrySaver
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_PAGE_SIZE = 1000
+REGISTRY_ID = "benchmark"
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    size: int
+    timings: list[float] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def best(self) -> float | None:
+        return min(self.timings) if self.timings else None
+
+    @property
+    def median(self) -> float | None:
+        return statistics.median(self.timings) if self.timings else None
+
+    def to_json(self) -> dict:
+        return {**asdict(self), "best": self.best, "median": self.median}
+
+    @classmethod
+    def from_json(cls, data: dict) -> BenchmarkResult:
+        return cls(
+            name=data["name"],
+            size=data["size"],
+            timings=data["timings"],
+            error=data.get("error"),
+        )
+
+
+class BenchmarkSuite:
+    """
+    Time each stage of the export on synthetic registries.
+
+    For each size, the stages run in order on the same registry:
+    `Registry.from_json`, the column pass, each `_to_*_dataframe`
+    transform, `RegistrySaver.save` for each output format, and the whole
+    `Processor` path against a mock transport serving paginated responses.
+    A stage that raises (e.g. a sheet over the Excel row limit) is recorded
+    with its error and the other stages still run.
+    """
+
+    def __init__(
+        self,
+        *,
+        spec: RegistrySpec = RegistrySpec(),
+        repeat: int = 3,
+        output_formats: Iterable[str] = ("xlsx",),
+        excel_writer: str = "openpyxl",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        log: Callable[[str], None] = print,
+    ):
+        if repeat < 1:
+            msg = f"repeat must be at least 1, got {repeat}"
+            raise ValueError(msg)
+        self._spec = spec
+        self._repeat = repeat
+        self._output_formats = list(output_formats)
+        self._excel_writer = excel_writer
+        self._page_size = page_size
+        self._log = log
+
+    def run(self, sizes: Iterable[int]) -> list[BenchmarkResult]:
+        results = []
+        for size in sizes:
+            results.extend(self.run_size(size))
+        return results
+
+    def run_size(self, size: int) -> list[BenchmarkResult]:
+        generator = RegistryGenerator(_with_entries(self._spec, size))
+        results = []
+
+        payload = generator.generate()
+        result, registry = self._time(
+            "registry.from_json", size, Registry.from_json, payload
+        )
+        results.append(result)
+        del payload
+        if registry is None:
+            return results
+
+        result, columns = self._time(
+            "registry.columns",
+            size,
+            RegistryColumns.from_entries,
+            registry.members,
+            registry.entries,
+        )
+        results.append(result)
+        if columns is not None:
+            results.append(
+                self._time("dataframe.members", size, registry._to_members_dataframe)[0]
+            )
+            for name in ("entries", "allocations", "attachments", "balance"):
+                transform = getattr(Registry, f"_to_{name}_dataframe")
+                results.append(
+                    self._time(f"dataframe.{name}", size, transform, columns)[0]
+                )
+            del columns
+
+        for output_format in self._output_formats:
+            saver = self._saver(output_format)
+            with tempfile.TemporaryDirectory() as folder:
+                results.append(
+                    self._time(
+                        f"saver.save.{output_format}",
+                        size,
+                        saver.save,
+                        registry,
+                        folder,
+                    )[0]
+                )
+        del registry
+
+        pages = [
+            json.dumps(page).encode("utf-8")
+            for page in generator.iter_pages(self._page_size)
+        ]
+        transport = httpx.MockTransport(_paginated_handler(pages))
+        for output_format in self._output_formats:
+            processor = Processor(saver=self._saver(output_format))
+            results.append(
+                self._time(
+                    f"processor.process.{output_format}",
+                    size,
+                    _process,
+                    processor,
+                    transport,
+                )[0]
+            )
+        return results
+
+    def _time(self, name: str, size: int, function: Callable, *args):
+        result = BenchmarkResult(name, size)
+        value = None
+        for _ in range(self._repeat):
+            start = time.perf_counter()
+            try:
+                value = function(*args)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                value = None
+                break
+            result.timings.append(time.perf_counter() - start)
+        self._log(_describe(result))
+        return result, value
+
+    def _saver(self, output_format: str) -> RegistrySaver:
+        return RegistrySaver(
+            output_format=output_format, excel_writer=self._excel_writer
+        )
+
+    def metadata(self) -> dict:
+        return {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now(datetime.UTC).isoformat(),
+            "repeat": self._repeat,
+            "excel_writer": self._excel_writer,
+            "page_size": self._page_size,
+            # the entry count is the size of each result
+            "spec": {k: v for k, v in asdict(self._spec).items() if k != "entries"},
+        }
+
+
+def write_results(path: str, metadata: dict, results: list[BenchmarkResult]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"metadata": metadata, "results": [r.to_json() for r in results]},
+            f,
+            indent=2,
+        )
+
+
+def read_results(path: str) -> list[BenchmarkResult]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [BenchmarkResult.from_json(r) for r in json.load(f)["results"]]
+
+
+def compare_results(
+    baseline: list[BenchmarkResult],
+    current: list[BenchmarkResult],
+    *,
+    threshold: float,
+) -> tuple[list[str], bool]:
+    """
+    Compare the median timings of two runs, return the report lines and
+    whether a benchmark got slower than `threshold` times its baseline.
+    """
+    baseline_by_key = {(r.name, r.size): r for r in baseline}
+    lines = []
+    has_regression = False
+    for result in current:
+        if (previous := baseline_by_key.get((result.name, result.size))) is None:
+            continue
+        if (previous.median is None) or (result.median is None):
+            lines.append(f"{result.name:<32} {result.size:>9}  error")
+            continue
+        ratio = result.median / previous.median
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            has_regression = True
+        lines.append(
+            f"{result.name:<32} {result.size:>9}  "
+            f"{previous.median:9.4f}s -> {result.median:9.4f}s  x{ratio:.2f}{flag}"
+        )
+    return lines, has_regression
+
+
+def _with_entries(spec: RegistrySpec, entries: int) -> RegistrySpec:
+    return RegistrySpec(**{**asdict(spec), "entries": entries})
+
+
+def _paginated_handler(pages: list[bytes]):
+    auth_response = {
+        "Response": [{"Token": {"token": "token"}}, {"UserPerson": {"id": "uid"}}]
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "session-registry-installation" in str(request.url):
+            return httpx.Response(200, json=auth_response)
+        page = int(request.url.params.get("page", "0"))
+        return httpx.Response(
+            200, content=pages[page], headers={"Content-Type": "application/json"}
+        )
+
+    return handler
+
+
+def _process(processor: Processor, transport: httpx.BaseTransport) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor.process([REGISTRY_ID], folder, transport=transport)
+
+
+def _describe(result: BenchmarkResult) -> str:
+    if result.error is not None:
+        return f"{result.name:<32} {result.size:>9}  error: {result.error}"
+    return (
+        f"{result.name:<32} {result.size:>9}  "
+        f"best {result.best:9.4f}s  median {result.median:9.4f}s"
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
@@ -0,0 +1,199 @@
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import IO
+
+DEFAULT_COMPRESSION = "zstd"
+INDEX_FILENAME = "index.json"
+
+
+def _open_gzip(path: pathlib.Path, mode: str) -> IO[bytes]:
+    return gzip.open(path, mode)
+
+
+def _open_zstd(path: pathlib.Path, mode: str) -> IO[bytes]:
+    # standard library from Python 3.14, when built with libzstd
+    from compression import zstd
+
+    return zstd.open(path, mode)
+
+
+COMPRESSIONS: dict[str, tuple[str, Callable[[pathlib.Path, str], IO[bytes]]]] = {
+    "zstd": (".json.zst", _open_zstd),
+    "gzip": (".json.gz", _open_gzip),
+}
+
+
+@dataclass(frozen=True)
+class ArchivedSnapshot:
+    id: int
+    fetched_at: str
+    updated: str | None
+    entries: int
+    new_entries: int
+
+    @classmethod
+    def from_json(cls, data: dict) -> ArchivedSnapshot:
+        return cls(
+            id=data["id"],
+            fetched_at=data["fetched_at"],
+            updated=data["updated"],
+            entries=data["entries"],
+            new_entries=data["new_entries"],
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "fetched_at": self.fetched_at,
+            "updated": self.updated,
+            "entries": self.entries,
+            "new_entries": self.new_entries,
+        }
+
+
+class RegistryArchive:
+    """
+    Compressed history of the raw registry responses, one folder per registry.
+
+    Each snapshot is a compressed file holding the fetched pages with their
+    entries replaced by references, and only the entry versions not archived
+    before. An entry version is keyed by the entry UUID and a hash of its
+    content, so an unchanged entry is stored once across all the snapshots.
+    `index.json` lists the snapshots and where each entry version is stored,
+    a snapshot is rebuilt from its file and the files holding its entries.
+    """
+
+    def __init__(
+        self, folder: str | pathlib.Path, *, compression: str = DEFAULT_COMPRESSION
+    ):
+        if compression not in COMPRESSIONS:
+            msg = f"unknown compression {compression}, expected one of {list(COMPRESSIONS)}"
+            raise ValueError(msg)
+        self._folder = pathlib.Path(folder)
+        self._compression = compression
+        self._locks: collections.defaultdict[str, threading.Lock] = (
+            collections.defaultdict(threading.Lock)
+        )
+        self._locks_lock = threading.Lock()
+
+    def add(self, registry_id: str, pages: list[dict]) -> ArchivedSnapshot:
+        """Archive the pages of a registry fetch as its next snapshot."""
+        with self._lock(registry_id):
+            index = self._load_index(registry_id)
+            snapshot_id = len(index["snapshots"]) + 1
+            locations: dict[str, int] = index["entries"]
+            new_entries: dict[str, dict] = {}
+            stored_pages = []
+            entry_count = 0
+            for page in pages:
+                refs = []
+                for entry in _registry(page).get("all_registry_entry", []):
+                    key = _entry_key(entry)
+                    if key not in locations:
+                        locations[key] = snapshot_id
+                        new_entries[key] = entry
+                    refs.append([key, locations[key]])
+                entry_count += len(refs)
+                stored_pages.append(_with_entries(page, refs))
+
+            snapshot = ArchivedSnapshot(
+                id=snapshot_id,
+                fetched_at=datetime.datetime.now(datetime.UTC).isoformat(),
+                updated=_registry(pages[0]).get("updated") if pages else None,
+                entries=entry_count,
+                new_entries=len(new_entries),
+            )
+            suffix, open_file = COMPRESSIONS[self._compression]
+            path = self._registry_folder(registry_id) / f"{snapshot_id:06d}{suffix}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open_file(path, "wb") as f:
+                content = {
+                    "snapshot": snapshot.to_json(),
+                    "pages": stored_pages,
+                    "entries": new_entries,
+                }
+                f.write(json.dumps(content, separators=(",", ":")).encode("utf-8"))
+            index["snapshots"].append(snapshot.to_json())
+            self._save_index(registry_id, index)
+            return snapshot
+
+    def snapshots(self, registry_id: str) -> list[ArchivedSnapshot]:
+        with self._lock(registry_id):
+            index = self._load_index(registry_id)
+        return [ArchivedSnapshot.from_json(s) for s in index["snapshots"]]
+
+    def rebuild(self, registry_id: str, snapshot_id: int | None = None) -> list[dict]:
+        """Return the pages of a snapshot as fetched, the last one by default."""
+        snapshots = self.snapshots(registry_id)
+        if not snapshots:
+            msg = f"no archived snapshot of registry {registry_id}"
+            raise KeyError(msg)
+        if snapshot_id is None:
+            snapshot_id = snapshots[-1].id
+        loaded = {snapshot_id: self._read_snapshot(registry_id, snapshot_id)}
+        pages = []
+        for page in loaded[snapshot_id]["pages"]:
+            entries = []
+            for key, location in _registry(page)["all_registry_entry"]:
+                if location not in loaded:
+                    loaded[location] = self._read_snapshot(registry_id, location)
+                entries.append(loaded[location]["entries"][key])
+            pages.append(_with_entries(page, entries))
+        return pages
+
+    def _read_snapshot(self, registry_id: str, snapshot_id: int) -> dict:
+        folder = self._registry_folder(registry_id)
+        for suffix, open_file in COMPRESSIONS.values():
+            path = folder / f"{snapshot_id:06d}{suffix}"
+            if path.exists():
+                with open_file(path, "rb") as f:
+                    return json.loads(f.read())
+        msg = f"snapshot {snapshot_id} of registry {registry_id} is not archived"
+        raise KeyError(msg)
+
+    def _load_index(self, registry_id: str) -> dict:
+        path = self._registry_folder(registry_id) / INDEX_FILENAME
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"snapshots": [], "entries": {}}
+
+    def _save_index(self, registry_id: str, index: dict) -> None:
+        path = self._registry_folder(registry_id) / INDEX_FILENAME
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def _registry_folder(self, registry_id: str) -> pathlib.Path:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in registry_id)
+        return self._folder / safe_id
+
+    def _lock(self, registry_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[registry_id]
+
+
+def _registry(page: dict) -> dict:
+    return page["Response"][0]["Registry"]
+
+
+def _with_entries(page: dict, entries: list) -> dict:
+    response = page["Response"]
+    registry = {**response[0]["Registry"], "all_registry_entry": entries}
+    return {**page, "Response": [{**response[0], "Registry": registry}, *response[1:]]}
+
+
+def _entry_key(entry: dict) -> str:
+    entry_uuid = entry.get("RegistryEntry", entry)["uuid"]
+    content = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+    return f"{entry_uuid}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
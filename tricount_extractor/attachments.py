@@ -0,0 +1,221 @@
+import asyncio
+import collections
+import hashlib
+import json
+import mimetypes
+import os
+import pathlib
+import re
+import uuid
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+import httpx
+
+from tricount_extractor.instrumentation import NO_INSTRUMENTATION, Instrumentation
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = httpx.Timeout(30.0)
+INDEX_FILENAME = "index.json"
+SUFFIX_PATTERN = re.compile(r"^\.[A-Za-z0-9]{1,5}$")
+
+
+@dataclass(frozen=True)
+class StoredAttachment:
+    sha256: str
+    path: str
+    size: int
+
+    @classmethod
+    def from_json(cls, data: dict) -> StoredAttachment:
+        return cls(sha256=data["sha256"], path=data["path"], size=data["size"])
+
+    def to_json(self) -> dict:
+        return {"sha256": self.sha256, "path": self.path, "size": self.size}
+
+
+class AttachmentStore:
+    """
+    Folder of attachment files named by the SHA-256 of their content.
+
+    Files with the same content are stored once, whatever their URL or
+    registry. `index.json` maps each downloaded URL to its file, a URL whose
+    file is still there is not downloaded again.
+    """
+
+    def __init__(self, folder: str | pathlib.Path):
+        self._folder = pathlib.Path(folder)
+        self._index = self._load()
+        self._by_hash = {stored.sha256: stored for stored in self._index.values()}
+        self._changed = False
+
+    def get(self, url: str) -> StoredAttachment | None:
+        if (stored := self._index.get(url)) is None:
+            return None
+        if not self.path_of(stored).exists():
+            return None
+        return stored
+
+    def path_of(self, stored: StoredAttachment) -> pathlib.Path:
+        return self._folder / stored.path
+
+    def temp_path(self) -> pathlib.Path:
+        folder = self._folder / "tmp"
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder / uuid.uuid4().hex
+
+    def add(
+        self, url: str, tmp_path: pathlib.Path, sha256: str, size: int, suffix: str
+    ) -> StoredAttachment:
+        """Move a downloaded file in place, unless its content is already stored."""
+        stored = self._by_hash.get(sha256)
+        if (stored is None) or not self.path_of(stored).exists():
+            stored = StoredAttachment(
+                sha256=sha256, path=f"{sha256[:2]}/{sha256}{suffix}", size=size
+            )
+            path = self.path_of(stored)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            self._by_hash[sha256] = stored
+        else:
+            tmp_path.unlink()
+        self._index[url] = stored
+        self._changed = True
+        return stored
+
+    def save(self) -> None:
+        if not self._changed:
+            return
+        path = self._folder / INDEX_FILENAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({url: s.to_json() for url, s in self._index.items()}, f)
+        os.replace(tmp_path, path)
+        self._changed = False
+
+    def _load(self) -> dict[str, StoredAttachment]:
+        try:
+            with open(self._folder / INDEX_FILENAME, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {url: StoredAttachment.from_json(s) for url, s in data.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+
+@dataclass
+class DownloadReport:
+    downloaded: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+class AttachmentDownloader:
+    """
+    Download attachment URLs into an `AttachmentStore`.
+
+    At most `concurrency` downloads run at once, and at most `per_host` of
+    them against the same host. The URLs already in the store are skipped, a
+    failed download is reported and tried again on the next call.
+    """
+
+    def __init__(
+        self,
+        store: AttachmentStore,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        per_host: int = DEFAULT_PER_HOST,
+        transport: httpx.AsyncBaseTransport | None = None,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        self._store = store
+        self._concurrency = concurrency
+        self._per_host = per_host
+        self._transport = transport
+        self._instrumentation = instrumentation
+
+    def download(self, urls: Iterable[str] | Mapping[str, str]) -> DownloadReport:
+        """
+        Download the URLs not stored yet.
+
+        `urls` can map each URL to the registry ID it comes from, its outcome
+        is then counted for that registry.
+        """
+        return asyncio.run(self.adownload(urls))
+
+    async def adownload(
+        self, urls: Iterable[str] | Mapping[str, str]
+    ) -> DownloadReport:
+        sources = dict(urls) if isinstance(urls, Mapping) else dict.fromkeys(urls)
+        report = DownloadReport()
+        pending = []
+        for url in sources:
+            if self._store.get(url) is not None:
+                report.skipped.append(url)
+                self._count("attachments_skipped", sources[url])
+                continue
+            pending.append(url)
+
+        slots = asyncio.Semaphore(self._concurrency)
+        host_slots: collections.defaultdict[str, asyncio.Semaphore] = (
+            collections.defaultdict(lambda: asyncio.Semaphore(self._per_host))
+        )
+        async with httpx.AsyncClient(
+            transport=self._transport,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=self._concurrency),
+            follow_redirects=True,
+        ) as client:
+
+            async def download_one(url: str) -> None:
+                # wait for the host before taking a slot, so the downloads
+                # from a busy host do not hold the slots of the others
+                async with host_slots[httpx.URL(url).host], slots:
+                    try:
+                        await self._download(client, url)
+                    except (httpx.HTTPError, OSError) as e:
+                        report.failed[url] = f"{type(e).__name__}: {e}"
+                        self._count("attachments_failed", sources[url])
+                        return
+                report.downloaded.append(url)
+                self._count("attachments_downloaded", sources[url])
+
+            try:
+                await asyncio.gather(*(download_one(url) for url in pending))
+            finally:
+                self._store.save()
+        return report
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> None:
+        tmp_path = self._store.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with self._instrumentation.stage("attachments"):
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    with open(tmp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            digest.update(chunk)
+                            f.write(chunk)
+                            size += len(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        suffix = _suffix(url, response.headers.get("Content-Type"))
+        self._store.add(url, tmp_path, digest.hexdigest(), size, suffix)
+
+    def _count(self, name: str, registry_id: str | None) -> None:
+        self._instrumentation.count(name, 1, registry_id)
+
+
+def _suffix(url: str, content_type: str | None) -> str:
+    suffix = pathlib.PurePosixPath(httpx.URL(url).path).suffix
+    if SUFFIX_PATTERN.match(suffix):
+        return suffix.lower()
+    if content_type is not None:
+        guessed = mimetypes.guess_extension(content_type.split(";")[0].strip())
+        if guessed is not None:
+            return guessed
+    return ""
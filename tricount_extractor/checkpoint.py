@@ -0,0 +1,81 @@
+import datetime
+import json
+import os
+import pathlib
+import threading
+from collections.abc import Iterable, Iterator
+
+DONE = "done"
+FAILED = "failed"
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON lines file recording the outcome of each registry of a
+    batch.
+
+    Each line holds a registry ID, its status (`done` or `failed`), the error
+    of a failure and when it was recorded. Lines are flushed to disk as they
+    are appended, so a crashed batch keeps every outcome recorded before the
+    crash. When an ID appears several times, its last line wins.
+    """
+
+    def __init__(self, path: str | pathlib.Path):
+        self._path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._statuses = self._load()
+
+    def reset(self) -> None:
+        """Start a new batch, forgetting the recorded outcomes."""
+        with self._lock:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._path.write_text("", encoding="utf-8")
+            self._statuses = {}
+
+    def status(self, registry_id: str) -> str | None:
+        with self._lock:
+            return self._statuses.get(registry_id)
+
+    def remaining(self, registry_ids: Iterable[str]) -> Iterator[str]:
+        """Yield the IDs not done yet, failed ones included."""
+        for registry_id in registry_ids:
+            if self.status(registry_id) != DONE:
+                yield registry_id
+
+    def record_done(self, registry_id: str) -> None:
+        self._append(registry_id, DONE, None)
+
+    def record_failed(self, registry_id: str, error: str) -> None:
+        self._append(registry_id, FAILED, error)
+
+    def _append(self, registry_id: str, status: str, error: str | None) -> None:
+        line = json.dumps(
+            {
+                "registry_id": registry_id,
+                "status": status,
+                "error": error,
+                "recorded_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            }
+        )
+        with self._lock:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(f"{line}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._statuses[registry_id] = status
+
+    def _load(self) -> dict[str, str]:
+        statuses: dict[str, str] = {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        statuses[record["registry_id"]] = record["status"]
+                    except (ValueError, KeyError, TypeError):
+                        # a line cut short by a crash
+                        continue
+        except OSError:
+            return {}
+        return statuses
@@ -0,0 +1,318 @@
+import asyncio
+import itertools
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial, wraps
+from typing import ParamSpec, TypeVar
+
+import httpx
+
+from tricount_extractor.client.client import (
+    ACCESS_TOKEN_URL,
+    DEFAULT_TIMEOUT,
+    MAX_RETRY,
+    RETRIED_EXCEPTIONS,
+    AccessToken,
+    BaseTricountClient,
+    ConnectionStats,
+)
+from tricount_extractor.client.retry import RetryPolicy
+from tricount_extractor.client.throttle import ConcurrencyGate, Throttle
+from tricount_extractor.client.session_cache import SessionCache
+from tricount_extractor.instrumentation import NO_INSTRUMENTATION, Instrumentation
+
+DEFAULT_CONCURRENCY = 10
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def async_retry_on_transient_error(
+    method: Callable[P, Awaitable[R]],
+) -> Callable[P, Awaitable[R]]:
+    @wraps(method)
+    async def wrapper(self, *args: P.args, **kwargs: P.kwargs) -> R:
+        for attempt in itertools.count():
+            if (wait := self._before_attempt(attempt)) > 0:
+                with self._instrumentation.stage("throttle"):
+                    await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                result = await method(self, *args, **kwargs)
+            except RETRIED_EXCEPTIONS as exc:
+                self._record_attempt(time.perf_counter() - start, exc)
+                await asyncio.sleep(self._retry_delay(exc, attempt))
+                continue
+            self._record_attempt(time.perf_counter() - start)
+            return result
+        raise AssertionError("unreachable")
+
+    return wrapper
+
+
+class AsyncTricountClient(BaseTricountClient):
+    """
+    Asyncio counterpart of `TricountClient`.
+
+    At most `concurrency` registry requests are in flight at once, the other
+    callers wait for a slot. The number of slots is adapted by a `Throttle`:
+    it starts at `concurrency`, halves when the API throttles the requests and
+    grows back while they are healthy, as does the `max_rate` requests per
+    second when set. One `httpx.AsyncClient` is shared by all the
+    requests made inside the `async with` block.
+    """
+
+    def __init__(
+        self,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        max_retry: int = MAX_RETRY,
+        retry_policy: RetryPolicy | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_rate: float | None = None,
+        http2: bool = False,
+        session_cache: SessionCache | None = None,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        if concurrency < 1:
+            msg = f"concurrency must be at least 1, got {concurrency}"
+            raise ValueError(msg)
+        super().__init__(
+            max_retry=max_retry,
+            retry_policy=retry_policy,
+            throttle=Throttle(max_concurrency=concurrency, max_rate=max_rate),
+            session_cache=session_cache,
+            instrumentation=instrumentation,
+        )
+        self._transport = transport
+        self._concurrency = concurrency
+        self._http2 = http2
+
+        self._slots = ConcurrencyGate(lambda: self._throttle.concurrency_limit)
+        self._auth_lock = asyncio.Lock()
+        self._client: httpx.AsyncClient | None = None
+        self._connection_stats = ConnectionStats()
+
+    async def _aon_response(self, response: httpx.Response) -> None:
+        self._on_response(response)
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=self._concurrency),
+            http2=self._http2,
+            event_hooks={
+                "request": [self._connection_stats.aon_request],
+                "response": [self._aon_response],
+            },
+        )
+        try:
+            if not self._restore_session():
+                await self._authenticate()
+        except BaseException:
+            await self._client.aclose()
+            self._client = None
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._access_token = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        return None
+
+    @property
+    def connection_stats(self) -> ConnectionStats:
+        return self._connection_stats
+
+    async def get_registry(self, registry_id: str) -> httpx.Response:
+        async with self._slots:
+            try:
+                return await self._get_registry(registry_id)
+            except httpx.HTTPStatusError as exc:
+                if not self._should_reauthenticate(exc):
+                    raise
+            await self._reauthenticate()
+            return await self._get_registry(registry_id)
+
+    async def iter_registry_pages(
+        self, registry_id: str, *, prefetch: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Yield the decoded registry pages, following `Pagination.older_url`.
+
+        With `prefetch`, the next page is requested while the caller handles
+        the current one. At most two pages are held at once.
+        """
+        data = self._decode_json(await self.get_registry(registry_id))
+        async for page in self._iter_pages(data, "older_url", prefetch=prefetch):
+            yield page
+
+    async def stream_registry_pages(
+        self,
+        registry_id: str,
+        add_page: Callable[[AsyncIterator[bytes]], Awaitable[dict]],
+    ) -> None:
+        """
+        Hand the body of each registry page to `add_page` as it is received,
+        following `Pagination.older_url`.
+
+        `add_page` consumes the body chunks and returns the decoded page, at
+        least its `Pagination`. A page is retried as a whole: on a transient
+        error while it is opened or read, `add_page` is called again with the
+        chunks of a new response and must start the page over.
+        """
+        async with self._slots:
+            data = await self._with_reauthentication(
+                partial(self._stream_registry, registry_id, add_page)
+            )
+        while (next_url := self._next_page_url(data)) is not None:
+            async with self._slots:
+                data = await self._with_reauthentication(
+                    partial(self._stream_page, next_url, None, add_page)
+                )
+
+    async def iter_newer_pages(
+        self, url: str, *, prefetch: bool = False
+    ) -> AsyncIterator[dict]:
+        """Yield the decoded pages from `url`, following `Pagination.newer_url`."""
+        try:
+            data = await self._get_page_data(url)
+        except httpx.HTTPStatusError as exc:
+            if not self._should_reauthenticate(exc):
+                raise
+            await self._reauthenticate()
+            data = await self._get_page_data(url)
+        async for page in self._iter_pages(data, "newer_url", prefetch=prefetch):
+            yield page
+
+    async def _with_reauthentication(self, fetch: Callable[[], Awaitable[R]]) -> R:
+        """Await `fetch`, once more after a new authentication if the token expired."""
+        try:
+            return await fetch()
+        except httpx.HTTPStatusError as exc:
+            if not self._should_reauthenticate(exc):
+                raise
+        await self._reauthenticate()
+        return await fetch()
+
+    async def _iter_pages(
+        self, data: dict, direction: str, *, prefetch: bool
+    ) -> AsyncIterator[dict]:
+        while True:
+            next_url = self._next_page_url(data, direction)
+            next_page = None
+            if prefetch and (next_url is not None):
+                next_page = asyncio.create_task(self._get_page_data(next_url))
+            try:
+                yield data
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+            if next_url is None:
+                return
+            if next_page is not None:
+                data = await next_page
+            else:
+                data = await self._get_page_data(next_url)
+
+    async def _get_page_data(self, url: str) -> dict:
+        async with self._slots:
+            return await self._get_page_data_with_retry(url)
+
+    @async_retry_on_transient_error
+    async def _get_page_data_with_retry(self, url: str) -> dict:
+        with self._instrumentation.stage("fetch"):
+            response = await self._http_client.get(
+                url, headers=self._get_headers_with_access_token()
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        return self._decode_json(response)
+
+    async def _stream_registry(
+        self,
+        registry_id: str,
+        add_page: Callable[[AsyncIterator[bytes]], Awaitable[dict]],
+    ) -> dict:
+        params = self._registry_params(registry_id)
+        return await self._stream_page(self._registry_url, params, add_page)
+
+    @async_retry_on_transient_error
+    async def _stream_page(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        add_page: Callable[[AsyncIterator[bytes]], Awaitable[dict]],
+    ) -> dict:
+        response = await self._open_stream(url, params)
+        try:
+            return await add_page(self._timed_chunks(response.aiter_bytes()))
+        finally:
+            await response.aclose()
+            self._instrumentation.increment("requests")
+
+    async def _timed_chunks(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        while True:
+            with self._instrumentation.stage("fetch"):
+                chunk = await anext(chunks, None)
+            if chunk is None:
+                return
+            self._instrumentation.increment("bytes_received", len(chunk))
+            yield chunk
+
+    async def _open_stream(
+        self, url: str, params: dict[str, str] | None
+    ) -> httpx.Response:
+        request = self._http_client.build_request(
+            "GET", url, params=params, headers=self._get_headers_with_access_token()
+        )
+        with self._instrumentation.stage("fetch"):
+            response = await self._http_client.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            self._record_response(len(response.content))
+            response.raise_for_status()
+        return response
+
+    @async_retry_on_transient_error
+    async def _get_registry(self, registry_id: str) -> httpx.Response:
+        with self._instrumentation.stage("fetch"):
+            response = await self._http_client.get(
+                self._registry_url,
+                params=self._registry_params(registry_id),
+                headers=self._get_headers_with_access_token(),
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        return response
+
+    @async_retry_on_transient_error
+    async def _authenticate(self) -> None:
+        with self._instrumentation.stage("auth"):
+            response = await self._http_client.post(
+                ACCESS_TOKEN_URL,
+                json=self._generate_access_token_payload(),
+                headers=self._get_headers(),
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        self._set_access_token(AccessToken.from_response(response))
+
+    async def _reauthenticate(self) -> None:
+        # concurrent requests rejected with the same stale token share one
+        # new authentication
+        async with self._auth_lock:
+            if self._access_token is None:
+                await self._authenticate()
+
+    @property
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            msg = "client must be used inside an 'async with' block"
+            raise RuntimeError(msg)
+        return self._client
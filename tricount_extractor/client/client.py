@@ -1,75 +1,99 @@
+import contextlib
+import contextvars
+import itertools
 import time
 import uuid
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from functools import wraps
+from functools import partial, wraps
 from typing import ParamSpec, TypeVar
 
 import httpx
 
 from tricount_extractor.client.keys import generate_public_rsa_key
+from tricount_extractor.client.retry import (
+    MAX_RETRY,
+    CircuitOpenError,
+    RetryPolicy,
+)
+from tricount_extractor.client.session_cache import CachedSession, SessionCache
+from tricount_extractor.client.throttle import Throttle
+from tricount_extractor.instrumentation import NO_INSTRUMENTATION, Instrumentation
+from tricount_extractor.models.pagination import Pagination
 
 BASE_URL = "https://api.tricount.bunq.com"
 ACCESS_TOKEN_URL = f"{BASE_URL}/v1/session-registry-installation"
 USER_URL = f"{BASE_URL}/v1/user"
+ACCESS_TOKEN_HEADER = "X-Bunq-Client-Authentication"
 USER_AGENT = "com.bunq.tricount.android:RELEASE:7.0.7:3174:ANDROID:13:C"
-MAX_RETRY = 10
-BACKOFF_BASE_SECONDS = 1.0
 DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0)
-RETRYABLE_EXCEPTIONS = (httpx.TimeoutException, httpx.TransportError)
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=10, max_keepalive_connections=10, keepalive_expiry=30.0
+)
+RETRIED_EXCEPTIONS = (
+    httpx.HTTPStatusError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+)
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
-def retry_on_network_error(method: Callable[P, R]) -> Callable[P, R]:
+def retry_on_transient_error(method: Callable[P, R]) -> Callable[P, R]:
+    """Retry the method as decided by the client `RetryPolicy`."""
+
     @wraps(method)
     def wrapper(self, *args: P.args, **kwargs: P.kwargs) -> R:
-        for attempt in range(self._max_retry):
+        for attempt in itertools.count():
+            if (wait := self._before_attempt(attempt)) > 0:
+                with self._instrumentation.stage("throttle"):
+                    time.sleep(wait)
+            start = time.perf_counter()
             try:
-                return method(self, *args, **kwargs)
-            except RETRYABLE_EXCEPTIONS as exc:
-                if attempt + 1 >= self._max_retry:
-                    msg = f"max retry {self._max_retry} reached: {exc!r}"
-                    raise ConnectionError(msg) from exc
-                time.sleep(BACKOFF_BASE_SECONDS * 2**attempt)
+                result = method(self, *args, **kwargs)
+            except RETRIED_EXCEPTIONS as exc:
+                self._record_attempt(time.perf_counter() - start, exc)
+                time.sleep(self._retry_delay(exc, attempt))
+                continue
+            self._record_attempt(time.perf_counter() - start)
+            return result
         raise AssertionError("unreachable")
 
     return wrapper
 
 
-class TricountClient:
+class BaseTricountClient:
     def __init__(
         self,
         *,
-        transport: httpx.BaseTransport | None = None,
         max_retry: int = MAX_RETRY,
+        retry_policy: RetryPolicy | None = None,
+        throttle: Throttle | None = None,
+        session_cache: SessionCache | None = None,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
     ):
-        self._transport = transport
-        self._max_retry = max_retry
+        """
+        `retry_policy` can be shared by several clients so they draw from the
+        same retry budget and circuit breaker, `max_retry` is only used to
+        build the default one.
+        """
+        self._retry_policy = (
+            retry_policy
+            if retry_policy is not None
+            else RetryPolicy(max_attempts=max_retry)
+        )
+        self._throttle = throttle if throttle is not None else Throttle()
+        self._session_cache = session_cache
+        self._instrumentation = instrumentation
 
         self._application_id = self._generate_application_id()
+        self._client_public_key: str | None = None
 
         self._access_token: AccessToken | None = None
-
-    def __enter__(self):
-        self._authenticate()
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._access_token = None
-        return None
-
-    @retry_on_network_error
-    def get_registry(self, registry_id: str) -> httpx.Response:
-        with httpx.Client(transport=self._transport, timeout=DEFAULT_TIMEOUT) as client:
-            response = client.get(
-                self._registry_url,
-                params=self._registry_params(registry_id),
-                headers=self._get_headers_with_access_token(),
-            )
-            response.raise_for_status()
-            return response
+        self._restored_access_token: str | None = None
+        self._accepted_access_token: str | None = None
 
     @property
     def _registry_url(self) -> str:
@@ -82,24 +106,121 @@ class TricountClient:
     def _registry_params(registry_id: str) -> dict[str, str]:
         return {"public_identifier_token": registry_id}
 
-    @retry_on_network_error
-    def _authenticate(self) -> None:
-        with httpx.Client(transport=self._transport, timeout=DEFAULT_TIMEOUT) as client:
-            response = client.post(
-                ACCESS_TOKEN_URL,
-                json=self._generate_access_token_payload(),
-                headers=self._get_headers(),
-            )
-            response.raise_for_status()
-        self._access_token = AccessToken.from_response(response)
+    @staticmethod
+    def _next_page_url(data: dict, direction: str = "older_url") -> str | None:
+        pagination = Pagination.from_json(data.get("Pagination", {}))
+        if (url := getattr(pagination, direction)) is None:
+            return None
+        return str(httpx.URL(BASE_URL).join(url))
 
     def _generate_access_token_payload(self):
+        if self._client_public_key is None:
+            self._client_public_key = generate_public_rsa_key()
         return {
             "app_installation_uuid": self._application_id,
-            "client_public_key": generate_public_rsa_key(),
+            "client_public_key": self._client_public_key,
             "device_description": "Android",
         }
 
+    def _restore_session(self) -> bool:
+        """Reuse the cached session, return whether its access token is usable."""
+        if self._session_cache is None:
+            return False
+        if (session := self._session_cache.load()) is None:
+            return False
+
+        self._application_id = session.application_id
+        self._client_public_key = session.client_public_key
+        if not session.has_access_token:
+            return False
+        self._access_token = AccessToken(session.access_token, session.user_id)
+        self._restored_access_token = session.access_token
+        return True
+
+    def _set_access_token(self, access_token: AccessToken) -> None:
+        self._access_token = access_token
+        if self._session_cache is None:
+            return
+        self._session_cache.save(
+            CachedSession(
+                application_id=self._application_id,
+                client_public_key=self._client_public_key,
+                access_token=access_token.access_token,
+                user_id=access_token.user_id,
+            )
+        )
+
+    def _should_reauthenticate(self, exc: httpx.HTTPStatusError) -> bool:
+        """
+        Invalidate the cache on a 401, return whether the rejected access token
+        came from the cache or was accepted before, i.e. has expired, and is
+        worth one new authentication.
+        """
+        if exc.response.status_code != httpx.codes.UNAUTHORIZED:
+            return False
+        rejected_token = exc.request.headers.get(ACCESS_TOKEN_HEADER)
+        is_current_token = (self._access_token is not None) and (
+            self._access_token.access_token == rejected_token
+        )
+        if is_current_token and (self._session_cache is not None):
+            self._session_cache.invalidate()
+
+        if (rejected_token is None) or (
+            rejected_token
+            not in (self._restored_access_token, self._accepted_access_token)
+        ):
+            return False
+        if is_current_token:
+            self._access_token = None
+        return True
+
+    def _on_response(self, response: httpx.Response) -> None:
+        if not response.is_success:
+            return
+        if (token := response.request.headers.get(ACCESS_TOKEN_HEADER)) is not None:
+            self._accepted_access_token = token
+
+    @property
+    def throttle(self) -> Throttle:
+        return self._throttle
+
+    def _before_attempt(self, attempt: int) -> float:
+        """Return the seconds to wait for the rate limit before the attempt."""
+        try:
+            self._retry_policy.before_attempt(attempt)
+        except CircuitOpenError:
+            self._instrumentation.increment("circuit_rejections")
+            raise
+        return self._throttle.reserve()
+
+    def _record_attempt(self, latency: float, exc: Exception | None = None) -> None:
+        if exc is None:
+            self._retry_policy.on_success()
+        if self._throttle.record(latency, exc):
+            self._instrumentation.increment("throttled")
+        if (concurrency_limit := self._throttle.concurrency_limit) is not None:
+            self._instrumentation.gauge("concurrency_limit", concurrency_limit)
+        if (rate_limit := self._throttle.rate_limit) is not None:
+            self._instrumentation.gauge("rate_limit", rate_limit)
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float:
+        try:
+            delay = self._retry_policy.retry_delay(exc, attempt)
+        except Exception as error:
+            if error is not exc:
+                self._instrumentation.increment("retries_given_up")
+            raise
+        self._instrumentation.increment("retries")
+        return delay
+
+    def _decode_json(self, response: httpx.Response) -> dict:
+        with self._instrumentation.stage("decode"):
+            return response.json()
+
+    def _record_response(self, body_size: int) -> None:
+        self._instrumentation.increment("requests")
+        self._instrumentation.increment("bytes_received", body_size)
+
     @staticmethod
     def _generate_application_id() -> str:
         return str(uuid.uuid4())
@@ -117,11 +238,289 @@ class TricountClient:
             msg = "need to authenticate before generating header"
             raise MissingAccessToken(msg)
         headers = self._get_headers()
-        headers["X-Bunq-Client-Authentication"] = self._access_token.access_token
+        headers[ACCESS_TOKEN_HEADER] = self._access_token.access_token
 
         return headers
 
 
+class TricountClient(BaseTricountClient):
+    """
+    Tricount API client.
+
+    One `httpx.Client` connection pool is opened when entering the `with`
+    block and shared by every request, retries included, until exiting it.
+    `http2=True` needs the optional `h2` package (`httpx[http2]`).
+
+    The requests are sent one at a time, `max_rate` caps them per second and
+    is lowered when the API throttles them.
+    """
+
+    def __init__(
+        self,
+        *,
+        transport: httpx.BaseTransport | None = None,
+        max_retry: int = MAX_RETRY,
+        retry_policy: RetryPolicy | None = None,
+        max_rate: float | None = None,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        http2: bool = False,
+        session_cache: SessionCache | None = None,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        super().__init__(
+            max_retry=max_retry,
+            retry_policy=retry_policy,
+            throttle=Throttle(max_rate=max_rate),
+            session_cache=session_cache,
+            instrumentation=instrumentation,
+        )
+        self._transport = transport
+        self._limits = limits
+        self._http2 = http2
+
+        self._client: httpx.Client | None = None
+        self._connection_stats = ConnectionStats()
+
+    def __enter__(self):
+        self._client = httpx.Client(
+            transport=self._transport,
+            timeout=DEFAULT_TIMEOUT,
+            limits=self._limits,
+            http2=self._http2,
+            event_hooks={
+                "request": [self._connection_stats.on_request],
+                "response": [self._on_response],
+            },
+        )
+        try:
+            if not self._restore_session():
+                self._authenticate()
+        except BaseException:
+            self._close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._access_token = None
+        self._close()
+        return None
+
+    @property
+    def connection_stats(self) -> ConnectionStats:
+        return self._connection_stats
+
+    def get_registry(self, registry_id: str) -> httpx.Response:
+        try:
+            return self._get_registry(registry_id)
+        except httpx.HTTPStatusError as exc:
+            if not self._should_reauthenticate(exc):
+                raise
+        self._authenticate()
+        return self._get_registry(registry_id)
+
+    def iter_registry_pages(
+        self, registry_id: str, *, prefetch: bool = False
+    ) -> Iterator[dict]:
+        """
+        Yield the decoded registry pages, following `Pagination.older_url`.
+
+        With `prefetch`, the next page is fetched in a background thread while
+        the caller handles the current one. At most two pages are held at once.
+        """
+        data = self._decode_json(self.get_registry(registry_id))
+        yield from self._iter_pages(data, "older_url", prefetch=prefetch)
+
+    def stream_registry_pages(
+        self, registry_id: str, add_page: Callable[[Iterator[bytes]], dict]
+    ) -> None:
+        """
+        Hand the body of each registry page to `add_page` as it is received,
+        following `Pagination.older_url`.
+
+        `add_page` consumes the body chunks and returns the decoded page, at
+        least its `Pagination`. A page is retried as a whole: on a transient
+        error while it is opened or read, `add_page` is called again with the
+        chunks of a new response and must start the page over.
+        """
+        data = self._with_reauthentication(
+            partial(self._stream_registry, registry_id, add_page)
+        )
+        while (next_url := self._next_page_url(data)) is not None:
+            data = self._with_reauthentication(
+                partial(self._stream_page, next_url, None, add_page)
+            )
+
+    def iter_newer_pages(self, url: str, *, prefetch: bool = False) -> Iterator[dict]:
+        """Yield the decoded pages from `url`, following `Pagination.newer_url`."""
+        try:
+            data = self._get_page_data(url)
+        except httpx.HTTPStatusError as exc:
+            if not self._should_reauthenticate(exc):
+                raise
+            self._authenticate()
+            data = self._get_page_data(url)
+        yield from self._iter_pages(data, "newer_url", prefetch=prefetch)
+
+    def _with_reauthentication(self, fetch: Callable[[], R]) -> R:
+        """Call `fetch`, once more after a new authentication if the token expired."""
+        try:
+            return fetch()
+        except httpx.HTTPStatusError as exc:
+            if not self._should_reauthenticate(exc):
+                raise
+        self._authenticate()
+        return fetch()
+
+    def _iter_pages(
+        self, data: dict, direction: str, *, prefetch: bool
+    ) -> Iterator[dict]:
+        executor_context = (
+            ThreadPoolExecutor(max_workers=1) if prefetch else contextlib.nullcontext()
+        )
+        with executor_context as executor:
+            while True:
+                next_url = self._next_page_url(data, direction)
+                next_page = None
+                if (executor is not None) and (next_url is not None):
+                    # the page is attributed to the registry being processed
+                    context = contextvars.copy_context()
+                    next_page = executor.submit(
+                        context.run, self._get_page_data, next_url
+                    )
+                yield data
+                if next_url is None:
+                    return
+                if next_page is not None:
+                    data = next_page.result()
+                else:
+                    data = self._get_page_data(next_url)
+
+    @retry_on_transient_error
+    def _get_page_data(self, url: str) -> dict:
+        with self._instrumentation.stage("fetch"):
+            response = self._http_client.get(
+                url, headers=self._get_headers_with_access_token()
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        return self._decode_json(response)
+
+    def _stream_registry(
+        self, registry_id: str, add_page: Callable[[Iterator[bytes]], dict]
+    ) -> dict:
+        params = self._registry_params(registry_id)
+        return self._stream_page(self._registry_url, params, add_page)
+
+    @retry_on_transient_error
+    def _stream_page(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        add_page: Callable[[Iterator[bytes]], dict],
+    ) -> dict:
+        response = self._open_stream(url, params)
+        try:
+            return add_page(self._timed_chunks(response.iter_bytes()))
+        finally:
+            response.close()
+            self._instrumentation.increment("requests")
+
+    def _timed_chunks(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        while True:
+            with self._instrumentation.stage("fetch"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self._instrumentation.increment("bytes_received", len(chunk))
+            yield chunk
+
+    def _open_stream(self, url: str, params: dict[str, str] | None) -> httpx.Response:
+        request = self._http_client.build_request(
+            "GET", url, params=params, headers=self._get_headers_with_access_token()
+        )
+        with self._instrumentation.stage("fetch"):
+            response = self._http_client.send(request, stream=True)
+        if response.is_error:
+            response.read()
+            response.close()
+            self._record_response(len(response.content))
+            response.raise_for_status()
+        return response
+
+    @retry_on_transient_error
+    def _get_registry(self, registry_id: str) -> httpx.Response:
+        with self._instrumentation.stage("fetch"):
+            response = self._http_client.get(
+                self._registry_url,
+                params=self._registry_params(registry_id),
+                headers=self._get_headers_with_access_token(),
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        return response
+
+    @retry_on_transient_error
+    def _authenticate(self) -> None:
+        with self._instrumentation.stage("auth"):
+            response = self._http_client.post(
+                ACCESS_TOKEN_URL,
+                json=self._generate_access_token_payload(),
+                headers=self._get_headers(),
+            )
+        self._record_response(len(response.content))
+        response.raise_for_status()
+        self._set_access_token(AccessToken.from_response(response))
+
+    @property
+    def _http_client(self) -> httpx.Client:
+        if self._client is None:
+            msg = "client must be used inside a 'with' block"
+            raise RuntimeError(msg)
+        return self._client
+
+    def _close(self) -> None:
+        if self._client is None:
+            return
+        self._client.close()
+        self._client = None
+
+
+@dataclass
+class ConnectionStats:
+    """
+    Connection reuse counters of a client connection pool.
+
+    Connections are counted from the httpcore `trace` request extension, so a
+    transport that never opens sockets (e.g. `httpx.MockTransport`) only
+    counts requests.
+    """
+
+    requests: int = 0
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+    def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self.on_trace
+
+    async def aon_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self.aon_trace
+
+    def on_trace(self, event_name: str, info: dict) -> None:
+        if event_name.endswith("connect_tcp.complete"):
+            self.connections_opened += 1
+        elif event_name.endswith("start_tls.complete"):
+            self.tls_handshakes += 1
+
+    async def aon_trace(self, event_name: str, info: dict) -> None:
+        self.on_trace(event_name, info)
+
+
 @dataclass(frozen=True)
 class AccessToken:
     access_token: str
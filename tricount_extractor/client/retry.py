@@ -0,0 +1,229 @@
+import datetime
+import email.utils
+import random
+import threading
+import time
+from collections.abc import Callable
+
+import httpx
+
+MAX_RETRY = 10
+BACKOFF_BASE_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+MAX_RETRY_AFTER_SECONDS = 120.0
+DEFAULT_JITTER = 0.5
+RETRYABLE_EXCEPTIONS = (httpx.TimeoutException, httpx.TransportError)
+RETRYABLE_STATUS_CODES = frozenset(
+    {
+        httpx.codes.TOO_MANY_REQUESTS,
+        httpx.codes.INTERNAL_SERVER_ERROR,
+        httpx.codes.BAD_GATEWAY,
+        httpx.codes.SERVICE_UNAVAILABLE,
+        httpx.codes.GATEWAY_TIMEOUT,
+    }
+)
+
+
+class RetryBudget:
+    """
+    Retries allowed across every request sharing the budget.
+
+    Each request deposits `ratio` of a retry and each retry withdraws one, the
+    balance starts at and is capped by `reserve`. Once a burst of failures has
+    used the reserve, at most `ratio` retries per request are sent, so a
+    struggling API does not get several times the normal load.
+    """
+
+    def __init__(self, *, ratio: float = 0.2, reserve: float = 10.0):
+        self._ratio = ratio
+        self._reserve = reserve
+        self._balance = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self._balance + self._ratio, self._reserve)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Fail fast once `failure_threshold` requests in a row failed.
+
+    A request counts once, with its final outcome: it fails when it gives up
+    retrying, so a request is never cut short by its own retries. The
+    circuit then stays open for `reset_timeout` seconds, every request is
+    rejected with `CircuitOpenError`. The next request after that is let
+    through as a probe: it closes the circuit on success and opens it again
+    on failure. A probe without any outcome lets another one through after
+    `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = self._clock()
+            remaining = self._opened_at + self._reset_timeout - now
+            if remaining > 0:
+                msg = (
+                    f"circuit open after {self._failures} failures in a row, "
+                    f"retrying in {remaining:.0f}s"
+                )
+                raise CircuitOpenError(msg)
+            # the other requests are rejected until the probe outcome
+            self._opened_at = now
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._failures >= self._failure_threshold):
+                self._opened_at = self._clock()
+                self._probing = False
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed request.
+
+    Network errors and the 429 and 5xx responses in `RETRYABLE_STATUS_CODES`
+    are retried, any other error is raised at once. The wait honors the
+    `Retry-After` header, otherwise it is an exponential backoff, and is
+    spread by `jitter` so the requests failing together do not retry
+    together. The retries are drawn from a `RetryBudget` and the requests
+    go through a `CircuitBreaker`, both shared by every request of the
+    policy.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = MAX_RETRY,
+        backoff_base: float = BACKOFF_BASE_SECONDS,
+        max_backoff: float = MAX_BACKOFF_SECONDS,
+        max_retry_after: float = MAX_RETRY_AFTER_SECONDS,
+        jitter: float = DEFAULT_JITTER,
+        budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        if not 0 <= jitter <= 1:
+            msg = f"jitter must be between 0 and 1, got {jitter}"
+            raise ValueError(msg)
+        self.max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._max_backoff = max_backoff
+        self._max_retry_after = max_retry_after
+        self._jitter = jitter
+        self.budget = budget if budget is not None else RetryBudget()
+        self.circuit_breaker = (
+            circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        )
+        self._rng = rng
+
+    def before_attempt(self, attempt: int) -> None:
+        """Raise `CircuitOpenError` when the circuit is open for a new request."""
+        if attempt == 0:
+            self.circuit_breaker.before_request()
+            self.budget.deposit()
+
+    def on_success(self) -> None:
+        self.circuit_breaker.record_success()
+
+    def retry_delay(self, exc: Exception, attempt: int) -> float:
+        """
+        Return the seconds to wait before retrying after `exc`, or raise when
+        the request must not be retried.
+
+        HTTP errors are raised as is, network errors as a `ConnectionError`.
+        """
+        if not self.is_retryable(exc):
+            # the API answered, it is up
+            self.circuit_breaker.record_success()
+            raise exc
+        if attempt + 1 >= self.max_attempts:
+            raise self._give_up(exc, f"max retry {self.max_attempts} reached")
+        retry_after = _retry_after(exc)
+        if retry_after is None:
+            backoff = min(self._backoff_base * 2**attempt, self._max_backoff)
+            delay = backoff * (1 - self._jitter * self._rng())
+        elif retry_after > self._max_retry_after:
+            raise self._give_up(exc, f"asked to retry after {retry_after:.0f}s")
+        else:
+            delay = retry_after * (1 + self._jitter * self._rng())
+        if not self.budget.try_withdraw():
+            raise self._give_up(exc, "retry budget exhausted")
+        return delay
+
+    def _give_up(self, exc: Exception, reason: str) -> Exception:
+        self.circuit_breaker.record_failure()
+        return _give_up(exc, reason)
+
+    @staticmethod
+    def is_retryable(exc: Exception) -> bool:
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(exc, RETRYABLE_EXCEPTIONS)
+
+
+def _retry_after(exc: Exception) -> float | None:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    if (value := exc.response.headers.get("Retry-After")) is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.UTC)
+    return max((date - datetime.datetime.now(datetime.UTC)).total_seconds(), 0.0)
+
+
+def _give_up(exc: Exception, reason: str) -> Exception:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc
+    error = ConnectionError(f"{reason}: {exc!r}")
+    error.__cause__ = exc
+    return error
+
+
+class CircuitOpenError(ConnectionError):
+    """API considered down, request not sent"""
@@ -0,0 +1,100 @@
+import datetime
+import json
+import os
+import pathlib
+from dataclasses import dataclass
+
+DEFAULT_SESSION_TTL = datetime.timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    application_id: str
+    client_public_key: str
+    access_token: str | None = None
+    user_id: str | None = None
+
+    @property
+    def has_access_token(self) -> bool:
+        return (self.access_token is not None) and (self.user_id is not None)
+
+
+class SessionCache:
+    """
+    Local file keeping the Tricount session between runs.
+
+    The application ID and the public key never expire, so an expired session
+    re-authenticates without generating a new RSA key. The access token is
+    dropped once older than `ttl` or when invalidated (e.g. on a 401).
+    """
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        *,
+        ttl: datetime.timedelta = DEFAULT_SESSION_TTL,
+    ):
+        self._path = pathlib.Path(path)
+        self._ttl = ttl
+
+    def load(self) -> CachedSession | None:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            session = CachedSession(
+                application_id=data["application_id"],
+                client_public_key=data["client_public_key"],
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        if self._is_expired(data.get("expires_at")):
+            return session
+        return CachedSession(
+            application_id=session.application_id,
+            client_public_key=session.client_public_key,
+            access_token=data.get("access_token"),
+            user_id=data.get("user_id"),
+        )
+
+    def save(self, session: CachedSession) -> None:
+        data = {
+            "application_id": session.application_id,
+            "client_public_key": session.client_public_key,
+        }
+        if session.has_access_token:
+            data["access_token"] = session.access_token
+            data["user_id"] = session.user_id
+            data["expires_at"] = (self._now() + self._ttl).isoformat()
+        self._write(data)
+
+    def invalidate(self) -> None:
+        if (session := self.load()) is None:
+            return
+        self.save(
+            CachedSession(
+                application_id=session.application_id,
+                client_public_key=session.client_public_key,
+            )
+        )
+
+    def _write(self, data: dict) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(f"{self._path.name}.tmp")
+        # the access token is a credential, keep it readable by the owner only
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path)
+
+    def _is_expired(self, expires_at: str | None) -> bool:
+        if expires_at is None:
+            return True
+        try:
+            return datetime.datetime.fromisoformat(expires_at) <= self._now()
+        except (TypeError, ValueError):
+            return True
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.UTC)
@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+
+import httpx
+
+DEFAULT_LATENCY_TARGET_SECONDS = 5.0
+MIN_RATE = 0.5
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN_SECONDS = 1.0
+CONGESTION_STATUS_CODES = frozenset(
+    {httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE}
+)
+
+
+class TokenBucket:
+    """
+    Requests allowed per second, with bursts of up to `burst` requests.
+
+    `reserve` takes a token right away and returns how long to wait for it,
+    so the callers are spaced out even when they all reserve at once.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0:
+            msg = f"rate must be positive, got {rate}"
+            raise ValueError(msg)
+        self._rate = rate
+        self._burst = burst if burst is not None else max(rate, 1.0)
+        self._clock = clock
+        self._tokens = self._burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            self._rate = rate
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * self._rate, self._burst
+        )
+        self._updated = now
+
+
+class AimdController:
+    """
+    Additive increase, multiplicative decrease of a limit.
+
+    A healthy outcome adds `increase / value`, so the limit grows by about
+    `increase` once per `value` outcomes. A congestion signal multiplies the
+    limit by `decrease`, at most once per `cooldown` seconds so a burst of
+    failures of the requests already sent only counts once.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        increase: float = 1.0,
+        decrease: float = DECREASE_FACTOR,
+        cooldown: float = DECREASE_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._value = min(max(initial, minimum), maximum)
+        self._minimum = minimum
+        self._maximum = maximum
+        self._increase = increase
+        self._decrease = decrease
+        self._cooldown = cooldown
+        self._clock = clock
+        self._decreased_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def on_healthy(self) -> None:
+        with self._lock:
+            self._value = min(self._value + self._increase / self._value, self._maximum)
+
+    def on_congestion(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if (self._decreased_at is not None) and (
+                now - self._decreased_at < self._cooldown
+            ):
+                return
+            self._decreased_at = now
+            self._value = max(self._value * self._decrease, self._minimum)
+
+
+class Throttle:
+    """
+    Concurrency and rate limits of a client, adapted to the API responses.
+
+    Both limits grow while the requests succeed within `latency_target`, hold
+    when they get slower, and back off on a 429 or 503 response or a timeout.
+    Each limit is only set when its maximum is given, and starts at it: the
+    concurrency at `max_concurrency`, the rate at `max_rate`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int | None = None,
+        max_rate: float | None = None,
+        latency_target: float = DEFAULT_LATENCY_TARGET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._latency_target = latency_target
+        self._concurrency: AimdController | None = None
+        if max_concurrency is not None:
+            self._concurrency = AimdController(
+                initial=max_concurrency,
+                minimum=1,
+                maximum=max_concurrency,
+                clock=clock,
+            )
+        self._rate: AimdController | None = None
+        self._bucket: TokenBucket | None = None
+        if max_rate is not None:
+            self._rate = AimdController(
+                initial=max_rate,
+                minimum=min(MIN_RATE, max_rate),
+                maximum=max_rate,
+                clock=clock,
+            )
+            self._bucket = TokenBucket(max_rate, clock=clock)
+
+    @property
+    def concurrency_limit(self) -> int | None:
+        if self._concurrency is None:
+            return None
+        return int(self._concurrency.value)
+
+    @property
+    def rate_limit(self) -> float | None:
+        return self._rate.value if self._rate is not None else None
+
+    def reserve(self) -> float:
+        """Return the seconds to wait before sending the next request."""
+        if self._bucket is None:
+            return 0.0
+        return self._bucket.reserve()
+
+    def record(self, latency: float, exc: Exception | None = None) -> bool:
+        """Adapt the limits to a request outcome, return whether it was throttled."""
+        if exc is None:
+            if latency <= self._latency_target:
+                self._adapt(AimdController.on_healthy)
+            return False
+        if not is_congestion(exc):
+            return False
+        self._adapt(AimdController.on_congestion)
+        return True
+
+    def _adapt(self, change: Callable[[AimdController], None]) -> None:
+        if self._concurrency is not None:
+            change(self._concurrency)
+        if (self._rate is None) or (self._bucket is None):
+            return
+        change(self._rate)
+        self._bucket.rate = self._rate.value
+
+
+def is_congestion(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in CONGESTION_STATUS_CODES
+    return isinstance(exc, httpx.TimeoutException)
+
+
+class ConcurrencyGate:
+    """
+    Async context manager letting at most `limit()` callers in at once.
+
+    Unlike a semaphore, the limit is read on each entry so it can change
+    while callers are waiting.
+    """
+
+    def __init__(self, limit: Callable[[], int]):
+        self._limit = limit
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._limit())
+            self._in_flight += 1
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
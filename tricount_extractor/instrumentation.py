@@ -0,0 +1,208 @@
+import contextlib
+import contextvars
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+
+METRIC_PREFIX = "tricount"
+
+_current_registry_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_registry_id", default=None
+)
+
+
+class Instrumentation:
+    """
+    Hooks called around each stage of a registry export, they do nothing.
+
+    Subclasses override `observe` and `count` to record the stage timings and
+    the counters, and `gauge` for the values shared by every registry, such
+    as the client limits. The registry being processed is tracked in a context
+    variable, so the hooks called from the clients, threads and asyncio tasks
+    started for a registry are attributed to it.
+    """
+
+    def observe(self, stage: str, seconds: float, registry_id: str | None) -> None:
+        pass
+
+    def count(self, name: str, value: float, registry_id: str | None) -> None:
+        pass
+
+    def gauge(self, name: str, value: float) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, current_registry_id())
+
+    def increment(self, name: str, value: float = 1) -> None:
+        self.count(name, value, current_registry_id())
+
+    @contextlib.contextmanager
+    def registry(self, registry_id: str) -> Iterator[None]:
+        token = _current_registry_id.set(registry_id)
+        try:
+            yield
+        finally:
+            _current_registry_id.reset(token)
+
+
+NO_INSTRUMENTATION = Instrumentation()
+
+
+def current_registry_id() -> str | None:
+    return _current_registry_id.get()
+
+
+class StageTimings(Instrumentation):
+    """Keep the stage timings in a list, to send them back from a worker."""
+
+    def __init__(self):
+        self.timings: list[tuple[str, float]] = []
+
+    def observe(self, stage: str, seconds: float, registry_id: str | None) -> None:
+        self.timings.append((stage, seconds))
+
+
+class MetricsRecorder(Instrumentation):
+    """
+    Sum the stage timings and counters per registry.
+
+    Hooks called outside of any registry, such as the authentication, are
+    kept under no registry. The totals are exported as a JSON summary or in
+    the Prometheus text format, e.g. for the node exporter textfile
+    collector.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds: dict[tuple[str | None, str], float] = defaultdict(float)
+        self._calls: dict[tuple[str | None, str], int] = defaultdict(int)
+        self._counters: dict[tuple[str | None, str], float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float, registry_id: str | None) -> None:
+        with self._lock:
+            self._seconds[registry_id, stage] += seconds
+            self._calls[registry_id, stage] += 1
+
+    def count(self, name: str, value: float, registry_id: str | None) -> None:
+        with self._lock:
+            self._counters[registry_id, name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def to_json(self) -> dict:
+        with self._lock:
+            seconds = dict(self._seconds)
+            calls = dict(self._calls)
+            counters = dict(self._counters)
+            gauges = dict(sorted(self._gauges.items()))
+
+        registries: dict[str, dict] = {}
+        stage_totals: dict[str, dict] = {}
+        counter_totals: dict[str, float] = defaultdict(float)
+        for (registry_id, stage), value in sorted(seconds.items(), key=_sort_key):
+            summary = {"seconds": value, "calls": calls[registry_id, stage]}
+            _summary_of(registries, registry_id)["stages"][stage] = summary
+            total = stage_totals.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += summary["seconds"]
+            total["calls"] += summary["calls"]
+        for (registry_id, name), value in sorted(counters.items(), key=_sort_key):
+            _summary_of(registries, registry_id)["counters"][name] = value
+            counter_totals[name] += value
+        return {
+            "registries": registries,
+            "totals": {"stages": stage_totals, "counters": dict(counter_totals)},
+            "gauges": gauges,
+        }
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            seconds = sorted(self._seconds.items(), key=_sort_key)
+            calls = sorted(self._calls.items(), key=_sort_key)
+            counters = sorted(self._counters.items(), key=_sort_key)
+            gauges = sorted(self._gauges.items())
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds_total Time spent in each stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds_total counter",
+        ]
+        for (registry_id, stage), value in seconds:
+            labels = _labels(registry_id, stage=stage)
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_total{labels} {value!r}")
+        lines.extend(
+            [
+                f"# HELP {METRIC_PREFIX}_stage_calls_total Number of runs of each stage.",
+                f"# TYPE {METRIC_PREFIX}_stage_calls_total counter",
+            ]
+        )
+        for (registry_id, stage), value in calls:
+            labels = _labels(registry_id, stage=stage)
+            lines.append(f"{METRIC_PREFIX}_stage_calls_total{labels} {value}")
+
+        names = sorted({name for (_, name), _ in counters})
+        for name in names:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (registry_id, counter_name), value in counters:
+                if counter_name != name:
+                    continue
+                lines.append(f"{metric}{_labels(registry_id)} {_format_number(value)}")
+        for name, value in gauges:
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str | pathlib.Path) -> None:
+        _write_atomic(path, json.dumps(self.to_json(), indent=2))
+
+    def write_prometheus(self, path: str | pathlib.Path) -> None:
+        _write_atomic(path, self.to_prometheus())
+
+
+def _summary_of(registries: dict[str, dict], registry_id: str | None) -> dict:
+    key = registry_id if registry_id is not None else ""
+    return registries.setdefault(key, {"stages": {}, "counters": {}})
+
+
+def _sort_key(item: tuple[tuple[str | None, str], float]) -> tuple[str, str]:
+    (registry_id, name), _ = item
+    return (registry_id or "", name)
+
+
+def _labels(registry_id: str | None, **labels: str) -> str:
+    if registry_id is not None:
+        labels = {"registry": registry_id, **labels}
+    if not labels:
+        return ""
+    content = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+    return f"{{{content}}}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _write_atomic(path: str | pathlib.Path, content: str) -> None:
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
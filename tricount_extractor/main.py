@@ -1,68 +1,819 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import os
+import pathlib
+import sys
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
 import httpx
 
+from tricount_extractor.archive import RegistryArchive
+from tricount_extractor.attachments import AttachmentDownloader, AttachmentStore
+from tricount_extractor.checkpoint import CheckpointJournal
 from tricount_extractor.parse_args import parse_args
+from tricount_extractor.client.async_client import AsyncTricountClient
 from tricount_extractor.client.client import TricountClient
-from tricount_extractor.models.registry import Registry
+from tricount_extractor.client.session_cache import SessionCache
+from tricount_extractor.instrumentation import (
+    NO_INSTRUMENTATION,
+    Instrumentation,
+    MetricsRecorder,
+    StageTimings,
+)
+from tricount_extractor.manifest import Fingerprint, RenderManifest
+from tricount_extractor.models.lazy import LazyEntries
+from tricount_extractor.models.registry import Registry, RegistryBuilder
+from tricount_extractor.models.stream import read_pagination
 from tricount_extractor.saver import RegistrySaver
+from tricount_extractor.server import RegistryCache, RegistryServer, RegistryService
+from tricount_extractor.sync import RegistrySynchronizer, SyncStateStore
+from tricount_extractor.watch import PollScheduler
+
+READ_STAGES = frozenset({"decode", "parse"})
 
 
 class Processor:
+    def __init__(
+        self,
+        *,
+        sync_state: SyncStateStore | None = None,
+        saver: RegistrySaver | None = None,
+        render_workers: int | None = None,
+        skip_unchanged: bool = False,
+        max_rate: float | None = None,
+        checkpoint: CheckpointJournal | None = None,
+        archive: RegistryArchive | None = None,
+        attachments: AttachmentDownloader | None = None,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        """
+        With `skip_unchanged`, a `RenderManifest` in the output folder keeps
+        the fingerprint of each rendered registry, a registry fetched with the
+        same fingerprint as its last render is not rendered again.
+
+        The outcome of each registry is appended to `checkpoint` as soon as it
+        is known. The fetched pages of each registry are added to `archive`.
+        The attachments of the rendered registries are downloaded by
+        `attachments` once the registries are processed.
+        """
+        self._synchronizer = (
+            RegistrySynchronizer(sync_state) if sync_state is not None else None
+        )
+        self._saver = saver if saver is not None else RegistrySaver()
+        self._render_workers = render_workers
+        self._skip_unchanged = skip_unchanged
+        self._max_rate = max_rate
+        self._checkpoint = checkpoint
+        self._archive = archive
+        self._attachments = attachments
+        self._instrumentation = instrumentation
+        self._manifest: RenderManifest | None = None
+        self._attachment_urls: dict[str, str] = {}
+
     def process(
         self,
-        registry_ids: list[str],
+        registry_ids: Iterable[str],
         folder: str,
         *,
-        transport: httpx.BaseTransport | None = None,
+        transport: httpx.BaseTransport | httpx.AsyncBaseTransport | None = None,
+        concurrency: int = 1,
+        session_cache: SessionCache | None = None,
     ) -> None:
-        errors = self._process(registry_ids, folder, transport=transport)
+        self._manifest = (
+            RenderManifest.in_folder(folder) if self._skip_unchanged else None
+        )
+        self._saver.prepare(folder)
+        try:
+            errors = self._process_all(
+                registry_ids,
+                folder,
+                transport=transport,
+                concurrency=concurrency,
+                session_cache=session_cache,
+            )
+        finally:
+            if self._manifest is not None:
+                self._manifest.save()
+        self._download_attachments()
         if len(errors) == 0:
             return
         raise ExceptionGroup("failed to process some tricounts", errors)
 
+    def watch(
+        self,
+        scheduler: PollScheduler,
+        folder: str,
+        *,
+        transport: httpx.BaseTransport | None = None,
+        session_cache: SessionCache | None = None,
+        after_poll: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Poll the registries of `scheduler` until interrupted, only the changed
+        ones are rendered again.
+
+        One client is kept open for the whole watch, it authenticates again
+        when its session expires. A failed poll is reported and the registry
+        polled again later. `after_poll` is called after each poll, e.g. to
+        export the metrics.
+        """
+        self._manifest = RenderManifest.in_folder(folder)
+        self._saver.prepare(folder)
+        with TricountClient(
+            transport=transport,
+            max_rate=self._max_rate,
+            session_cache=session_cache,
+            instrumentation=self._instrumentation,
+        ) as client:
+            while True:
+                registry_id = scheduler.next()
+                result = self._process_registry_id(client, registry_id, folder)
+                if isinstance(result, Exception):
+                    print(result)
+                    changed = False
+                else:
+                    changed = not result.skipped
+                scheduler.record(registry_id, changed=changed)
+                self._manifest.save()
+                self._download_attachments()
+                if after_poll is not None:
+                    after_poll()
+
+    def convert(self, dumps: Iterable[str], folder: str) -> None:
+        """
+        Render saved registry responses, without any network access.
+
+        The files are read from memory maps and rendered in a pool of
+        `render_workers` processes, one per core by default. Each dump is
+        recorded under its path in the metrics, the checkpoint and the
+        manifest.
+        """
+        self._manifest = (
+            RenderManifest.in_folder(folder) if self._skip_unchanged else None
+        )
+        self._saver.prepare(folder)
+        workers = self._render_workers or os.cpu_count() or 1
+        max_pending = 2 * workers
+        errors: dict[int, Exception] = {}
+        pending: dict[int, tuple[str, Future]] = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for index, dump in enumerate(dumps):
+                    if len(pending) >= max_pending:
+                        self._collect_render(
+                            pending, errors, record=self._record_conversion
+                        )
+                    future = pool.submit(self._convert_in_pool(dump), dump, folder)
+                    pending[index] = (dump, future)
+                while pending:
+                    self._collect_render(
+                        pending, errors, record=self._record_conversion
+                    )
+        finally:
+            if self._manifest is not None:
+                self._manifest.save()
+        self._download_attachments()
+        if len(errors) == 0:
+            return
+        raise ExceptionGroup(
+            "failed to convert some registry dumps",
+            [errors[index] for index in sorted(errors)],
+        )
+
+    def _process_all(
+        self,
+        registry_ids: Iterable[str],
+        folder: str,
+        *,
+        transport: httpx.BaseTransport | httpx.AsyncBaseTransport | None,
+        concurrency: int,
+        session_cache: SessionCache | None,
+    ) -> list[Exception]:
+        with self._render_pool() as pool:
+            if concurrency > 1:
+                errors = asyncio.run(
+                    self._process_async(
+                        registry_ids,
+                        folder,
+                        transport=transport,
+                        concurrency=concurrency,
+                        session_cache=session_cache,
+                        pool=pool,
+                    )
+                )
+            elif pool is not None:
+                errors = self._process_pooled(
+                    registry_ids,
+                    folder,
+                    transport=transport,
+                    session_cache=session_cache,
+                    pool=pool,
+                )
+            else:
+                errors = self._process(
+                    registry_ids,
+                    folder,
+                    transport=transport,
+                    session_cache=session_cache,
+                )
+        return errors
+
     def _process(
         self,
-        registry_ids: list[str],
+        registry_ids: Iterable[str],
         folder: str,
         *,
         transport: httpx.BaseTransport | None = None,
+        session_cache: SessionCache | None = None,
     ) -> list[Exception]:
         errors = []
-        with TricountClient(transport=transport) as client:
+        with TricountClient(
+            transport=transport,
+            max_rate=self._max_rate,
+            session_cache=session_cache,
+            instrumentation=self._instrumentation,
+        ) as client:
             for registry_id in registry_ids:
-                error = self._process_registry_id(client, registry_id, folder)
-                if error is None:
-                    continue
-                errors.append(error)
+                result = self._process_registry_id(client, registry_id, folder)
+                if isinstance(result, Exception):
+                    errors.append(result)
         return errors
 
+    def _process_pooled(
+        self,
+        registry_ids: Iterable[str],
+        folder: str,
+        *,
+        transport: httpx.BaseTransport | None = None,
+        session_cache: SessionCache | None = None,
+        pool: ProcessPoolExecutor,
+    ) -> list[Exception]:
+        # fetching stays on this thread while the pool renders the previous
+        # registries, the pending renders are bounded to cap the memory held
+        # by fetched payloads
+        max_pending = 2 * self._render_workers
+        errors: dict[int, Exception] = {}
+        pending: dict[int, tuple[str, Future]] = {}
+        with TricountClient(
+            transport=transport,
+            max_rate=self._max_rate,
+            session_cache=session_cache,
+            instrumentation=self._instrumentation,
+        ) as client:
+            for index, registry_id in enumerate(registry_ids):
+                if len(pending) >= max_pending:
+                    self._collect_render(pending, errors)
+                try:
+                    with self._instrumentation.registry(registry_id):
+                        pages = self._fetch_raw_pages(client, registry_id)
+                except Exception as e:
+                    errors[index] = self._record_failure(registry_id, e)
+                    continue
+                future = pool.submit(self._render_in_pool(registry_id), pages, folder)
+                pending[index] = (registry_id, future)
+            while pending:
+                self._collect_render(pending, errors)
+        return [errors[index] for index in sorted(errors)]
+
+    def _collect_render(
+        self,
+        pending: dict[int, tuple[str, Future]],
+        errors: dict[int, Exception],
+        *,
+        record: Callable[[str, RenderResult], None] | None = None,
+    ) -> None:
+        index = next(iter(pending))
+        registry_id, future = pending.pop(index)
+        try:
+            result = future.result()
+        except Exception as e:
+            errors[index] = self._record_failure(registry_id, e)
+            return
+        (record or self._record_render)(registry_id, result)
+
+    async def _process_async(
+        self,
+        registry_ids: Iterable[str],
+        folder: str,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        concurrency: int,
+        session_cache: SessionCache | None = None,
+        pool: ProcessPoolExecutor | None = None,
+    ) -> list[Exception]:
+        # the IDs are read as the registries complete, so a long ID file is
+        # never held in full, and enough are started to fill every slot
+        max_pending = 2 * concurrency
+        errors: dict[int, Exception] = {}
+        pending: dict[asyncio.Task, int] = {}
+        # like `_process_pooled`, at most two renders per worker are handed to
+        # the pool, the fetched registries wait for one of them to finish
+        render_slots = (
+            asyncio.Semaphore(2 * self._render_workers) if pool is not None else None
+        )
+        async with AsyncTricountClient(
+            transport=transport,
+            concurrency=concurrency,
+            max_rate=self._max_rate,
+            session_cache=session_cache,
+            instrumentation=self._instrumentation,
+        ) as client:
+            for index, registry_id in enumerate(registry_ids):
+                if len(pending) >= max_pending:
+                    await self._collect_tasks(pending, errors)
+                task = asyncio.create_task(
+                    self._process_registry_id_async(
+                        client, registry_id, folder, pool, render_slots
+                    )
+                )
+                pending[task] = index
+            while pending:
+                await self._collect_tasks(pending, errors)
+        return [errors[index] for index in sorted(errors)]
+
     @staticmethod
+    async def _collect_tasks(
+        pending: dict[asyncio.Task, int], errors: dict[int, Exception]
+    ) -> None:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index = pending.pop(task)
+            if (error := task.result()) is not None:
+                errors[index] = error
+
     def _process_registry_id(
-        client: TricountClient, registry_id: str, folder: str
+        self, client: TricountClient, registry_id: str, folder: str
+    ) -> RenderResult | Exception:
+        try:
+            with self._instrumentation.registry(registry_id):
+                builder = self._fetch_registry(client, registry_id)
+                return self._save_registry(builder, registry_id, folder)
+        except Exception as e:
+            return self._record_failure(registry_id, e)
+
+    async def _process_registry_id_async(
+        self,
+        client: AsyncTricountClient,
+        registry_id: str,
+        folder: str,
+        pool: ProcessPoolExecutor | None = None,
+        render_slots: asyncio.Semaphore | None = None,
     ) -> None | Exception:
         try:
-            response = client.get_registry(registry_id)
-            response_data = response.json()
-            registry = Registry.from_json(response_data)
-            saved_path = RegistrySaver().save(registry, folder)
-            print(f"registry ID '{registry_id}' saved '{saved_path}'")
+            with self._instrumentation.registry(registry_id):
+                if (pool is not None) and (render_slots is not None):
+                    pages = await self._fetch_raw_pages_async(client, registry_id)
+                    async with render_slots:
+                        result = await asyncio.get_running_loop().run_in_executor(
+                            pool, self._render_in_pool(registry_id), pages, folder
+                        )
+                    self._record_render(registry_id, result)
+                    return None
+                builder = await self._fetch_registry_async(client, registry_id)
+                # parsing and writing are CPU bound, keep the event loop free so
+                # the other requests can make progress meanwhile
+                await asyncio.to_thread(
+                    self._save_registry, builder, registry_id, folder
+                )
             return None
         except Exception as e:
-            error = Exception(f"failed to process tricount {registry_id}: {e}")
-            error.__cause__ = e
-            return error
+            return self._record_failure(registry_id, e)
+
+    def _fetch_registry(
+        self, client: TricountClient, registry_id: str
+    ) -> RegistryBuilder:
+        builder = self._registry_builder()
+        if (self._synchronizer is None) and (self._archive is None):
+            # the entries are decoded while the body is read, the raw pages
+            # are never held in full
+            client.stream_registry_pages(registry_id, builder.add_page_stream)
+            return builder
+        for page in self._fetch_pages(client, registry_id):
+            builder.add_page(page)
+        return builder
+
+    async def _fetch_registry_async(
+        self, client: AsyncTricountClient, registry_id: str
+    ) -> RegistryBuilder:
+        builder = self._registry_builder()
+        if (self._synchronizer is None) and (self._archive is None):
+            await client.stream_registry_pages(registry_id, builder.add_page_astream)
+            return builder
+        for page in await self._fetch_pages_async(client, registry_id):
+            await asyncio.to_thread(builder.add_page, page)
+        return builder
+
+    def _fetch_raw_pages(
+        self, client: TricountClient, registry_id: str
+    ) -> list[dict] | list[bytes]:
+        """
+        Fetch the pages to render in the pool, as their response bodies so
+        they are decoded by the workers.
+        """
+        if (self._synchronizer is not None) or (self._archive is not None):
+            return self._fetch_pages(client, registry_id)
+        bodies = []
+
+        def add_page(chunks: Iterator[bytes]) -> dict:
+            bodies.append(b"".join(chunks))
+            return {"Pagination": read_pagination(bodies[-1])}
+
+        client.stream_registry_pages(registry_id, add_page)
+        return bodies
+
+    async def _fetch_raw_pages_async(
+        self, client: AsyncTricountClient, registry_id: str
+    ) -> list[dict] | list[bytes]:
+        if (self._synchronizer is not None) or (self._archive is not None):
+            return await self._fetch_pages_async(client, registry_id)
+        bodies = []
+
+        async def add_page(chunks: AsyncIterator[bytes]) -> dict:
+            bodies.append(b"".join([chunk async for chunk in chunks]))
+            return {"Pagination": read_pagination(bodies[-1])}
+
+        await client.stream_registry_pages(registry_id, add_page)
+        return bodies
+
+    def _registry_builder(self) -> RegistryBuilder:
+        return RegistryBuilder(
+            hash_content=self._manifest is not None,
+            instrumentation=self._instrumentation,
+        )
+
+    def _fetch_pages(self, client: TricountClient, registry_id: str) -> list[dict]:
+        if self._synchronizer is not None:
+            pages = [self._synchronizer.sync_snapshot(client, registry_id)]
+        else:
+            pages = list(client.iter_registry_pages(registry_id, prefetch=True))
+        self._archive_pages(registry_id, pages)
+        return pages
+
+    async def _fetch_pages_async(
+        self, client: AsyncTricountClient, registry_id: str
+    ) -> list[dict]:
+        if self._synchronizer is not None:
+            pages = [await self._synchronizer.async_sync_snapshot(client, registry_id)]
+        else:
+            pages = [
+                page
+                async for page in client.iter_registry_pages(registry_id, prefetch=True)
+            ]
+        await asyncio.to_thread(self._archive_pages, registry_id, pages)
+        return pages
+
+    def _archive_pages(self, registry_id: str, pages: list[dict]) -> None:
+        if self._archive is None:
+            return
+        with self._instrumentation.stage("archive"):
+            self._archive.add(registry_id, pages)
+
+    def _save_registry(
+        self, builder: RegistryBuilder, registry_id: str, folder: str
+    ) -> RenderResult:
+        result = _render(
+            builder,
+            folder,
+            self._saver,
+            self._instrumentation,
+            self._previous_fingerprint(registry_id),
+        )
+        self._record_render(registry_id, result)
+        return result
+
+    def _render_in_pool(self, registry_id: str) -> functools.partial[RenderResult]:
+        return functools.partial(
+            render_registry,
+            saver=self._saver,
+            hash_content=self._manifest is not None,
+            previous=self._previous_fingerprint(registry_id),
+        )
+
+    def _convert_in_pool(self, dump: str) -> functools.partial[RenderResult]:
+        return functools.partial(
+            convert_dump,
+            saver=self._saver,
+            hash_content=self._manifest is not None,
+            previous=self._previous_fingerprint(dump),
+        )
+
+    def _previous_fingerprint(self, registry_id: str) -> Fingerprint | None:
+        if self._manifest is None:
+            return None
+        return self._manifest.get(registry_id)
+
+    def _record_render(self, registry_id: str, result: RenderResult) -> None:
+        for stage, seconds in result.timings:
+            self._instrumentation.observe(stage, seconds, registry_id)
+        if result.fingerprint is not None and self._manifest is not None:
+            self._manifest.record(registry_id, result.fingerprint)
+        if self._checkpoint is not None:
+            self._checkpoint.record_done(registry_id)
+        if self._attachments is not None:
+            for url in result.attachment_urls:
+                self._attachment_urls.setdefault(url, registry_id)
+        if result.skipped:
+            print(f"registry ID '{registry_id}' unchanged, kept '{result.path}'")
+            self._count_result(registry_id, "registries_skipped")
+            return
+        print(f"registry ID '{registry_id}' saved '{result.path}'")
+        self._count_result(registry_id, "registries_saved")
+
+    def _record_conversion(self, dump: str, result: RenderResult) -> None:
+        self._record_render(dump, result)
+        size = os.path.getsize(dump)
+        # the file is read from its memory map as it is decoded, the dataframe
+        # and write stages are left out
+        seconds = sum(s for stage, s in result.timings if stage in READ_STAGES)
+        self._instrumentation.count("bytes_read", size, dump)
+        rate = size / seconds / 1e6 if seconds > 0 else float("inf")
+        print(
+            f"  read and parsed {size / 1e6:.1f} MB in {seconds:.2f}s ({rate:.1f} MB/s)"
+        )
+
+    def _download_attachments(self) -> None:
+        if (self._attachments is None) or (len(self._attachment_urls) == 0):
+            return
+        urls, self._attachment_urls = self._attachment_urls, {}
+        report = self._attachments.download(urls)
+        for url, error in report.failed.items():
+            print(f"attachment '{url}' of registry ID '{urls[url]}' failed: {error}")
+        print(
+            f"attachments: {len(report.downloaded)} downloaded, "
+            f"{len(report.skipped)} already stored, {len(report.failed)} failed"
+        )
+
+    def _record_failure(self, registry_id: str, e: Exception) -> Exception:
+        if self._checkpoint is not None:
+            self._checkpoint.record_failed(registry_id, f"{type(e).__name__}: {e}")
+        self._count_result(registry_id, "registries_failed")
+        return self._wrap_error(registry_id, e)
+
+    def _count_result(self, registry_id: str, name: str) -> None:
+        self._instrumentation.count(name, 1, registry_id)
+
+    def _render_pool(
+        self,
+    ) -> contextlib.AbstractContextManager[ProcessPoolExecutor | None]:
+        if self._render_workers is None:
+            return contextlib.nullcontext()
+        return ProcessPoolExecutor(max_workers=self._render_workers)
+
+    @staticmethod
+    def _wrap_error(registry_id: str, e: Exception) -> Exception:
+        error = Exception(f"failed to process tricount {registry_id}: {e}")
+        error.__cause__ = e
+        return error
+
+
+@dataclass
+class RenderResult:
+    """
+    Outcome of a registry render, sent back from the render process pool.
+
+    `skipped` is set when the registry matched its previous fingerprint, the
+    file at `path` was then kept as is. `attachment_urls` is filled either
+    way, so the attachments that failed to download are tried again.
+    """
+
+    path: str
+    fingerprint: Fingerprint | None
+    skipped: bool
+    timings: list[tuple[str, float]] = field(default_factory=list)
+    attachment_urls: list[str] = field(default_factory=list)
+
+
+def render_registry(
+    pages: list[dict] | list[bytes],
+    folder: str,
+    saver: RegistrySaver,
+    *,
+    hash_content: bool = False,
+    previous: Fingerprint | None = None,
+) -> RenderResult:
+    """
+    Parse and save a fetched registry, run in the render process pool.
+
+    `pages` are the response bodies, decoded here, or the pages already
+    decoded for the sync state or the archive. The result holds the stage
+    timings, to be recorded by the parent process.
+    """
+    timings = StageTimings()
+    # the decoded payloads are already held, their entries are parsed lazily
+    # one at a time, so most of that parsing is timed in the dataframe stage
+    builder = RegistryBuilder(
+        lazy=True, hash_content=hash_content, instrumentation=timings
+    )
+    for page in pages:
+        if isinstance(page, bytes):
+            builder.add_page_stream([page])
+        else:
+            builder.add_page(page)
+    result = _render(builder, folder, saver, timings, previous)
+    result.timings = timings.timings
+    return result
+
+
+def convert_dump(
+    dump: str,
+    folder: str,
+    saver: RegistrySaver,
+    *,
+    hash_content: bool = False,
+    previous: Fingerprint | None = None,
+) -> RenderResult:
+    """Parse and save a saved registry response, run in the conversion pool."""
+    timings = StageTimings()
+    builder = RegistryBuilder(hash_content=hash_content, instrumentation=timings)
+    builder.add_page_file(dump)
+    result = _render(builder, folder, saver, timings, previous)
+    result.timings = timings.timings
+    return result
+
+
+def _render(
+    builder: RegistryBuilder,
+    folder: str,
+    saver: RegistrySaver,
+    instrumentation: Instrumentation,
+    previous: Fingerprint | None,
+) -> RenderResult:
+    registry = builder.build()
+    fingerprint = None
+    if builder.content_hash is not None:
+        fingerprint = Fingerprint(
+            updated=registry.updated.isoformat(),
+            content_hash=builder.content_hash,
+            output_format=saver.output_format,
+            path=str(saver.get_path(registry, folder)),
+        )
+        if fingerprint.matches(previous):
+            return RenderResult(
+                fingerprint.path,
+                fingerprint,
+                skipped=True,
+                attachment_urls=_attachment_urls(registry),
+            )
+    with instrumentation.stage("dataframe"):
+        dfs = registry.to_dataframe(member_uuids=saver.member_uuids)
+    with instrumentation.stage("write"):
+        saved_path = saver.write(dfs, registry, folder)
+    return RenderResult(
+        saved_path,
+        fingerprint,
+        skipped=False,
+        attachment_urls=dfs["attachments"]["url"].tolist(),
+    )
+
+
+def _attachment_urls(registry: Registry) -> list[str]:
+    if isinstance(registry.entries, LazyEntries):
+        urls = registry.entries.field("urls")
+    else:
+        urls = [entry.urls for entry in registry.entries]
+    return [url for entry_urls in urls for url in entry_urls]
+
+
+def read_registry_ids(source: str) -> Iterator[str]:
+    """
+    Yield the registry IDs of a file as it is read, one ID per line, `-`
+    reads the standard input.
+
+    Blank lines and `#` comments are skipped.
+    """
+    if source == "-":
+        yield from _parse_registry_ids(sys.stdin)
+        return
+    with open(source, "r", encoding="utf-8") as f:
+        yield from _parse_registry_ids(f)
+
+
+def find_dumps(folder: str) -> Iterator[str]:
+    """Yield the `.json` files under `folder` in path order, hidden ones skipped."""
+    root = pathlib.Path(folder)
+    if not root.is_dir():
+        msg = f"no folder {folder}"
+        raise NotADirectoryError(msg)
+    for path in sorted(root.rglob("*.json")):
+        if any(part.startswith(".") for part in path.relative_to(root).parts):
+            continue
+        yield str(path)
+
+
+def _parse_registry_ids(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        if registry_id := line.split("#", 1)[0].strip():
+            yield registry_id
 
 
 def main() -> None:
     args = parse_args()
+    session_cache = (
+        SessionCache(args.session_cache) if args.session_cache is not None else None
+    )
+    if args.serve is not None:
+        return _serve(args, session_cache)
+    sync_state = (
+        SyncStateStore(args.sync_state) if args.sync_state is not None else None
+    )
+    metrics = MetricsRecorder()
+    if args.registry_id is not None:
+        registry_ids: Iterable[str] = args.registry_id
+    elif args.from_dir is not None:
+        registry_ids = find_dumps(args.from_dir)
+    else:
+        registry_ids = read_registry_ids(args.ids_from)
+    checkpoint = None
+    if args.checkpoint is not None:
+        checkpoint = CheckpointJournal(args.checkpoint)
+        if args.resume:
+            registry_ids = checkpoint.remaining(registry_ids)
+        else:
+            checkpoint.reset()
+
+    archive = (
+        RegistryArchive(args.archive, compression=args.archive_compression)
+        if args.archive is not None
+        else None
+    )
+
+    attachments = (
+        AttachmentDownloader(
+            AttachmentStore(args.attachments),
+            concurrency=args.attachment_concurrency,
+            per_host=args.attachment_per_host,
+            instrumentation=metrics,
+        )
+        if args.attachments is not None
+        else None
+    )
 
     try:
-        Processor().process(args.registry_id, args.folder)
+        saver = RegistrySaver(output_format=args.format, excel_writer=args.excel_writer)
+        processor = Processor(
+            sync_state=sync_state,
+            saver=saver,
+            render_workers=args.render_workers,
+            skip_unchanged=args.skip_unchanged,
+            max_rate=args.max_rate,
+            checkpoint=checkpoint,
+            archive=archive,
+            attachments=attachments,
+            instrumentation=metrics,
+        )
+        if args.from_dir is not None:
+            processor.convert(registry_ids, args.folder)
+        elif args.watch is not None:
+            processor.watch(
+                PollScheduler(registry_ids, interval=args.watch),
+                args.folder,
+                session_cache=session_cache,
+                after_poll=functools.partial(_write_metrics, metrics, args),
+            )
+        else:
+            processor.process(
+                registry_ids,
+                args.folder,
+                concurrency=args.concurrency,
+                session_cache=session_cache,
+            )
     except ExceptionGroup as exc:
         print(f"error occured while processing registries: {exc.exceptions}")
         return 1
+    except KeyboardInterrupt:
+        if args.watch is None:
+            raise
+    finally:
+        _write_metrics(metrics, args)
 
     return 0
 
 
+def _serve(args: argparse.Namespace, session_cache: SessionCache | None) -> int:
+    cache = RegistryCache(max_entries=args.cache_size, ttl=args.cache_ttl)
+    with TricountClient(max_rate=args.max_rate, session_cache=session_cache) as client:
+        server = RegistryServer(RegistryService(client, cache), port=args.serve)
+        host, port = server.server_address[:2]
+        print(f"serving registries on http://{host}:{port}/registries/<id>/<table>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    return 0
+
+
+def _write_metrics(metrics: MetricsRecorder, args: argparse.Namespace) -> None:
+    if args.metrics_json is not None:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prometheus is not None:
+        metrics.write_prometheus(args.metrics_prometheus)
+
+
 if __name__ == "__main__":
     exit(main())
@@ -0,0 +1,90 @@
+import json
+import os
+import pathlib
+import threading
+from dataclasses import asdict, dataclass
+
+MANIFEST_FILENAME = ".tricount-manifest.json"
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """
+    Fetched content of a registry and the file it was rendered to.
+
+    The content hash covers the response bodies as received, the `updated`
+    timestamp and the output format are kept alongside so a registry edited
+    or saved in another format is rendered again.
+    """
+
+    updated: str
+    content_hash: str
+    output_format: str
+    path: str
+
+    @classmethod
+    def from_json(cls, data: dict) -> Fingerprint:
+        return cls(
+            updated=data["updated"],
+            content_hash=data["content_hash"],
+            output_format=data["output_format"],
+            path=data["path"],
+        )
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    def matches(self, previous: Fingerprint | None) -> bool:
+        """Whether `previous` was rendered from the same content and still exists."""
+        return (previous == self) and pathlib.Path(self.path).exists()
+
+
+class RenderManifest:
+    """
+    JSON file mapping each registry ID to the `Fingerprint` of its last render.
+
+    The manifest is read once, updated in memory, possibly from several
+    threads, and written back by `save`. A missing or unreadable manifest is
+    treated as empty, every registry is then rendered.
+    """
+
+    def __init__(self, path: str | pathlib.Path):
+        self._path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._fingerprints = self._load()
+        self._changed = False
+
+    @classmethod
+    def in_folder(cls, folder: str | pathlib.Path) -> RenderManifest:
+        return cls(pathlib.Path(folder) / MANIFEST_FILENAME)
+
+    def get(self, registry_id: str) -> Fingerprint | None:
+        with self._lock:
+            return self._fingerprints.get(registry_id)
+
+    def record(self, registry_id: str, fingerprint: Fingerprint) -> None:
+        with self._lock:
+            if self._fingerprints.get(registry_id) == fingerprint:
+                return
+            self._fingerprints[registry_id] = fingerprint
+            self._changed = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._changed:
+                return
+            data = {k: v.to_json() for k, v in self._fingerprints.items()}
+            self._changed = False
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(f"{self._path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self._path)
+
+    def _load(self) -> dict[str, Fingerprint]:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {k: Fingerprint.from_json(v) for k, v in data.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
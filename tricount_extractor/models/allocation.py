@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from tricount_extractor.models.amount import Amount
+from tricount_extractor.models.member import Member, MemberTable
 import enum
 
 
@@ -8,32 +9,27 @@ class AllocationType(enum.StrEnum):
     AMOUNT = "AMOUNT"
 
 
-@dataclass
+@dataclass(slots=True)
 class Allocation:
     amount: Amount
     amount_local: Amount
-    member_uuid: str
-    member_name: str
+    member_index: int
     type: AllocationType
     share_ratio: int | None = None
 
     @classmethod
-    def from_json(cls, data: dict) -> Allocation:
-        membership = data["membership"].get(
-            "RegistryMembershipNonUser", data["membership"]
-        )
+    def from_json(cls, data: dict, members: MemberTable) -> Allocation:
         return cls(
             amount=Amount.from_json(data["amount"]),
             amount_local=Amount.from_json(data["amount_local"]),
-            member_uuid=membership["uuid"],
-            member_name=membership["alias"]["display_name"],
+            member_index=members.index(data["membership"]),
             type=AllocationType(data["type"]),
             share_ratio=data.get("share_ratio"),
         )
 
-    def to_dict(self) -> dict:
+    def to_dict(self, members: list[Member]) -> dict:
         return {
-            "participant": self.member_name,
+            "participant": members[self.member_index].display_name,
             "share": abs(self.amount.value),
             "currency": self.amount.currency,
             "original_share": abs(self.amount_local.value),
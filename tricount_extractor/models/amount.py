@@ -1,11 +1,12 @@
+import sys
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Amount:
     currency: str
     value: float
 
     @classmethod
     def from_json(cls, data: dict) -> Amount:
-        return cls(currency=data["currency"], value=float(data["value"]))
+        return cls(currency=sys.intern(data["currency"]), value=float(data["value"]))
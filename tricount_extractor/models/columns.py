@@ -0,0 +1,242 @@
+import array
+import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from tricount_extractor.models.entry import Entry
+from tricount_extractor.models.member import Member
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _int64_array() -> array.array:
+    return array.array("q")
+
+
+def _float64_array() -> array.array:
+    return array.array("d")
+
+
+@dataclass
+class EntryColumns:
+    entry_id: array.array = field(default_factory=_int64_array)
+    date: array.array = field(default_factory=_int64_array)
+    description: list[str] = field(default_factory=list)
+    amount: array.array = field(default_factory=_float64_array)
+    currency: list[str] = field(default_factory=list)
+    original_amount: array.array = field(default_factory=_float64_array)
+    original_currency: list[str] = field(default_factory=list)
+    payer: list[str] = field(default_factory=list)
+    payer_uuid: list[str] = field(default_factory=list)
+    is_reimbursement: bytearray = field(default_factory=bytearray)
+    category: list[str] = field(default_factory=list)
+
+    def to_dataframe(self, *, member_uuids: bool = False) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                "entry_id": _to_int64(self.entry_id),
+                "date": _to_datetime(self.date),
+                "description": self.description,
+                "amount": _to_float64(self.amount),
+                "currency": pd.Categorical(self.currency),
+                "original_amount": _to_float64(self.original_amount),
+                "original_currency": pd.Categorical(self.original_currency),
+                "payer": pd.Categorical(self.payer),
+                "is_reimbursement": _to_bool(self.is_reimbursement),
+                "category": pd.Categorical(self.category),
+            }
+        )
+        if member_uuids:
+            df.insert(df.columns.get_loc("payer") + 1, "payer_uuid", self.payer_uuid)
+        return df
+
+
+@dataclass
+class AllocationColumns:
+    entry_id: array.array = field(default_factory=_int64_array)
+    date: array.array = field(default_factory=_int64_array)
+    description: list[str] = field(default_factory=list)
+    payer: list[str] = field(default_factory=list)
+    payer_uuid: list[str] = field(default_factory=list)
+    is_reimbursement: bytearray = field(default_factory=bytearray)
+    participant: list[str] = field(default_factory=list)
+    member_uuid: list[str] = field(default_factory=list)
+    share: array.array = field(default_factory=_float64_array)
+    currency: list[str] = field(default_factory=list)
+    original_share: array.array = field(default_factory=_float64_array)
+    original_currency: list[str] = field(default_factory=list)
+
+    def to_dataframe(self, *, member_uuids: bool = False) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                "entry_id": _to_int64(self.entry_id),
+                "date": _to_datetime(self.date),
+                "description": self.description,
+                "payer": pd.Categorical(self.payer),
+                "is_reimbursement": _to_bool(self.is_reimbursement),
+                "participant": pd.Categorical(self.participant),
+                "share": _to_float64(self.share),
+                "currency": pd.Categorical(self.currency),
+                "original_share": _to_float64(self.original_share),
+                "original_currency": pd.Categorical(self.original_currency),
+            }
+        )
+        if member_uuids:
+            df.insert(df.columns.get_loc("payer") + 1, "payer_uuid", self.payer_uuid)
+            df.insert(
+                df.columns.get_loc("participant") + 1, "member_uuid", self.member_uuid
+            )
+        return df
+
+
+@dataclass
+class AttachmentColumns:
+    entry_id: array.array = field(default_factory=_int64_array)
+    url: list[str] = field(default_factory=list)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        if not self.url:
+            return pd.DataFrame(columns=["entry_id", "url"])
+        return pd.DataFrame({"entry_id": _to_int64(self.entry_id), "url": self.url})
+
+
+@dataclass
+class RegistryColumns:
+    """
+    Column arrays of the registry sheets, filled in one pass over the entries.
+
+    Numbers, dates and flags go to typed buffers handed to numpy without
+    copy, strings are shared with the model objects. The member UUIDs are
+    kept next to the names, which several members can share.
+    """
+
+    members: pd.Index
+    entries: EntryColumns
+    allocations: AllocationColumns
+    attachments: AttachmentColumns
+
+    @classmethod
+    def from_entries(
+        cls, members: list[Member], entries: list[Entry]
+    ) -> RegistryColumns:
+        entry_columns = EntryColumns()
+        allocation_columns = AllocationColumns()
+        attachment_columns = AttachmentColumns()
+        names = [m.display_name for m in members]
+        uuids = [m.uuid for m in members]
+        member_names = pd.Index(list(dict.fromkeys(names)))
+
+        for e in entries:
+            date = _microseconds(e.date)
+            amount = abs(e.amount.value)
+            is_reimbursement = e.is_reimbursement
+
+            entry_columns.entry_id.append(e.id)
+            entry_columns.date.append(date)
+            entry_columns.description.append(e.description)
+            entry_columns.amount.append(amount)
+            entry_columns.currency.append(e.amount.currency)
+            entry_columns.original_amount.append(abs(e.amount_local.value))
+            entry_columns.original_currency.append(e.amount_local.currency)
+            entry_columns.payer.append(e.payer_name)
+            entry_columns.payer_uuid.append(e.payer_uuid)
+            entry_columns.is_reimbursement.append(is_reimbursement)
+            entry_columns.category.append(e.category)
+
+            for a in e.allocations:
+                share = abs(a.amount.value)
+                allocation_columns.entry_id.append(e.id)
+                allocation_columns.date.append(date)
+                allocation_columns.description.append(e.description)
+                allocation_columns.payer.append(e.payer_name)
+                allocation_columns.payer_uuid.append(e.payer_uuid)
+                allocation_columns.is_reimbursement.append(is_reimbursement)
+                allocation_columns.participant.append(names[a.member_index])
+                allocation_columns.member_uuid.append(uuids[a.member_index])
+                allocation_columns.share.append(share)
+                allocation_columns.currency.append(a.amount.currency)
+                allocation_columns.original_share.append(abs(a.amount_local.value))
+                allocation_columns.original_currency.append(a.amount_local.currency)
+
+            for url in e.urls:
+                attachment_columns.entry_id.append(e.id)
+                attachment_columns.url.append(url)
+
+        return cls(member_names, entry_columns, allocation_columns, attachment_columns)
+
+    def balances(self) -> np.ndarray:
+        """Final balance of each member, in the order of `members`."""
+        paid, owed = self._member_codes()
+        size = len(self.members)
+        return np.bincount(
+            paid, weights=_to_float64(self.entries.amount), minlength=size
+        ) - np.bincount(
+            owed, weights=_to_float64(self.allocations.share), minlength=size
+        )
+
+    def balance_timeline(self) -> pd.DataFrame:
+        """
+        Cumulative balance of each member after each entry date.
+
+        One row per distinct entry date, one column per member.
+        """
+        paid, owed = self._member_codes()
+        dates = np.concatenate(
+            [_to_datetime(self.entries.date), _to_datetime(self.allocations.date)]
+        )
+        members = np.concatenate([paid, owed])
+        deltas = np.concatenate(
+            [_to_float64(self.entries.amount), -_to_float64(self.allocations.share)]
+        )
+
+        unique_dates, date_codes = np.unique(dates, return_inverse=True)
+        size = len(self.members)
+        per_date = np.bincount(
+            date_codes * size + members,
+            weights=deltas,
+            minlength=len(unique_dates) * size,
+        ).reshape(len(unique_dates), size)
+        return pd.DataFrame(
+            np.cumsum(per_date, axis=0),
+            index=pd.DatetimeIndex(unique_dates, name="date"),
+            columns=self.members,
+        )
+
+    def _member_codes(self) -> tuple[np.ndarray, np.ndarray]:
+        return (
+            self._to_member_codes(self.entries.payer),
+            self._to_member_codes(self.allocations.participant),
+        )
+
+    def _to_member_codes(self, names: list[str]) -> np.ndarray:
+        # unknown names raise a KeyError, like a lookup in a per-member dict
+        code_of = {name: code for code, name in enumerate(self.members)}
+        return np.fromiter(
+            map(code_of.__getitem__, names), dtype=np.intp, count=len(names)
+        )
+
+
+def _to_int64(values: array.array) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.int64)
+
+
+def _to_float64(values: array.array) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.float64)
+
+
+def _microseconds(date: datetime.datetime) -> int:
+    """Microseconds since the epoch, an aware date is taken in UTC."""
+    if date.tzinfo is not None:
+        date = date.astimezone(datetime.UTC).replace(tzinfo=None)
+    return (date - EPOCH) // ONE_MICROSECOND
+
+
+def _to_datetime(values: array.array) -> np.ndarray:
+    return np.frombuffer(values, dtype="datetime64[us]")
+
+
+def _to_bool(values: bytearray) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.bool_)
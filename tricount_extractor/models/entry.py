@@ -1,8 +1,11 @@
+from collections.abc import Iterator
 from dataclasses import dataclass, field
 import datetime
 import enum
+import sys
 from tricount_extractor.models.amount import Amount
 from tricount_extractor.models.allocation import Allocation
+from tricount_extractor.models.member import Member, MemberTable
 
 
 class EntryType(enum.StrEnum):
@@ -15,7 +18,7 @@ class EntryTypeTransaction(enum.StrEnum):
     INCOME = "INCOME"
 
 
-@dataclass
+@dataclass(slots=True)
 class Entry:
     id: int
     uuid: str
@@ -34,11 +37,9 @@ class Entry:
     urls: list[str] = field(default_factory=list)
 
     @classmethod
-    def from_json(cls, data: dict) -> Entry:
+    def from_json(cls, data: dict, members: MemberTable) -> Entry:
         data = data.get("RegistryEntry", data)
-        payer = data["membership_owned"].get(
-            "RegistryMembershipNonUser", data["membership_owned"]
-        )
+        payer = members.get(data["membership_owned"])
         return cls(
             id=data["id"],
             uuid=data["uuid"],
@@ -47,16 +48,54 @@ class Entry:
             description=data["description"],
             amount=Amount.from_json(data["amount"]),
             amount_local=Amount.from_json(data["amount_local"]),
-            status=data["status"],
+            status=sys.intern(data["status"]),
             type=EntryType(data["type"]),
             type_transaction=EntryTypeTransaction(data["type_transaction"]),
-            payer_uuid=payer["uuid"],
-            payer_name=payer["alias"]["display_name"],
-            allocations=[Allocation.from_json(a) for a in data["allocations"]],
+            payer_uuid=payer.uuid,
+            payer_name=payer.display_name,
+            allocations=[Allocation.from_json(a, members) for a in data["allocations"]],
             category=cls._extract_category(data),
             urls=cls._extract_attachment_urls(data),
         )
 
+    @classmethod
+    def parse_field(cls, data: dict, name: str, members: MemberTable):
+        """Parse the `name` field of an entry payload without building the entry."""
+        data = data.get("RegistryEntry", data)
+        match name:
+            case "id" | "uuid" | "description":
+                return data[name]
+            case "created" | "date":
+                return datetime.datetime.fromisoformat(data[name])
+            case "amount" | "amount_local":
+                return Amount.from_json(data[name])
+            case "status":
+                return sys.intern(data["status"])
+            case "type":
+                return EntryType(data["type"])
+            case "type_transaction":
+                return EntryTypeTransaction(data["type_transaction"])
+            case "payer_uuid":
+                return members.get(data["membership_owned"]).uuid
+            case "payer_name":
+                return members.get(data["membership_owned"]).display_name
+            case "allocations":
+                return [Allocation.from_json(a, members) for a in data["allocations"]]
+            case "category":
+                return cls._extract_category(data)
+            case "urls":
+                return cls._extract_attachment_urls(data)
+        msg = f"unknown entry field '{name}'"
+        raise AttributeError(msg)
+
+    @staticmethod
+    def memberships(data: dict) -> Iterator[dict]:
+        """Memberships an entry payload refers to, its payer first."""
+        data = data.get("RegistryEntry", data)
+        yield data["membership_owned"]
+        for allocation in data["allocations"]:
+            yield allocation["membership"]
+
     @property
     def is_reimbursement(self) -> bool:
         return self.type_transaction is EntryTypeTransaction.BALANCE
@@ -78,7 +117,7 @@ class Entry:
     def to_attachment_dicts(self) -> list[dict]:
         return [{"entry_id": self.id, "url": url} for url in self.urls]
 
-    def to_allocation_dicts(self) -> list[dict]:
+    def to_allocation_dicts(self, members: list[Member]) -> list[dict]:
         base = {
             "entry_id": self.id,
             "date": self.date,
@@ -86,7 +125,7 @@ class Entry:
             "payer": self.payer_name,
             "is_reimbursement": self.is_reimbursement,
         }
-        return [{**base, **a.to_dict()} for a in self.allocations]
+        return [{**base, **a.to_dict(members)} for a in self.allocations]
 
     @staticmethod
     def _extract_attachment_urls(data: dict) -> list[str]:
@@ -101,5 +140,5 @@ class Entry:
     @staticmethod
     def _extract_category(data: dict) -> str:
         if (custom_category := data.get("category_custom")) is not None:
-            return custom_category
-        return data.get("category", "UNCATEGORIZED")
+            return sys.intern(custom_category)
+        return sys.intern(data.get("category", "UNCATEGORIZED"))
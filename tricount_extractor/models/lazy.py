@@ -0,0 +1,66 @@
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any, overload
+
+from tricount_extractor.models.entry import Entry
+from tricount_extractor.models.member import MemberTable
+
+
+class LazyEntries(Sequence[Entry]):
+    """
+    Registry entries kept as raw payloads, parsed only when accessed.
+
+    Indexing and iterating build each `Entry` on demand without caching it,
+    so a full pass holds a single entry at a time. Slicing and `where` return
+    new views over the same payloads, and `field` parses one field alone.
+    """
+
+    __slots__ = ("_payloads", "_members")
+
+    def __init__(self, payloads: Sequence[dict], members: MemberTable):
+        self._payloads = list(payloads)
+        self._members = members
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    @overload
+    def __getitem__(self, index: int) -> Entry: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> LazyEntries: ...
+
+    def __getitem__(self, index: int | slice) -> Entry | LazyEntries:
+        if isinstance(index, slice):
+            return LazyEntries(self._payloads[index], self._members)
+        return Entry.from_json(self._payloads[index], self._members)
+
+    def __iter__(self) -> Iterator[Entry]:
+        for payload in self._payloads:
+            yield Entry.from_json(payload, self._members)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return (len(self) == len(other)) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"LazyEntries({len(self)} entries)"
+
+    def field(self, name: str) -> list:
+        """Values of one `Entry` field, parsed without building the entries."""
+        return [Entry.parse_field(p, name, self._members) for p in self._payloads]
+
+    def where(self, name: str, predicate: Callable[[Any], bool]) -> LazyEntries:
+        """Entries whose `name` field matches `predicate`, only that field is parsed."""
+        payloads = [
+            p
+            for p in self._payloads
+            if predicate(Entry.parse_field(p, name, self._members))
+        ]
+        return LazyEntries(payloads, self._members)
+
+    def extend(self, entries: LazyEntries) -> None:
+        self._payloads.extend(entries._payloads)
+
+    def materialize(self) -> list[Entry]:
+        return list(self)
@@ -1,21 +1,24 @@
+import sys
+from collections.abc import Iterable
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Member:
     id: int
     uuid: str
     display_name: str
-    status: str
+    status: str | None
 
     @classmethod
     def from_json(cls, data: dict) -> Member:
         d = data.get("RegistryMembershipNonUser", data)
+        status = d.get("status")
         return cls(
             id=d["id"],
-            uuid=d["uuid"],
-            display_name=d["alias"]["display_name"],
-            status=d["status"],
+            uuid=sys.intern(d["uuid"]),
+            display_name=sys.intern(d["alias"]["display_name"]),
+            status=sys.intern(status) if status is not None else None,
         )
 
     def to_dict(self) -> dict:
@@ -25,3 +28,35 @@ class Member:
             "member_name": self.display_name,
             "status": self.status,
         }
+
+
+class MemberTable:
+    """
+    Members of a registry, looked up by UUID.
+
+    Allocations keep the index of their member in `members` and payers reuse
+    the member strings, so each name and UUID is stored once per registry.
+    A membership only met in an entry (it has no status) is appended.
+    """
+
+    __slots__ = ("members", "_index_by_uuid")
+
+    def __init__(self):
+        self.members: list[Member] = []
+        self._index_by_uuid: dict[str, int] = {}
+
+    def update(self, memberships: Iterable[dict]) -> None:
+        for membership in memberships:
+            self.index(membership)
+
+    def index(self, membership: dict) -> int:
+        d = membership.get("RegistryMembershipNonUser", membership)
+        if (index := self._index_by_uuid.get(d["uuid"])) is not None:
+            return index
+        member = Member.from_json(d)
+        index = self._index_by_uuid[member.uuid] = len(self.members)
+        self.members.append(member)
+        return index
+
+    def get(self, membership: dict) -> Member:
+        return self.members[self.index(membership)]
@@ -1,10 +1,18 @@
+import asyncio
+import hashlib
+from collections.abc import AsyncIterable, Iterable
 from dataclasses import dataclass
 import datetime
+import numpy as np
 import pandas as pd
 import json
-from tricount_extractor.models.member import Member
+from tricount_extractor.models.columns import RegistryColumns
+from tricount_extractor.models.member import Member, MemberTable
 from tricount_extractor.models.entry import Entry
+from tricount_extractor.models.lazy import LazyEntries
 from tricount_extractor.models.pagination import Pagination
+from tricount_extractor.models.stream import RegistryStreamDecoder, iter_file_chunks
+from tricount_extractor.instrumentation import NO_INSTRUMENTATION, Instrumentation
 
 
 @dataclass
@@ -16,13 +24,32 @@ class Registry:
     created: datetime.datetime
     updated: datetime.datetime
     members: list[Member]
-    entries: list[Entry]
+    entries: list[Entry] | LazyEntries
     pagination: Pagination
 
     @classmethod
-    def from_json(cls, data: dict) -> Registry:
+    def from_json(
+        cls, data: dict, members: MemberTable | None = None, *, lazy: bool = False
+    ) -> Registry:
+        """
+        Parse a registry response.
+
+        With `lazy`, the entries are kept as raw payloads in a `LazyEntries`
+        and only parsed when accessed. The members they refer to are still
+        added to `members` here, so `members` is complete before any entry
+        is parsed.
+        """
         pagination = data["Pagination"]
         data = data["Response"][0]["Registry"]
+        members = members if members is not None else MemberTable()
+        members.update(data["memberships"])
+        raw_entries = data.get("all_registry_entry", [])
+        if lazy:
+            for raw_entry in raw_entries:
+                members.update(Entry.memberships(raw_entry))
+            entries = LazyEntries(raw_entries, members)
+        else:
+            entries = [Entry.from_json(e, members) for e in raw_entries]
 
         return cls(
             id=data["id"],
@@ -31,51 +58,234 @@ class Registry:
             currency=data["currency"],
             created=datetime.datetime.fromisoformat(data["created"]),
             updated=datetime.datetime.fromisoformat(data["updated"]),
-            members=[Member.from_json(m) for m in data["memberships"]],
-            entries=[Entry.from_json(e) for e in data.get("all_registry_entry", [])],
+            members=members.members,
+            entries=entries,
             pagination=Pagination.from_json(pagination),
         )
 
     @classmethod
-    def from_file(cls, path: str) -> Registry:
-        with open(path, "r", encoding="utf-8") as f:
-            return cls.from_json(json.load(f))
+    def from_pages(cls, pages: Iterable[dict], *, lazy: bool = False) -> Registry:
+        builder = RegistryBuilder(lazy=lazy)
+        for page in pages:
+            builder.add_page(page)
+        return builder.build()
+
+    @classmethod
+    def from_file(cls, path: str, *, lazy: bool = False) -> Registry:
+        """
+        Parse a saved registry response.
+
+        The file is memory-mapped and decoded as a stream, the raw entries are
+        never held together. With `lazy`, it is loaded in full instead and the
+        entries parsed when accessed.
+        """
+        if lazy:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_json(json.load(f), lazy=lazy)
+        builder = RegistryBuilder()
+        builder.add_page_file(path)
+        return builder.build()
 
-    def to_dataframe(self) -> dict[str, pd.DataFrame]:
+    def to_dataframe(self, *, member_uuids: bool = False) -> dict[str, pd.DataFrame]:
+        """
+        Build the registry sheets.
+
+        With `member_uuids`, the entries and allocations also get the
+        `payer_uuid` and `member_uuid` columns, to tell apart the members
+        sharing a name.
+        """
+        if not self.entries:
+            msg = f"registry {self.id} has no entry"
+            raise EmptyRegistry(msg)
+        columns = RegistryColumns.from_entries(self.members, self.entries)
         return {
             "members": self._to_members_dataframe(),
-            "entries": self._to_entries_dataframe(),
-            "allocations": self._to_allocations_dataframe(),
-            "attachments": self._to_attachments_dataframe(),
-            "balances": self._to_balance_dataframe(),
+            "entries": self._to_entries_dataframe(columns, member_uuids),
+            "allocations": self._to_allocations_dataframe(columns, member_uuids),
+            "attachments": self._to_attachments_dataframe(columns),
+            "balances": self._to_balance_dataframe(columns),
         }
 
-    def _to_entries_dataframe(self) -> pd.DataFrame:
-        rows = [e.to_dict() for e in self.entries]
-        return pd.DataFrame(rows).sort_values("date").reset_index(drop=True)
-
-    def _to_allocations_dataframe(self) -> pd.DataFrame:
-        rows = [d for e in self.entries for d in e.to_allocation_dicts()]
-        return pd.DataFrame(rows).sort_values("date").reset_index(drop=True)
-
-    def _to_balance_dataframe(self) -> pd.DataFrame:
-        balances = {m.display_name: 0.0 for m in self.members}
-        for e in self.entries:
-            balances[e.payer_name] += abs(e.amount.value)
-            for a in e.allocations:
-                balances[a.member_name] -= abs(a.amount.value)
-        rows = [{"member": k, "balance": round(v, 2)} for k, v in balances.items()]
+    @staticmethod
+    def _to_entries_dataframe(
+        columns: RegistryColumns, member_uuids: bool = False
+    ) -> pd.DataFrame:
+        df = columns.entries.to_dataframe(member_uuids=member_uuids)
+        return df.sort_values("date").reset_index(drop=True)
+
+    @staticmethod
+    def _to_allocations_dataframe(
+        columns: RegistryColumns, member_uuids: bool = False
+    ) -> pd.DataFrame:
+        df = columns.allocations.to_dataframe(member_uuids=member_uuids)
+        return df.sort_values("date").reset_index(drop=True)
+
+    @staticmethod
+    def _to_balance_dataframe(columns: RegistryColumns) -> pd.DataFrame:
         return (
-            pd.DataFrame(rows)
+            pd.DataFrame(
+                {
+                    "member": columns.members.to_numpy(),
+                    "balance": columns.balances().round(2),
+                }
+            )
             .sort_values("balance", ascending=False)
             .reset_index(drop=True)
         )
 
+    def to_balance_timeline(self) -> pd.DataFrame:
+        """Balance of each member after each entry date, one column per member."""
+        columns = RegistryColumns.from_entries(self.members, self.entries)
+        return columns.balance_timeline().round(2)
+
+    def balances_as_of(self, date: datetime.datetime) -> pd.DataFrame:
+        """Balance of each member once every entry up to `date` is counted."""
+        timeline = self.to_balance_timeline()
+        position = timeline.index.searchsorted(date, side="right")
+        if position == 0:
+            balances = np.zeros(len(timeline.columns))
+        else:
+            balances = timeline.iloc[position - 1].to_numpy()
+        return pd.DataFrame(
+            {"member": timeline.columns.to_numpy(), "balance": balances}
+        )
+
     def _to_members_dataframe(self) -> pd.DataFrame:
         return pd.DataFrame([m.to_dict() for m in self.members])
 
-    def _to_attachments_dataframe(self) -> pd.DataFrame:
-        rows = [d for e in self.entries for d in e.to_attachment_dicts()]
-        if not rows:
-            return pd.DataFrame(columns=["entry_id", "url"])
-        return pd.DataFrame(rows)
+    @staticmethod
+    def _to_attachments_dataframe(columns: RegistryColumns) -> pd.DataFrame:
+        return columns.attachments.to_dataframe()
+
+
+class RegistryBuilder:
+    """
+    Build a `Registry` from the successive pages of a registry response.
+
+    Each page is parsed as soon as it is added, so the raw page can be freed
+    before the next one is fetched. The registry metadata comes from the first
+    page, the pagination from the last one.
+
+    A page can also be added from the chunks of its response body, the entries
+    are then decoded one at a time and the raw page is never built. `lazy`
+    only applies to the pages added as dicts, streamed entries are parsed.
+
+    With `hash_content`, a SHA-256 of the added pages is kept as they come:
+    of the body chunks for the streamed pages, of their compact JSON for the
+    pages added as dicts.
+    """
+
+    def __init__(
+        self,
+        *,
+        lazy: bool = False,
+        hash_content: bool = False,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        self._registry: Registry | None = None
+        self._lazy = lazy
+        self._digest = hashlib.sha256() if hash_content else None
+        self._instrumentation = instrumentation
+        # shared by the pages so the member indexes stay the same
+        self._members = MemberTable()
+
+    @property
+    def content_hash(self) -> str | None:
+        return self._digest.hexdigest() if self._digest is not None else None
+
+    def add_page(self, data: dict) -> None:
+        if self._digest is not None:
+            content = json.dumps(data, separators=(",", ":"))
+            self._digest.update(content.encode("utf-8"))
+        with self._instrumentation.stage("parse"):
+            page = Registry.from_json(data, self._members, lazy=self._lazy)
+        self._add_registry(page)
+
+    def add_page_stream(self, chunks: Iterable[bytes]) -> dict:
+        """
+        Decode a page from its body chunks, return it without its entries.
+
+        Nothing is kept from a page whose chunks raise, so it can be streamed
+        again from the start.
+        """
+        decoder = RegistryStreamDecoder()
+        digest = self._page_digest()
+        entries = []
+        for chunk in chunks:
+            entries.extend(self._decode_chunk(decoder, chunk, digest))
+        entries.extend(self._decode_chunk(decoder, None, digest))
+        self._add_decoded_page(decoder.data, entries, digest)
+        return decoder.data
+
+    def add_page_file(self, path: str) -> dict:
+        """Decode a page from a saved response file, read from a memory map."""
+        return self.add_page_stream(iter_file_chunks(path))
+
+    async def add_page_astream(self, chunks: AsyncIterable[bytes]) -> dict:
+        decoder = RegistryStreamDecoder()
+        digest = self._page_digest()
+        entries = []
+        async for chunk in chunks:
+            entries.extend(
+                await asyncio.to_thread(self._decode_chunk, decoder, chunk, digest)
+            )
+        entries.extend(self._decode_chunk(decoder, None, digest))
+        self._add_decoded_page(decoder.data, entries, digest)
+        return decoder.data
+
+    def _page_digest(self) -> hashlib._Hash | None:
+        """Copy of the digest for a streamed page, kept once the page is added."""
+        return self._digest.copy() if self._digest is not None else None
+
+    def _decode_chunk(
+        self,
+        decoder: RegistryStreamDecoder,
+        chunk: bytes | None,
+        digest: hashlib._Hash | None,
+    ) -> list[Entry]:
+        """Feed a chunk to the decoder, `None` closes it, parse the entries."""
+        with self._instrumentation.stage("decode"):
+            if chunk is None:
+                payloads = decoder.close()
+            else:
+                if digest is not None:
+                    digest.update(chunk)
+                payloads = decoder.feed(chunk)
+        if not payloads:
+            return []
+        with self._instrumentation.stage("parse"):
+            if decoder.memberships is not None:
+                self._members.update(decoder.memberships)
+            return [Entry.from_json(p, self._members) for p in payloads]
+
+    def _add_decoded_page(
+        self, data: dict, entries: list[Entry], digest: hashlib._Hash | None
+    ) -> None:
+        with self._instrumentation.stage("parse"):
+            page = Registry.from_json(data, self._members)
+        page.entries = entries
+        self._add_registry(page)
+        self._digest = digest
+
+    def _add_registry(self, page: Registry) -> None:
+        if self._registry is None:
+            self._registry = page
+            return
+        entries = self._registry.entries
+        if isinstance(entries, LazyEntries) and not isinstance(
+            page.entries, LazyEntries
+        ):
+            # streamed pages come parsed, the lazy entries are parsed to join them
+            self._registry.entries = entries = entries.materialize()
+        entries.extend(page.entries)
+        self._registry.pagination = page.pagination
+
+    def build(self) -> Registry:
+        if self._registry is None:
+            msg = "no registry page added"
+            raise ValueError(msg)
+        return self._registry
+
+
+class EmptyRegistry(Exception):
+    """Registry without any entry"""
@@ -0,0 +1,234 @@
+import codecs
+import json
+import mmap
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+
+WHITESPACE = " \t\n\r"
+FILE_CHUNK_SIZE = 1 << 20
+ANY_INDEX = object()
+INCOMPLETE = object()
+ENTRIES_PATH = ("Response", ANY_INDEX, "Registry", "all_registry_entry")
+MEMBERSHIPS_PATH = ("Response", ANY_INDEX, "Registry", "memberships")
+PAGINATION_KEY = b'"Pagination"'
+
+
+@dataclass
+class _Frame:
+    value: dict | list
+    path: tuple
+    state: str
+    key: str | None = None
+    is_entries: bool = False
+
+
+class RegistryStreamDecoder:
+    """
+    Incremental decoder of a registry response body.
+
+    Bytes are fed chunk by chunk. Each `all_registry_entry` element is decoded
+    on its own and returned by `feed` as soon as it is complete, so the raw
+    entries never exist together. The rest of the response is kept and
+    available from `data` once the body is complete, with an empty
+    `all_registry_entry` list. `memberships` is available as soon as it is
+    decoded, before the entries in the API responses.
+    """
+
+    def __init__(self):
+        self._memberships: list[dict] | None = None
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._root: dict | None = None
+        self._is_done = False
+
+    @property
+    def memberships(self) -> list[dict] | None:
+        return self._memberships
+
+    @property
+    def data(self) -> dict:
+        if not self._is_done:
+            msg = "registry response is not complete"
+            raise ValueError(msg)
+        return self._root
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        self._buffer = self._buffer[self._pos :] + self._utf8.decode(chunk)
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> list[dict]:
+        self._buffer = self._buffer[self._pos :] + self._utf8.decode(b"", final=True)
+        self._pos = 0
+        entries = self._parse(final=True)
+        if not self._is_done:
+            msg = "truncated registry response"
+            raise ValueError(msg)
+        return entries
+
+    def _parse(self, *, final: bool) -> list[dict]:
+        entries = []
+        while True:
+            while (self._pos < len(self._buffer)) and (
+                self._buffer[self._pos] in WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos >= len(self._buffer):
+                return entries
+            if not self._step(entries, final=final):
+                return entries
+
+    def _step(self, entries: list[dict], *, final: bool) -> bool:
+        """Consume one token or value, return False when more data is needed."""
+        char = self._buffer[self._pos]
+        if not self._stack:
+            if self._is_done or (char != "{"):
+                msg = f"unexpected character {char!r} in registry response"
+                raise ValueError(msg)
+            self._root = {}
+            self._stack.append(_Frame(self._root, (), "key_or_end"))
+            self._pos += 1
+            return True
+
+        frame = self._stack[-1]
+        if frame.state in ("key_or_end", "value_or_end", "comma_or_end") and (
+            char == ("}" if isinstance(frame.value, dict) else "]")
+        ):
+            self._stack.pop()
+            self._pos += 1
+            self._is_done = not self._stack
+            return True
+        if frame.state == "comma_or_end":
+            self._expect(",")
+            frame.state = "key" if isinstance(frame.value, dict) else "value"
+            return True
+        if frame.state in ("key_or_end", "key"):
+            if (key := self._decode(final=final)) is INCOMPLETE:
+                return False
+            if not isinstance(key, str):
+                msg = "expected an object key in registry response"
+                raise ValueError(msg)
+            frame.key = key
+            frame.state = "colon"
+            return True
+        if frame.state == "colon":
+            self._expect(":")
+            frame.state = "value"
+            return True
+        return self._read_value(frame, entries, final=final)
+
+    def _read_value(self, frame: _Frame, entries: list[dict], *, final: bool) -> bool:
+        is_object = isinstance(frame.value, dict)
+        path = (*frame.path, frame.key if is_object else ANY_INDEX)
+        char = self._buffer[self._pos]
+
+        if (char in "{[") and self._is_on_entries_path(path):
+            child = {} if char == "{" else []
+            self._attach(frame, child)
+            frame.state = "comma_or_end"
+            self._stack.append(
+                _Frame(
+                    child,
+                    path,
+                    "key_or_end" if char == "{" else "value_or_end",
+                    is_entries=path == ENTRIES_PATH,
+                )
+            )
+            self._pos += 1
+            return True
+
+        if (value := self._decode(final=final)) is INCOMPLETE:
+            return False
+        if frame.is_entries:
+            entries.append(value)
+        else:
+            self._attach(frame, value)
+            if path == MEMBERSHIPS_PATH:
+                self._memberships = value
+        frame.state = "comma_or_end"
+        return True
+
+    def _decode(self, *, final: bool):
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return INCOMPLETE
+        # a number at the end of the buffer may go on in the next chunk
+        if (end == len(self._buffer)) and not final and _is_number(value):
+            return INCOMPLETE
+        self._pos = end
+        return value
+
+    def _expect(self, char: str) -> None:
+        if self._buffer[self._pos] != char:
+            found = self._buffer[self._pos]
+            msg = f"expected {char!r} in registry response, found {found!r}"
+            raise ValueError(msg)
+        self._pos += 1
+
+    @staticmethod
+    def _attach(frame: _Frame, value) -> None:
+        if isinstance(frame.value, dict):
+            frame.value[frame.key] = value
+        else:
+            frame.value.append(value)
+
+    @staticmethod
+    def _is_on_entries_path(path: tuple) -> bool:
+        if len(path) > len(ENTRIES_PATH):
+            return False
+        return all(
+            (expected is ANY_INDEX) == (part is ANY_INDEX)
+            and ((expected is ANY_INDEX) or (expected == part))
+            for part, expected in zip(path, ENTRIES_PATH)
+        )
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def read_pagination(body: bytes) -> dict:
+    """
+    Return the `Pagination` of a raw registry response without decoding it.
+
+    The API sends `Pagination` as the last key of the response, only that end
+    of the body is decoded. Any other layout decodes the whole body.
+    """
+    pos = body.rfind(PAGINATION_KEY)
+    if (pos >= 0) and body[:pos].rstrip().endswith((b",", b"{")):
+        tail = body[pos + len(PAGINATION_KEY) :].decode("utf-8").strip(WHITESPACE)
+        if tail.startswith(":") and tail.endswith("}"):
+            # the value and the closing brace of the response, nothing else
+            try:
+                pagination = json.loads(tail[1:-1])
+            except ValueError:
+                pass
+            else:
+                if isinstance(pagination, dict):
+                    return pagination
+    return json.loads(body).get("Pagination", {})
+
+
+def iter_file_chunks(
+    path: str | os.PathLike, chunk_size: int = FILE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the content of a file in chunks read from a memory map.
+
+    The pages are loaded by the OS as the chunks are sliced, the file is never
+    copied in full.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start : start + chunk_size]
@@ -1,23 +1,251 @@
 import argparse
 
+from tricount_extractor.archive import COMPRESSIONS, DEFAULT_COMPRESSION
+from tricount_extractor.attachments import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+from tricount_extractor.saver import EXCEL_WRITERS, OUTPUT_FORMATS
+from tricount_extractor.server import DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL_SECONDS
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Extract and save Tricount registries to Excel files"
     )
-    parser.add_argument(
+    registry_ids = parser.add_mutually_exclusive_group()
+    registry_ids.add_argument(
         "-id",
         "--registry-id",
         nargs="+",
-        required=True,
         help="One or more Tricount registry IDs to extract",
     )
+    registry_ids.add_argument(
+        "--ids-from",
+        action="store",
+        type=str,
+        metavar="FILE",
+        help="File with one registry ID per line, read as the batch goes, "
+        "'-' reads the standard input",
+    )
+    registry_ids.add_argument(
+        "--from-dir",
+        action="store",
+        type=str,
+        metavar="DIR",
+        help="Render the registry responses saved as .json files under this "
+        "folder, without network access",
+    )
     parser.add_argument(
         "-f",
         "--folder",
         action="store",
         type=str,
-        required=True,
+        default=None,
         help="Output folder path where registry Excel files will be saved",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        action="store",
+        type=_positive_int,
+        default=1,
+        help="Maximum number of registries fetched at the same time, the client "
+        "starts at it and backs off while the API throttles it (default: 1)",
+    )
+    parser.add_argument(
+        "--max-rate",
+        action="store",
+        type=_positive_float,
+        default=None,
+        help="Maximum number of requests per second, lowered while the API "
+        "throttles them (default: no limit)",
+    )
+    parser.add_argument(
+        "--session-cache",
+        action="store",
+        type=str,
+        default=None,
+        help="File where the API session is cached to skip authentication on "
+        "the next runs",
+    )
+    parser.add_argument(
+        "--sync-state",
+        action="store",
+        type=str,
+        default=None,
+        help="Folder keeping the last registry snapshots, only the entries "
+        "changed since the previous run are then fetched",
+    )
+    parser.add_argument(
+        "--excel-writer",
+        action="store",
+        choices=list(EXCEL_WRITERS),
+        default="openpyxl",
+        help="Excel writer backend, 'streaming' writes row by row with constant "
+        "memory (default: openpyxl)",
+    )
+    parser.add_argument(
+        "--format",
+        action="store",
+        choices=OUTPUT_FORMATS,
+        default="xlsx",
+        help="Output format of the registry tables, 'consolidated' upserts "
+        "every registry into one indexed SQLite database (default: xlsx)",
+    )
+    parser.add_argument(
+        "--render-workers",
+        action="store",
+        type=_positive_int,
+        default=None,
+        help="Parse and write the registries in a pool of this many processes "
+        "(default: in the fetching process, one per core with --from-dir)",
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Keep the files of the registries unchanged since their last "
+        "export, tracked in a manifest stored in the output folder",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Journal where the outcome of each registry is recorded as soon as "
+        "it is known, started over unless --resume is given",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the registries the checkpoint journal records as done, the "
+        "failed ones are processed again",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store",
+        type=str,
+        default=None,
+        metavar="FOLDER",
+        help="Keep every fetched registry response in a compressed archive, "
+        "each entry version stored once across the runs",
+    )
+    parser.add_argument(
+        "--archive-compression",
+        action="store",
+        choices=list(COMPRESSIONS),
+        default=DEFAULT_COMPRESSION,
+        help=f"Compression of the archived responses (default: {DEFAULT_COMPRESSION})",
+    )
+    parser.add_argument(
+        "--attachments",
+        action="store",
+        type=str,
+        default=None,
+        metavar="FOLDER",
+        help="Download the attachments of the rendered registries in this "
+        "folder, named by content hash, skipping those already downloaded",
+    )
+    parser.add_argument(
+        "--attachment-concurrency",
+        action="store",
+        type=_positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of attachments downloaded at the same time "
+        f"(default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--attachment-per-host",
+        action="store",
+        type=_positive_int,
+        default=DEFAULT_PER_HOST,
+        help="Maximum number of attachments downloaded at the same time from "
+        f"one host (default: {DEFAULT_PER_HOST})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store",
+        type=_positive_float,
+        default=None,
+        metavar="SECONDS",
+        help="Keep running and poll each registry at least once per this many "
+        "seconds, only the changed registries are rendered again",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store",
+        type=_positive_int,
+        default=None,
+        metavar="PORT",
+        help="Serve the registry tables as JSON or Parquet over HTTP on this "
+        "local port instead of saving them",
+    )
+    parser.add_argument(
+        "--cache-size",
+        action="store",
+        type=_positive_int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Maximum number of parsed registries kept in memory by --serve "
+        f"(default: {DEFAULT_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        action="store",
+        type=_positive_float,
+        default=DEFAULT_CACHE_TTL_SECONDS,
+        metavar="SECONDS",
+        help="How long --serve answers a registry from memory before fetching "
+        f"it again (default: {DEFAULT_CACHE_TTL_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        action="store",
+        type=str,
+        default=None,
+        help="File where the time spent in each stage, the retries and the bytes "
+        "received per registry are written as JSON",
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        action="store",
+        type=str,
+        default=None,
+        help="File where the same metrics are written in the Prometheus text "
+        "format, e.g. for the node exporter textfile collector",
+    )
+    args = parser.parse_args()
+    if args.serve is not None:
+        if args.watch is not None:
+            parser.error("--serve and --watch cannot be combined")
+        return args
+    if (
+        (args.registry_id is None)
+        and (args.ids_from is None)
+        and (args.from_dir is None)
+    ):
+        parser.error(
+            "one of the arguments -id/--registry-id --ids-from --from-dir is required"
+        )
+    if args.folder is None:
+        parser.error("the following arguments are required: -f/--folder")
+    if args.resume and (args.checkpoint is None):
+        parser.error("--resume needs a --checkpoint journal")
+    if (args.watch is not None) and (args.from_dir is not None):
+        parser.error("--watch polls the API, it cannot watch --from-dir")
+    if (args.watch is not None) and (args.checkpoint is not None):
+        parser.error("--watch polls the registries forever, it has no checkpoint")
+    return args
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        msg = f"expected a positive integer, got {value}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        msg = f"expected a positive number, got {value}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
@@ -1,21 +1,200 @@
+import functools
 import pathlib
+import sqlite3
+from collections.abc import Callable, Collection, Iterator
 
+import openpyxl
 import pandas as pd
+from openpyxl.cell import WriteOnlyCell
 
 from tricount_extractor.models.registry import Registry
+from tricount_extractor.store import ConsolidatedStore
 
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+ROWS_PER_CHUNK = 10_000
 
-class RegistrySaver:
-    def save(self, registry: Registry, folder: str) -> str:
-        dfs = registry.to_dataframe()
-        path = self.get_path(registry, folder)
+
+class OpenpyxlExcelWriter:
+    """Build the whole workbook in memory through `pd.ExcelWriter`."""
+
+    suffix = ".xlsx"
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
         with pd.ExcelWriter(path, engine="openpyxl") as writer:
             for sheet_name, df in dfs.items():
                 df.to_excel(writer, sheet_name=sheet_name, index=True)
+
+
+class StreamingExcelWriter:
+    """
+    Write the sheets row by row through an openpyxl write-only workbook.
+
+    Rows are serialized as soon as they are appended, no cell object is kept
+    in memory, and the columns are converted to Python values
+    `ROWS_PER_CHUNK` rows at a time. The cells hold the same values and date
+    format as `OpenpyxlExcelWriter`.
+    """
+
+    suffix = ".xlsx"
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
+        workbook = openpyxl.Workbook(write_only=True)
+        try:
+            for sheet_name, df in dfs.items():
+                sheet = workbook.create_sheet(sheet_name)
+                sheet.append([None, *df.columns])
+                datetime_cell = functools.partial(_datetime_cell, sheet)
+                for row in self._iter_rows(df, datetime_cell):
+                    sheet.append(row)
+            workbook.save(path)
+        finally:
+            workbook.close()
+
+    @classmethod
+    def _iter_rows(
+        cls, df: pd.DataFrame, datetime_cell: Callable[[object], WriteOnlyCell | None]
+    ) -> Iterator[tuple]:
+        for start in range(0, len(df), ROWS_PER_CHUNK):
+            chunk = df.iloc[start : start + ROWS_PER_CHUNK]
+            columns = [cls._to_values(chunk.index.to_series(), datetime_cell)]
+            columns.extend(cls._to_values(chunk[c], datetime_cell) for c in chunk)
+            yield from zip(*columns)
+
+    @staticmethod
+    def _to_values(
+        series: pd.Series, datetime_cell: Callable[[object], WriteOnlyCell | None]
+    ) -> Iterator:
+        values = series.astype(object).where(series.notna(), None).tolist()
+        if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return iter(values)
+        return map(datetime_cell, values)
+
+
+def _datetime_cell(sheet, value) -> WriteOnlyCell | None:
+    if value is None:
+        return None
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.number_format = DATETIME_FORMAT
+    return cell
+
+
+class ParquetWriter:
+    """Write one zstd compressed Parquet file per sheet in a folder."""
+
+    suffix = ""
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        for sheet_name, df in dfs.items():
+            df.to_parquet(
+                path / f"{sheet_name}.parquet",
+                engine="pyarrow",
+                compression="zstd",
+                index=False,
+            )
+
+
+class ArrowWriter:
+    """
+    Write one Arrow IPC (Feather v2) file per sheet in a folder.
+
+    The files are zstd compressed and can be memory-mapped by `pyarrow`.
+    """
+
+    suffix = ""
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        for sheet_name, df in dfs.items():
+            df.to_feather(path / f"{sheet_name}.arrow", compression="zstd")
+
+
+class CsvWriter:
+    """Write one CSV file per sheet in a folder."""
+
+    suffix = ""
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        for sheet_name, df in dfs.items():
+            df.to_csv(path / f"{sheet_name}.csv", index=False)
+
+
+class SqliteWriter:
+    """Write the sheets as the tables of a SQLite database."""
+
+    suffix = ".sqlite"
+
+    def write(self, dfs: dict[str, pd.DataFrame], path: pathlib.Path) -> None:
+        with sqlite3.connect(path) as connection:
+            for sheet_name, df in dfs.items():
+                df.to_sql(sheet_name, connection, if_exists="replace", index=False)
+        connection.close()
+
+
+EXCEL_WRITERS = {
+    "openpyxl": OpenpyxlExcelWriter,
+    "streaming": StreamingExcelWriter,
+}
+TABLE_WRITERS = {
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+    "csv": CsvWriter,
+    "sqlite": SqliteWriter,
+}
+CONSOLIDATED_FORMAT = "consolidated"
+CONSOLIDATED_FILENAME = "registries.sqlite"
+OUTPUT_FORMATS = ["xlsx", *TABLE_WRITERS, CONSOLIDATED_FORMAT]
+
+
+class RegistrySaver:
+    def __init__(self, *, output_format: str = "xlsx", excel_writer: str = "openpyxl"):
+        """
+        The `consolidated` format upserts every registry into one
+        `ConsolidatedStore` in the output folder instead of a file each.
+        """
+        _check_choice("output format", output_format, OUTPUT_FORMATS)
+        _check_choice("Excel writer", excel_writer, EXCEL_WRITERS)
+        self.output_format = output_format
+        self._writer = None
+        if output_format == "xlsx":
+            self._writer = EXCEL_WRITERS[excel_writer]()
+        elif output_format != CONSOLIDATED_FORMAT:
+            self._writer = TABLE_WRITERS[output_format]()
+
+    @property
+    def member_uuids(self) -> bool:
+        """Whether the sheets are to be built with their member UUID columns."""
+        return self._writer is None
+
+    def prepare(self, folder: str) -> None:
+        """
+        Create the consolidated store in `folder`, once before the registries
+        are written to it, from the process handing them out.
+        """
+        if self._writer is None:
+            ConsolidatedStore(pathlib.Path(folder) / CONSOLIDATED_FILENAME).create()
+
+    def save(self, registry: Registry, folder: str) -> str:
+        dfs = registry.to_dataframe(member_uuids=self.member_uuids)
+        return self.write(dfs, registry, folder)
+
+    def write(
+        self, dfs: dict[str, pd.DataFrame], registry: Registry, folder: str
+    ) -> str:
+        """Write the sheets built by `Registry.to_dataframe(member_uuids=...)`."""
+        path = self.get_path(registry, folder)
+        if self._writer is None:
+            ConsolidatedStore(path).upsert(registry, dfs)
+        else:
+            self._writer.write(dfs, path)
         return str(path)
 
     def get_path(self, registry: Registry, folder: str) -> pathlib.Path:
-        return pathlib.Path(folder) / f"{self._safe_filename(registry)}.xlsx"
+        if self._writer is None:
+            return pathlib.Path(folder) / CONSOLIDATED_FILENAME
+        filename = f"{self._safe_filename(registry)}{self._writer.suffix}"
+        return pathlib.Path(folder) / filename
 
     @staticmethod
     def _safe_filename(registry: Registry) -> str:
@@ -26,3 +205,11 @@ class RegistrySaver:
             .lower()
         )
         return f"{safe_title}_{registry.id}"
+
+
+def _check_choice(name: str, value: str, choices: Collection[str]) -> None:
+    if value in choices:
+        return
+    expected = ", ".join(choices)
+    msg = f"unknown {name} '{value}', expected one of: {expected}"
+    raise ValueError(msg)
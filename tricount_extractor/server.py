@@ -0,0 +1,246 @@
+import collections
+import http
+import io
+import json
+import re
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pandas as pd
+
+from tricount_extractor.client.client import TricountClient
+from tricount_extractor.models.registry import EmptyRegistry, Registry, RegistryBuilder
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_CACHE_SIZE = 128
+DEFAULT_CACHE_TTL_SECONDS = 60.0
+TABLES = ("members", "entries", "allocations", "attachments", "balances")
+CONTENT_TYPES = {
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+TABLE_PATH = re.compile(r"^/registries/(?P<registry_id>[^/]+)/(?P<table>[a-z]+)$")
+
+
+@dataclass
+class CachedRegistry:
+    """
+    A parsed registry and the tables served from it.
+
+    The tables and their encodings are built on the first request for them,
+    then reused while the registry stays in the cache.
+    """
+
+    registry: Registry
+    fetched_at: float
+    _tables: dict[str, pd.DataFrame] | None = field(default=None, repr=False)
+    _encoded: dict[tuple[str, str], bytes] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def updated(self) -> str:
+        return self.registry.updated.isoformat()
+
+    def encode(self, table: str, output_format: str) -> bytes:
+        with self._lock:
+            key = (table, output_format)
+            if (content := self._encoded.get(key)) is None:
+                content = _encode(self._table(table), output_format)
+                self._encoded[key] = content
+            return content
+
+    def _table(self, table: str) -> pd.DataFrame:
+        if self._tables is None:
+            self._tables = self.registry.to_dataframe()
+        return self._tables[table]
+
+
+class RegistryCache:
+    """
+    Least recently used parsed registries, at most `max_entries` of them,
+    each one served for `ttl` seconds after it was fetched.
+
+    A registry fetched again with the same `updated` timestamp keeps the
+    tables already built from it.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            msg = f"max_entries must be positive, got {max_entries}"
+            raise ValueError(msg)
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: collections.OrderedDict[str, CachedRegistry] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, registry_id: str) -> CachedRegistry | None:
+        """Return the registry when cached and not expired."""
+        with self._lock:
+            if (cached := self._entries.get(registry_id)) is None:
+                return None
+            if self._clock() - cached.fetched_at > self._ttl:
+                return None
+            self._entries.move_to_end(registry_id)
+            return cached
+
+    def put(self, registry_id: str, registry: Registry) -> CachedRegistry:
+        with self._lock:
+            now = self._clock()
+            previous = self._entries.get(registry_id)
+            if (previous is not None) and (
+                previous.updated == registry.updated.isoformat()
+            ):
+                previous.fetched_at = now
+                cached = previous
+            else:
+                cached = CachedRegistry(registry, now)
+            self._entries[registry_id] = cached
+            self._entries.move_to_end(registry_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            return cached
+
+
+class RegistryService:
+    """
+    Registries fetched on demand through one client and kept in a cache.
+
+    Different registries are fetched in parallel by the request threads,
+    concurrent requests for the same registry share one fetch.
+    """
+
+    def __init__(self, client: TricountClient, cache: RegistryCache | None = None):
+        self._client = client
+        self._cache = cache if cache is not None else RegistryCache()
+        self._fetch_locks: collections.defaultdict[str, threading.Lock] = (
+            collections.defaultdict(threading.Lock)
+        )
+        self._fetch_locks_lock = threading.Lock()
+
+    def registry(self, registry_id: str) -> CachedRegistry:
+        if (cached := self._cache.get(registry_id)) is not None:
+            return cached
+        with self._fetch_lock(registry_id):
+            if (cached := self._cache.get(registry_id)) is not None:
+                return cached
+            builder = RegistryBuilder()
+            self._client.stream_registry_pages(registry_id, builder.add_page_stream)
+            return self._cache.put(registry_id, builder.build())
+
+    def _fetch_lock(self, registry_id: str) -> threading.Lock:
+        with self._fetch_locks_lock:
+            return self._fetch_locks[registry_id]
+
+
+class RegistryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serve `GET /registries/<id>/<table>`, `?format=json` (default) or
+    `?format=parquet`.
+    """
+
+    server: RegistryServer
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if (match := TABLE_PATH.match(url.path)) is None:
+            self._send_error(http.HTTPStatus.NOT_FOUND, f"no route for {url.path}")
+            return
+        registry_id, table = match["registry_id"], match["table"]
+        if table not in TABLES:
+            self._send_error(http.HTTPStatus.NOT_FOUND, f"unknown table {table}")
+            return
+        output_format = parse_qs(url.query).get("format", ["json"])[-1]
+        if output_format not in CONTENT_TYPES:
+            self._send_error(
+                http.HTTPStatus.BAD_REQUEST, f"unknown format {output_format}"
+            )
+            return
+
+        try:
+            cached = self.server.service.registry(registry_id)
+            content = cached.encode(table, output_format)
+        except EmptyRegistry as e:
+            self._send_error(http.HTTPStatus.NOT_FOUND, str(e))
+            return
+        except httpx.HTTPStatusError as e:
+            status = (
+                http.HTTPStatus.NOT_FOUND
+                if e.response.status_code == httpx.codes.NOT_FOUND
+                else http.HTTPStatus.BAD_GATEWAY
+            )
+            self._send_error(status, f"failed to fetch registry {registry_id}: {e}")
+            return
+        except (ConnectionError, httpx.HTTPError) as e:
+            self._send_error(
+                http.HTTPStatus.BAD_GATEWAY,
+                f"failed to fetch registry {registry_id}: {e}",
+            )
+            return
+        except Exception as e:
+            self._send_error(
+                http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                f"failed to serve registry {registry_id}: {e}",
+            )
+            return
+
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPES[output_format])
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("X-Registry-Updated", cached.updated)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_error(self, status: http.HTTPStatus, message: str) -> None:
+        content = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES["json"])
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class RegistryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        service: RegistryService,
+        *,
+        host: str = DEFAULT_HOST,
+        port: int = 0,
+        quiet: bool = False,
+    ):
+        """`port` 0 binds a free port, read it back from `server_address`."""
+        super().__init__((host, port), RegistryRequestHandler)
+        self.service = service
+        self.quiet = quiet
+
+
+def _encode(df: pd.DataFrame, output_format: str) -> bytes:
+    if output_format == "parquet":
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, engine="pyarrow", compression="zstd", index=False)
+        return buffer.getvalue()
+    return df.to_json(orient="records", date_format="iso").encode("utf-8")
@@ -0,0 +1,225 @@
+import pathlib
+import sqlite3
+from collections.abc import Iterable, Iterator, Sequence
+
+import pandas as pd
+
+from tricount_extractor.models.registry import Registry
+
+BUSY_TIMEOUT_SECONDS = 60.0
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registries (
+    registry_id INTEGER PRIMARY KEY,
+    registry_uuid TEXT,
+    title TEXT,
+    currency TEXT,
+    created TEXT,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS members (
+    registry_id INTEGER NOT NULL,
+    member_id INTEGER,
+    member_uuid TEXT,
+    member_name TEXT,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    registry_id INTEGER NOT NULL,
+    entry_id INTEGER,
+    date TEXT,
+    description TEXT,
+    amount REAL,
+    currency TEXT,
+    original_amount REAL,
+    original_currency TEXT,
+    payer TEXT,
+    payer_uuid TEXT,
+    is_reimbursement INTEGER,
+    category TEXT
+);
+CREATE TABLE IF NOT EXISTS allocations (
+    registry_id INTEGER NOT NULL,
+    entry_id INTEGER,
+    date TEXT,
+    description TEXT,
+    payer TEXT,
+    payer_uuid TEXT,
+    is_reimbursement INTEGER,
+    category TEXT,
+    participant TEXT,
+    member_uuid TEXT,
+    share REAL,
+    currency TEXT,
+    original_share REAL,
+    original_currency TEXT
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    registry_id INTEGER NOT NULL,
+    entry_id INTEGER,
+    url TEXT
+);
+CREATE TABLE IF NOT EXISTS balances (
+    registry_id INTEGER NOT NULL,
+    member TEXT,
+    member_uuid TEXT,
+    balance REAL
+);
+CREATE INDEX IF NOT EXISTS members_registry ON members (registry_id);
+CREATE INDEX IF NOT EXISTS members_member_uuid ON members (member_uuid);
+CREATE INDEX IF NOT EXISTS entries_registry ON entries (registry_id);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS entries_payer_date ON entries (payer_uuid, date);
+CREATE INDEX IF NOT EXISTS entries_category_date ON entries (category, date);
+CREATE INDEX IF NOT EXISTS allocations_registry ON allocations (registry_id);
+CREATE INDEX IF NOT EXISTS allocations_date ON allocations (date);
+CREATE INDEX IF NOT EXISTS allocations_payer_date ON allocations (payer_uuid, date);
+CREATE INDEX IF NOT EXISTS allocations_category_date ON allocations (category, date);
+CREATE INDEX IF NOT EXISTS allocations_member_date ON allocations (member_uuid, date);
+CREATE INDEX IF NOT EXISTS attachments_registry ON attachments (registry_id);
+CREATE INDEX IF NOT EXISTS balances_registry ON balances (registry_id);
+CREATE INDEX IF NOT EXISTS balances_member_uuid ON balances (member_uuid);
+"""
+TABLES = ("members", "entries", "allocations", "attachments", "balances")
+
+
+class ConsolidatedStore:
+    """
+    SQLite database holding the tables of every registry, keyed by registry ID.
+
+    Saving a registry replaces its rows in one transaction, the other
+    registries are left as they are. The entries and allocations carry the
+    member UUIDs of their payer and participant, and the allocations the
+    category of their entry, so cross-registry queries by date, payer,
+    category or member run on indexes. Dates are stored as
+    `YYYY-MM-DD HH:MM:SS` text, which sorts and compares as dates.
+
+    `create` makes the tables once, before the registries are saved, e.g. by
+    the parent of the processes saving them: the connections then only wait
+    for the write lock of each other.
+    """
+
+    def __init__(self, path: str | pathlib.Path):
+        self._path = pathlib.Path(path)
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    def create(self) -> None:
+        """Create the database and its tables if missing, in WAL mode."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connect()
+        try:
+            # readers do not block the registries saved meanwhile
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def upsert(self, registry: Registry, dfs: dict[str, pd.DataFrame]) -> None:
+        """
+        Replace the rows of a registry.
+
+        `dfs` are the sheets of `Registry.to_dataframe(member_uuids=True)`, the
+        balances are computed again per member UUID.
+        """
+        tables = _with_categories_and_balances(dfs)
+        connection = self._connect()
+        try:
+            with connection:
+                for table in TABLES:
+                    connection.execute(
+                        f"DELETE FROM {table} WHERE registry_id = ?", (registry.id,)
+                    )
+                connection.execute(
+                    "INSERT OR REPLACE INTO registries VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        registry.id,
+                        registry.uuid,
+                        registry.title,
+                        registry.currency,
+                        registry.created.strftime(SQLITE_DATETIME_FORMAT),
+                        registry.updated.strftime(SQLITE_DATETIME_FORMAT),
+                    ),
+                )
+                for table in TABLES:
+                    _insert(connection, table, registry.id, tables[table])
+        finally:
+            connection.close()
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        connection = self._connect()
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=BUSY_TIMEOUT_SECONDS)
+
+
+def _with_categories_and_balances(
+    dfs: dict[str, pd.DataFrame],
+) -> dict[str, pd.DataFrame]:
+    entries = dfs["entries"]
+    allocations = dfs["allocations"]
+    members = dfs["members"]
+    category_of = dict(
+        zip(entries["entry_id"].tolist(), entries["category"].astype(str).tolist())
+    )
+    allocations = allocations.assign(
+        category=_map(allocations["entry_id"], category_of)
+    )
+    # per member UUID, the balances sheet merges the members sharing a name
+    uuids = members["member_uuid"]
+    paid = entries.groupby("payer_uuid")["amount"].sum()
+    owed = allocations.groupby("member_uuid")["share"].sum()
+    balance = (
+        paid.reindex(uuids, fill_value=0.0).to_numpy()
+        - owed.reindex(uuids, fill_value=0.0).to_numpy()
+    )
+    balances = (
+        pd.DataFrame(
+            {
+                "member": members["member_name"],
+                "member_uuid": uuids,
+                "balance": balance.round(2),
+            }
+        )
+        .sort_values("balance", ascending=False)
+        .reset_index(drop=True)
+    )
+    return {**dfs, "allocations": allocations, "balances": balances}
+
+
+def _map(series: pd.Series, mapping: dict) -> list:
+    return [mapping.get(value) for value in series.tolist()]
+
+
+def _insert(
+    connection: sqlite3.Connection, table: str, registry_id: int, df: pd.DataFrame
+) -> None:
+    if df.empty:
+        return
+    columns = ", ".join(["registry_id", *df.columns])
+    placeholders = ", ".join(["?"] * (len(df.columns) + 1))
+    connection.executemany(
+        f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+        ((registry_id, *row) for row in _rows(df)),
+    )
+
+
+def _rows(df: pd.DataFrame) -> Iterator[tuple]:
+    columns: list[Iterable] = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dt.strftime(SQLITE_DATETIME_FORMAT)
+        else:
+            values = series
+        # python scalars, missing values as NULL
+        columns.append(
+            [None if pd.isna(v) else v for v in values.astype(object).tolist()]
+        )
+    return zip(*columns)
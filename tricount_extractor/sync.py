@@ -0,0 +1,233 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+from collections.abc import AsyncIterable, Iterable
+from dataclasses import dataclass
+
+import httpx
+
+from tricount_extractor.client.async_client import AsyncTricountClient
+from tricount_extractor.client.client import BASE_URL, TricountClient
+from tricount_extractor.models.pagination import Pagination
+from tricount_extractor.models.registry import Registry
+
+
+@dataclass
+class SyncState:
+    """
+    Last known snapshot of a registry.
+
+    The raw registry payload is kept (entries indexed by UUID) together with
+    the content hash of each entry and the URL to poll for newer entries.
+    """
+
+    registry: dict
+    entries: dict[str, dict]
+    entry_hashes: dict[str, str]
+    cursor: str | None
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[dict]) -> SyncState:
+        state = None
+        for page in pages:
+            if state is None:
+                # the first page holds the newest entries, poll from there
+                state = cls(registry={}, entries={}, entry_hashes={}, cursor=None)
+                state.merge_page(page)
+                state.cursor = cls._cursor(page)
+                continue
+            state.merge_page(page)
+        if state is None:
+            msg = "no registry page received"
+            raise ValueError(msg)
+        return state
+
+    @classmethod
+    def from_json(cls, data: dict) -> SyncState:
+        return cls(
+            registry=data["registry"],
+            entries={cls._entry_uuid(e): e for e in data["entries"]},
+            entry_hashes=data["entry_hashes"],
+            cursor=data["cursor"],
+        )
+
+    @property
+    def updated(self) -> str | None:
+        return self.registry.get("updated")
+
+    def merge_page(self, data: dict) -> list[dict]:
+        """Merge a registry page into the snapshot, return the changed entries."""
+        registry = data["Response"][0]["Registry"]
+        self.registry = {k: v for k, v in registry.items() if k != "all_registry_entry"}
+
+        changed = []
+        for entry in registry.get("all_registry_entry", []):
+            entry_uuid = self._entry_uuid(entry)
+            entry_hash = self._entry_hash(entry)
+            if self.entry_hashes.get(entry_uuid) == entry_hash:
+                continue
+            self.entries[entry_uuid] = entry
+            self.entry_hashes[entry_uuid] = entry_hash
+            changed.append(entry)
+        return changed
+
+    def advance_cursor(self, data: dict) -> None:
+        if (cursor := self._cursor(data)) is not None:
+            self.cursor = cursor
+
+    def to_json(self) -> dict:
+        return {
+            "registry": self.registry,
+            "entries": list(self.entries.values()),
+            "entry_hashes": self.entry_hashes,
+            "cursor": self.cursor,
+        }
+
+    def to_response(self) -> dict:
+        """Rebuild the snapshot in the shape of a registry API response."""
+        registry = {**self.registry, "all_registry_entry": list(self.entries.values())}
+        return {
+            "Response": [{"Registry": registry}],
+            "Pagination": {"future_url": None, "newer_url": None, "older_url": None},
+        }
+
+    @staticmethod
+    def _cursor(data: dict) -> str | None:
+        pagination = Pagination.from_json(data.get("Pagination", {}))
+        if (url := pagination.newer_url or pagination.future_url) is None:
+            return None
+        return str(httpx.URL(BASE_URL).join(url))
+
+    @staticmethod
+    def _entry_uuid(entry: dict) -> str:
+        return entry.get("RegistryEntry", entry)["uuid"]
+
+    @staticmethod
+    def _entry_hash(entry: dict) -> str:
+        content = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SyncStateStore:
+    """Directory holding one `SyncState` JSON file per registry ID."""
+
+    def __init__(self, folder: str | pathlib.Path):
+        self._folder = pathlib.Path(folder)
+
+    def load(self, registry_id: str) -> SyncState | None:
+        try:
+            with open(self.get_path(registry_id), "r", encoding="utf-8") as f:
+                return SyncState.from_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, registry_id: str, state: SyncState) -> None:
+        path = self.get_path(registry_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state.to_json(), f)
+        os.replace(tmp_path, path)
+
+    def get_path(self, registry_id: str) -> pathlib.Path:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in registry_id)
+        return self._folder / f"{safe_id}.json"
+
+
+class RegistrySynchronizer:
+    """
+    Fetch registries incrementally against a `SyncStateStore`.
+
+    A registry seen before is refreshed from its stored cursor, so only the
+    entries newer than the last sync are downloaded and merged. The cursor
+    cannot see edits or deletions of older entries: when the registry
+    `updated` timestamp moved past the newest merged entry, something else
+    changed too and the registry is fetched in full.
+    """
+
+    def __init__(self, store: SyncStateStore):
+        self._store = store
+
+    def sync(self, client: TricountClient, registry_id: str) -> Registry:
+        return Registry.from_json(self.sync_snapshot(client, registry_id))
+
+    def sync_snapshot(self, client: TricountClient, registry_id: str) -> dict:
+        """Sync the registry, return the merged snapshot as a registry response."""
+        state = self._store.load(registry_id)
+        if (state is None) or (state.cursor is None):
+            state = self._full_sync(client, registry_id)
+        elif not self._merge(state, client.iter_newer_pages(state.cursor)):
+            state = self._full_sync(client, registry_id)
+        self._store.save(registry_id, state)
+        return state.to_response()
+
+    async def async_sync(
+        self, client: AsyncTricountClient, registry_id: str
+    ) -> Registry:
+        snapshot = await self.async_sync_snapshot(client, registry_id)
+        return await asyncio.to_thread(Registry.from_json, snapshot)
+
+    async def async_sync_snapshot(
+        self, client: AsyncTricountClient, registry_id: str
+    ) -> dict:
+        state = await asyncio.to_thread(self._store.load, registry_id)
+        if (state is None) or (state.cursor is None):
+            state = await self._async_full_sync(client, registry_id)
+        elif not await self._async_merge(state, client.iter_newer_pages(state.cursor)):
+            state = await self._async_full_sync(client, registry_id)
+        await asyncio.to_thread(self._store.save, registry_id, state)
+        return state.to_response()
+
+    @staticmethod
+    def _full_sync(client: TricountClient, registry_id: str) -> SyncState:
+        pages = client.iter_registry_pages(registry_id, prefetch=True)
+        return SyncState.from_pages(pages)
+
+    @staticmethod
+    async def _async_full_sync(
+        client: AsyncTricountClient, registry_id: str
+    ) -> SyncState:
+        pages = [
+            page
+            async for page in client.iter_registry_pages(registry_id, prefetch=True)
+        ]
+        return SyncState.from_pages(pages)
+
+    @classmethod
+    def _merge(cls, state: SyncState, pages: Iterable[dict]) -> bool:
+        """Merge the newer pages, return whether the snapshot is consistent."""
+        previous_updated = state.updated
+        changed = []
+        for page in pages:
+            changed.extend(state.merge_page(page))
+            state.advance_cursor(page)
+        return cls._is_consistent(state, previous_updated, changed)
+
+    @classmethod
+    async def _async_merge(cls, state: SyncState, pages: AsyncIterable[dict]) -> bool:
+        previous_updated = state.updated
+        changed = []
+        async for page in pages:
+            changed.extend(state.merge_page(page))
+            state.advance_cursor(page)
+        return cls._is_consistent(state, previous_updated, changed)
+
+    @staticmethod
+    def _is_consistent(
+        state: SyncState, previous_updated: str | None, changed: list[dict]
+    ) -> bool:
+        if state.updated == previous_updated:
+            return True
+        if (state.updated is None) or not changed:
+            return False
+        # an entry edited or deleted after the newest one moves `updated` further
+        newest = max(_entry_timestamp(entry) for entry in changed)
+        return datetime.datetime.fromisoformat(state.updated) <= newest
+
+
+def _entry_timestamp(entry: dict) -> datetime.datetime:
+    entry = entry.get("RegistryEntry", entry)
+    return datetime.datetime.fromisoformat(entry.get("updated") or entry["created"])
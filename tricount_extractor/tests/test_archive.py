@@ -0,0 +1,77 @@
+import copy
+import gzip
+import json
+import pathlib
+
+import pytest
+
+from tricount_extractor.archive import RegistryArchive
+
+RESPONSES_DIR = pathlib.Path(__file__).parent / "data" / "responses"
+
+
+@pytest.fixture
+def registry_page() -> dict:
+    with open(RESPONSES_DIR / "basic_registries.json") as f:
+        page = json.load(f)
+    registry = page["Response"][0]["Registry"]
+    entry = registry["all_registry_entry"][0]
+    registry["all_registry_entry"] = []
+    for i in range(3):
+        copied = copy.deepcopy(entry)
+        copied["RegistryEntry"]["uuid"] = f"entry-{i}"
+        registry["all_registry_entry"].append(copied)
+    return page
+
+
+def _entries(page: dict) -> list[dict]:
+    return page["Response"][0]["Registry"]["all_registry_entry"]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_archive_rebuilds_every_snapshot(tmp_path, registry_page, compression):
+    if compression == "zstd":
+        pytest.importorskip("compression.zstd")
+    archive = RegistryArchive(tmp_path, compression=compression)
+    edited = copy.deepcopy(registry_page)
+    _entries(edited)[1]["RegistryEntry"]["description"] = "Edited"
+    older = copy.deepcopy(edited)
+    _entries(older)[:] = _entries(older)[2:]
+    _entries(edited)[:] = _entries(edited)[:2]
+
+    first = archive.add("reg-001", [registry_page])
+    second = archive.add("reg-001", [edited, older])
+    third = archive.add("reg-001", [registry_page])
+
+    assert [(s.id, s.entries, s.new_entries) for s in (first, second, third)] == [
+        (1, 3, 3),
+        (2, 3, 1),
+        (3, 3, 0),
+    ]
+    assert archive.rebuild("reg-001", 1) == [registry_page]
+    assert archive.rebuild("reg-001", 2) == [edited, older]
+    assert archive.rebuild("reg-001") == [registry_page]
+    assert [s.id for s in archive.snapshots("reg-001")] == [1, 2, 3]
+
+
+def test_archive_stores_entries_compressed_once(tmp_path, registry_page):
+    archive = RegistryArchive(tmp_path, compression="gzip")
+
+    archive.add("reg/001", [registry_page])
+    archive.add("reg/001", [registry_page])
+
+    folder = tmp_path / "reg_001"
+    with gzip.open(folder / "000002.json.gz", "rb") as f:
+        snapshot = json.loads(f.read())
+    assert snapshot["entries"] == {}
+    assert [location for _, location in _entries(snapshot["pages"][0])] == [1, 1, 1]
+
+
+def test_archive_without_snapshot_raises(tmp_path):
+    archive = RegistryArchive(tmp_path, compression="gzip")
+
+    assert archive.snapshots("reg-001") == []
+    with pytest.raises(KeyError):
+        archive.rebuild("reg-001")
+    with pytest.raises(ValueError):
+        RegistryArchive(tmp_path, compression="lzma")
@@ -0,0 +1,174 @@
+import asyncio
+import pathlib
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from tricount_extractor.client.async_client import AsyncTricountClient
+from tricount_extractor.client.retry import BACKOFF_BASE_SECONDS, RetryPolicy
+from tricount_extractor.models.registry import RegistryBuilder
+
+RESPONSES_DIR = pathlib.Path(__file__).parent / "data" / "responses"
+
+AUTH_RESPONSE = httpx.Response(
+    200,
+    json={
+        "Response": [
+            {"Token": {"token": "tok"}},
+            {"UserPerson": {"id": "uid"}},
+        ]
+    },
+)
+REGISTRY_RESPONSE = httpx.Response(200, json={"Response": []})
+
+
+def test_get_registry_recovers_after_transient_failures():
+    registry_calls = {"n": 0}
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        registry_calls["n"] += 1
+        if registry_calls["n"] < 2:
+            raise httpx.ReadTimeout("boom")
+        return REGISTRY_RESPONSE
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            return await client.get_registry("reg-001")
+
+    with patch(
+        "tricount_extractor.client.async_client.asyncio.sleep", new=AsyncMock()
+    ) as sleep:
+        response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert registry_calls["n"] == 2
+    sleep.assert_awaited_once_with(BACKOFF_BASE_SECONDS)
+
+
+def test_get_registry_retries_after_service_unavailable():
+    registry_calls = {"n": 0}
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        registry_calls["n"] += 1
+        if registry_calls["n"] < 2:
+            return httpx.Response(503, headers={"Retry-After": "3"})
+        return REGISTRY_RESPONSE
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            return await client.get_registry("reg-001")
+
+    with patch(
+        "tricount_extractor.client.async_client.asyncio.sleep", new=AsyncMock()
+    ) as sleep:
+        response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert registry_calls["n"] == 2
+    sleep.assert_awaited_once_with(3.0)
+
+
+def test_get_registry_raises_connection_error_after_max_retry():
+    original = httpx.ReadTimeout("nope")
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        raise original
+
+    max_retry = 3
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=httpx.MockTransport(handler), max_retry=max_retry
+        ) as client:
+            await client.get_registry("reg-001")
+
+    with patch(
+        "tricount_extractor.client.async_client.asyncio.sleep", new=AsyncMock()
+    ) as sleep:
+        with pytest.raises(ConnectionError) as exc_info:
+            asyncio.run(run())
+
+    assert sleep.await_count == max_retry - 1
+    assert exc_info.value.__cause__ is original
+
+
+def test_get_registry_caps_in_flight_requests():
+    concurrency = 2
+    state = {"in_flight": 0, "peak": 0}
+
+    class SlowTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if "session-registry-installation" in str(request.url):
+                return AUTH_RESPONSE
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            return httpx.Response(200, json={"Response": []})
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=SlowTransport(), concurrency=concurrency
+        ) as client:
+            return await asyncio.gather(
+                *(client.get_registry(f"reg-{i}") for i in range(6))
+            )
+
+    responses = asyncio.run(run())
+
+    assert len(responses) == 6
+    assert state["peak"] == concurrency
+
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError):
+        AsyncTricountClient(concurrency=0)
+
+
+def test_stream_registry_pages_restarts_a_page_cut_by_a_read_error():
+    body = (RESPONSES_DIR / "basic_registries.json").read_bytes()
+    registry_calls = {"n": 0}
+
+    class CutStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield body[: len(body) // 2]
+            raise httpx.ReadError("connection reset")
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        registry_calls["n"] += 1
+        if registry_calls["n"] == 1:
+            return httpx.Response(200, stream=CutStream())
+        return httpx.Response(200, content=body)
+
+    builder = RegistryBuilder(hash_content=True)
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            await client.stream_registry_pages("reg-001", builder.add_page_astream)
+
+    with patch("tricount_extractor.client.async_client.asyncio.sleep", new=AsyncMock()):
+        asyncio.run(run())
+    expected = RegistryBuilder(hash_content=True)
+    expected.add_page_stream([body])
+
+    assert registry_calls["n"] == 2
+    assert builder.content_hash == expected.content_hash
+    assert builder.build().entries == expected.build().entries
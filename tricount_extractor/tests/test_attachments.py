@@ -0,0 +1,124 @@
+import collections
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tricount_extractor.attachments import AttachmentDownloader, AttachmentStore
+from tricount_extractor.instrumentation import MetricsRecorder
+
+
+class ImageServer(ThreadingHTTPServer):
+    """Local stand-in of the attachment hosts, tracking the requests in flight."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ImageHandler)
+        self.lock = threading.Lock()
+        self.requests: collections.Counter[str] = collections.Counter()
+        self.in_flight: collections.Counter[str] = collections.Counter()
+        self.peaks: collections.Counter[str] = collections.Counter()
+        self.peak_total = 0
+
+    def url(self, host: str, path: str) -> str:
+        return f"http://{host}:{self.server_address[1]}{path}"
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    server: ImageServer
+
+    def do_GET(self) -> None:
+        host = self.headers["Host"].split(":")[0]
+        with self.server.lock:
+            self.server.requests[self.path] += 1
+            self.server.in_flight[host] += 1
+            self.server.peaks[host] = max(
+                self.server.peaks[host], self.server.in_flight[host]
+            )
+            self.server.peak_total = max(
+                self.server.peak_total, sum(self.server.in_flight.values())
+            )
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.in_flight[host] -= 1
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # the same picture behind every /same URL
+        content = b"same" if self.path.startswith("/same") else self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def image_server():
+    server = ImageServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_downloads_are_bounded_per_host(image_server, tmp_path):
+    urls = [
+        image_server.url(host, f"/{host}-{i}.jpg")
+        for host in ["127.0.0.1", "localhost"]
+        for i in range(4)
+    ]
+    downloader = AttachmentDownloader(
+        AttachmentStore(tmp_path), concurrency=3, per_host=1
+    )
+
+    report = downloader.download(urls)
+
+    assert sorted(report.downloaded) == sorted(urls)
+    assert max(image_server.peaks.values()) == 1
+    assert image_server.peak_total == 2
+
+
+def test_downloads_are_content_addressed_and_skipped_next_time(image_server, tmp_path):
+    urls = {
+        image_server.url("127.0.0.1", "/same-1"): "reg-001",
+        image_server.url("127.0.0.1", "/same-2"): "reg-002",
+        image_server.url("127.0.0.1", "/other.JPG"): "reg-002",
+        image_server.url("127.0.0.1", "/missing.png"): "reg-002",
+    }
+    metrics = MetricsRecorder()
+
+    report = AttachmentDownloader(
+        AttachmentStore(tmp_path), instrumentation=metrics
+    ).download(urls)
+
+    assert len(report.downloaded) == 3
+    assert list(report.failed) == [image_server.url("127.0.0.1", "/missing.png")]
+    files = sorted(
+        p.name for p in tmp_path.rglob("*") if p.is_file() and p.parent != tmp_path
+    )
+    assert len(files) == 2
+    assert sorted(name.split(".")[-1] for name in files) == ["jpg", "png"]
+    counters = metrics.to_json()["registries"]["reg-002"]["counters"]
+    assert counters["attachments_downloaded"] == 2
+    assert counters["attachments_failed"] == 1
+
+    store = AttachmentStore(tmp_path)
+    report = AttachmentDownloader(store).download(urls)
+
+    assert len(report.skipped) == 3
+    assert report.downloaded == []
+    assert image_server.requests["/same-1"] == 1
+    assert image_server.requests["/missing.png"] == 2
+    stored = store.get(image_server.url("127.0.0.1", "/same-2"))
+    assert store.path_of(stored).read_bytes() == b"same"
@@ -0,0 +1,85 @@
+import json
+
+import httpx
+
+from benchmarks.generator import RegistryGenerator, RegistrySpec
+from benchmarks.suite import (
+    BenchmarkResult,
+    BenchmarkSuite,
+    compare_results,
+    read_results,
+    write_results,
+)
+from tricount_extractor.models.registry import Registry
+
+SPEC = RegistrySpec(entries=25, members=4, allocations_per_entry=2, seed=7)
+
+
+def test_generator_is_seeded():
+    assert RegistryGenerator(SPEC).generate() == RegistryGenerator(SPEC).generate()
+    other = RegistrySpec(entries=25, members=4, allocations_per_entry=2, seed=8)
+    assert RegistryGenerator(other).generate() != RegistryGenerator(SPEC).generate()
+
+
+def test_generated_registry_balances_to_zero():
+    registry = Registry.from_json(RegistryGenerator(SPEC).generate())
+
+    assert len(registry.entries) == 25
+    assert len(registry.members) == 4
+    assert all(len(e.allocations) in (1, 2) for e in registry.entries)
+    balances = registry.to_dataframe()["balances"]["balance"]
+    assert abs(balances.sum()) < 0.01
+
+
+def test_generated_pages_follow_older_url():
+    pages = list(RegistryGenerator(SPEC).iter_pages(10))
+
+    assert [len(p["Response"][0]["Registry"]["all_registry_entry"]) for p in pages] == [
+        10,
+        10,
+        5,
+    ]
+    urls = [httpx.URL(p["Pagination"]["older_url"] or "") for p in pages]
+    assert [url.params.get("page") for url in urls] == ["1", "2", None]
+    assert Registry.from_pages(pages) == Registry.from_json(
+        RegistryGenerator(SPEC).generate()
+    )
+
+
+def test_suite_writes_machine_readable_results(tmp_path):
+    suite = BenchmarkSuite(
+        spec=SPEC, repeat=1, output_formats=["csv"], log=lambda line: None
+    )
+    results = suite.run([10])
+    path = tmp_path / "results.json"
+
+    write_results(path, suite.metadata(), results)
+
+    names = [r.name for r in read_results(path)]
+    assert names == [
+        "registry.from_json",
+        "registry.columns",
+        "dataframe.members",
+        "dataframe.entries",
+        "dataframe.allocations",
+        "dataframe.attachments",
+        "dataframe.balance",
+        "saver.save.csv",
+        "processor.process.csv",
+    ]
+    content = json.loads(path.read_text())
+    assert all(
+        r["error"] is None and len(r["timings"]) == 1 for r in content["results"]
+    )
+    assert content["metadata"]["spec"]["members"] == 4
+
+
+def test_compare_results_flags_regressions():
+    baseline = [BenchmarkResult("a", 10, [1.0]), BenchmarkResult("b", 10, [1.0])]
+    current = [BenchmarkResult("a", 10, [1.05]), BenchmarkResult("b", 10, [2.0])]
+
+    lines, has_regression = compare_results(baseline, current, threshold=1.1)
+
+    assert has_regression
+    assert "REGRESSION" not in lines[0]
+    assert "REGRESSION" in lines[1]
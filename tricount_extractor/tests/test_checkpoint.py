@@ -0,0 +1,52 @@
+import json
+
+from tricount_extractor.checkpoint import DONE, FAILED, CheckpointJournal
+
+
+def test_journal_keeps_the_last_status_of_each_registry(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    journal = CheckpointJournal(path)
+    journal.record_failed("reg-001", "ConnectionError: down")
+    journal.record_done("reg-002")
+    journal.record_done("reg-001")
+
+    reloaded = CheckpointJournal(path)
+
+    assert reloaded.status("reg-001") == DONE
+    assert reloaded.status("reg-002") == DONE
+    assert reloaded.status("reg-003") is None
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["status"] for r in records] == [FAILED, DONE, DONE]
+    assert records[0]["error"] == "ConnectionError: down"
+
+
+def test_journal_yields_remaining_registries(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    journal.record_done("reg-001")
+    journal.record_failed("reg-002", "HTTPStatusError: 404")
+
+    remaining = journal.remaining(iter(["reg-001", "reg-002", "reg-003"]))
+
+    assert list(remaining) == ["reg-002", "reg-003"]
+
+
+def test_journal_ignores_a_line_cut_by_a_crash(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    journal = CheckpointJournal(path)
+    journal.record_done("reg-001")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"registry_id": "reg-002", "sta')
+
+    assert CheckpointJournal(path).status("reg-001") == DONE
+    assert CheckpointJournal(path).status("reg-002") is None
+
+
+def test_journal_reset_starts_a_new_batch(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    CheckpointJournal(path).record_done("reg-001")
+
+    journal = CheckpointJournal(path)
+    journal.reset()
+
+    assert journal.status("reg-001") is None
+    assert path.read_text() == ""
@@ -1,10 +1,28 @@
+import datetime
+import json
+import pathlib
 from unittest.mock import patch
 
 import httpx
 import pytest
 
-from tricount_extractor.client.client import BACKOFF_BASE_SECONDS, TricountClient
+from tricount_extractor.client.client import (
+    ACCESS_TOKEN_HEADER,
+    ConnectionStats,
+    TricountClient,
+)
+from tricount_extractor.client.retry import (
+    BACKOFF_BASE_SECONDS,
+    MAX_RETRY,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+)
+from tricount_extractor.client.session_cache import SessionCache
+from tricount_extractor.models.registry import RegistryBuilder
 
+RESPONSES_DIR = pathlib.Path(__file__).parent / "data" / "responses"
 
 AUTH_RESPONSE = httpx.Response(
     200,
@@ -32,7 +50,10 @@ def test_authenticate_recovers_after_transient_failures():
         return AUTH_RESPONSE
 
     with patch("tricount_extractor.client.client.time.sleep") as sleep:
-        with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
             assert client._access_token.access_token == "tok"
 
     assert calls["n"] == 3
@@ -75,7 +96,10 @@ def test_get_registry_recovers_after_transient_failures():
         return REGISTRY_RESPONSE
 
     with patch("tricount_extractor.client.client.time.sleep") as sleep:
-        with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
             response = client.get_registry("reg-001")
 
     assert response.status_code == 200
@@ -122,3 +146,419 @@ def test_get_registry_does_not_retry_on_http_error():
 
     assert calls["n"] == 1
     sleep.assert_not_called()
+
+
+def _failing_registry_handler(responses: list[httpx.Response]):
+    calls = {"n": 0}
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        calls["n"] += 1
+        if responses:
+            return responses.pop(0)
+        return REGISTRY_RESPONSE
+
+    return handler, calls
+
+
+@pytest.mark.parametrize("status_code", [429, 500, 502, 503, 504])
+def test_get_registry_retries_retryable_status(status_code):
+    handler, calls = _failing_registry_handler([httpx.Response(status_code)])
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            response = client.get_registry("reg-001")
+
+    assert response.status_code == 200
+    assert calls["n"] == 2
+    sleep.assert_called_once_with(BACKOFF_BASE_SECONDS)
+
+
+def test_get_registry_honors_retry_after():
+    handler, _ = _failing_registry_handler(
+        [
+            httpx.Response(429, headers={"Retry-After": "7"}),
+            httpx.Response(
+                503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+            ),
+        ]
+    )
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.5, rng=lambda: 1.0),
+        ) as client:
+            client.get_registry("reg-001")
+
+    # the Retry-After is a floor, the date in the past means no wait
+    assert [c.args[0] for c in sleep.call_args_list] == [7 * 1.5, 0.0]
+
+
+def test_get_registry_gives_up_on_long_retry_after():
+    handler, calls = _failing_registry_handler(
+        [httpx.Response(503, headers={"Retry-After": "3600"})]
+    )
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(httpx.HTTPStatusError) as exc_info:
+                client.get_registry("reg-001")
+
+    assert exc_info.value.response.status_code == 503
+    assert calls["n"] == 1
+    sleep.assert_not_called()
+
+
+def test_backoff_is_spread_by_jitter():
+    handler, _ = _failing_registry_handler(
+        [httpx.Response(503), httpx.Response(503), httpx.Response(503)]
+    )
+    draws = iter([0.0, 0.5, 1.0])
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.5, rng=lambda: next(draws)),
+        ) as client:
+            client.get_registry("reg-001")
+
+    assert [c.args[0] for c in sleep.call_args_list] == [
+        BACKOFF_BASE_SECONDS,
+        BACKOFF_BASE_SECONDS * 2 * 0.75,
+        BACKOFF_BASE_SECONDS * 4 * 0.5,
+    ]
+
+
+def test_retry_budget_is_shared_by_clients():
+    policy = RetryPolicy(budget=RetryBudget(ratio=0.0, reserve=1.0))
+    outcomes = [httpx.ReadTimeout("boom"), REGISTRY_RESPONSE, httpx.ReadTimeout("boom")]
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(
+            transport=httpx.MockTransport(handler), retry_policy=policy
+        ) as client:
+            client.get_registry("reg-001")
+        with TricountClient(
+            transport=httpx.MockTransport(handler), retry_policy=policy
+        ) as client:
+            with pytest.raises(ConnectionError, match="retry budget exhausted"):
+                client.get_registry("reg-002")
+
+    assert outcomes == []
+    assert sleep.call_count == 1
+
+
+def test_circuit_breaker_fails_fast_when_api_is_down():
+    now = {"t": 0.0}
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_timeout=30.0, clock=lambda: now["t"]
+    )
+    handler, calls = _failing_registry_handler([httpx.Response(503)] * 6)
+
+    with patch("tricount_extractor.client.client.time.sleep"):
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(max_attempts=2, circuit_breaker=breaker),
+        ) as client:
+            for registry_id in ("reg-001", "reg-002"):
+                with pytest.raises(httpx.HTTPStatusError):
+                    client.get_registry(registry_id)
+            assert calls["n"] == 4
+            with pytest.raises(CircuitOpenError):
+                client.get_registry("reg-003")
+            assert calls["n"] == 4
+
+            # the probe is retried, then gives up and opens the circuit again
+            now["t"] = 31.0
+            with pytest.raises(httpx.HTTPStatusError):
+                client.get_registry("reg-004")
+            assert calls["n"] == 6
+            assert breaker.is_open
+
+            now["t"] = 62.0
+            assert client.get_registry("reg-005").status_code == 200
+            assert not breaker.is_open
+
+
+def test_default_client_makes_max_retry_attempts():
+    handler, calls = _failing_registry_handler([httpx.Response(503)] * MAX_RETRY)
+
+    with patch("tricount_extractor.client.client.time.sleep") as sleep:
+        with TricountClient(transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                client.get_registry("reg-001")
+            assert client.get_registry("reg-002").status_code == 200
+
+    assert calls["n"] == MAX_RETRY + 1
+    assert sleep.call_count == MAX_RETRY - 1
+
+
+def test_client_reuses_one_connection_pool():
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        return REGISTRY_RESPONSE
+
+    with patch(
+        "tricount_extractor.client.client.httpx.Client", wraps=httpx.Client
+    ) as client_cls:
+        with TricountClient(transport=httpx.MockTransport(handler)) as client:
+            for registry_id in ("reg-001", "reg-002", "reg-003"):
+                client.get_registry(registry_id)
+
+    assert client_cls.call_count == 1
+    assert client.connection_stats.requests == 4
+
+
+def test_get_registry_outside_with_block_raises():
+    client = TricountClient(transport=httpx.MockTransport(_auth_only_handler))
+
+    with pytest.raises(RuntimeError):
+        client.get_registry("reg-001")
+
+
+def test_connection_stats_counts_connections_from_trace_events():
+    stats = ConnectionStats(requests=3)
+
+    stats.on_trace("connection.connect_tcp.started", {})
+    stats.on_trace("connection.connect_tcp.complete", {})
+    stats.on_trace("connection.start_tls.complete", {})
+
+    assert stats.connections_opened == 1
+    assert stats.tls_handshakes == 1
+    assert stats.reused_connections == 2
+
+
+def _counting_handler(calls: dict, registry_status: int = 200):
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            calls["auth"] += 1
+            return httpx.Response(
+                200,
+                json={
+                    "Response": [
+                        {"Token": {"token": f"tok-{calls['auth']}"}},
+                        {"UserPerson": {"id": "uid"}},
+                    ]
+                },
+            )
+        calls["registry"] += 1
+        if request.headers[ACCESS_TOKEN_HEADER] == "tok-1":
+            return httpx.Response(registry_status, json={"Response": []})
+        return REGISTRY_RESPONSE
+
+    return handler
+
+
+def test_session_cache_skips_authentication_on_next_run(tmp_path):
+    calls = {"auth": 0, "registry": 0}
+    transport = httpx.MockTransport(_counting_handler(calls))
+    cache = SessionCache(tmp_path / "session.json")
+
+    with TricountClient(transport=transport, session_cache=cache):
+        pass
+    with patch(
+        "tricount_extractor.client.client.generate_public_rsa_key"
+    ) as generate_key:
+        with TricountClient(transport=transport, session_cache=cache) as client:
+            client.get_registry("reg-001")
+
+    assert calls == {"auth": 1, "registry": 1}
+    generate_key.assert_not_called()
+
+
+def test_session_cache_reauthenticates_on_unauthorized(tmp_path):
+    calls = {"auth": 0, "registry": 0}
+    transport = httpx.MockTransport(_counting_handler(calls, registry_status=401))
+    cache = SessionCache(tmp_path / "session.json")
+
+    with TricountClient(transport=transport, session_cache=cache):
+        pass
+    with patch(
+        "tricount_extractor.client.client.generate_public_rsa_key"
+    ) as generate_key:
+        with TricountClient(transport=transport, session_cache=cache) as client:
+            response = client.get_registry("reg-001")
+
+    assert response.status_code == 200
+    assert calls == {"auth": 2, "registry": 2}
+    generate_key.assert_not_called()
+    assert cache.load().access_token == "tok-2"
+
+
+def test_session_cache_expired_token_keeps_key_material(tmp_path):
+    calls = {"auth": 0, "registry": 0}
+    transport = httpx.MockTransport(_counting_handler(calls))
+    cache = SessionCache(tmp_path / "session.json", ttl=datetime.timedelta(0))
+
+    with TricountClient(transport=transport, session_cache=cache) as client:
+        application_id = client._application_id
+    with TricountClient(transport=transport, session_cache=cache) as client:
+        assert client._application_id == application_id
+
+    assert calls["auth"] == 2
+
+
+def test_unauthorized_without_cached_session_is_not_retried():
+    calls = {"auth": 0, "registry": 0}
+    transport = httpx.MockTransport(_counting_handler(calls, registry_status=401))
+
+    with TricountClient(transport=transport) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            client.get_registry("reg-001")
+
+    assert calls == {"auth": 1, "registry": 1}
+
+
+def test_expired_session_reauthenticates_once_accepted():
+    calls = {"auth": 0, "registry": 0}
+    expired = {"tok-1": False}
+
+    def handler(request):
+        if "session-registry-installation" not in str(request.url):
+            token = request.headers[ACCESS_TOKEN_HEADER]
+            if expired.get(token):
+                calls["registry"] += 1
+                return httpx.Response(401)
+        return inner(request)
+
+    inner = _counting_handler(calls)
+    with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        client.get_registry("reg-001")
+        expired["tok-1"] = True
+        response = client.get_registry("reg-001")
+        expired["tok-2"] = True
+        pages = list(client.iter_newer_pages("https://example.com/registry/reg-001"))
+
+    assert response.status_code == 200
+    assert len(pages) == 1
+    assert calls == {"auth": 3, "registry": 5}
+
+
+def _paginated_handler(page_count: int, requested: list):
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        page = int(request.url.params.get("page", "0"))
+        requested.append(page)
+        older_url = None
+        if page + 1 < page_count:
+            older_url = f"/v1/user/uid/registry?page={page + 1}"
+        return httpx.Response(
+            200,
+            json={
+                "Response": [{"page": page}],
+                "Pagination": {"older_url": older_url},
+            },
+        )
+
+    return handler
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_iter_registry_pages_follows_older_url(prefetch):
+    requested = []
+    transport = httpx.MockTransport(_paginated_handler(3, requested))
+
+    with TricountClient(transport=transport) as client:
+        pages = list(client.iter_registry_pages("reg-001", prefetch=prefetch))
+
+    assert [p["Response"][0]["page"] for p in pages] == [0, 1, 2]
+    assert requested == [0, 1, 2]
+
+
+def _read_page(chunks) -> dict:
+    return json.loads(b"".join(chunks))
+
+
+def test_stream_registry_pages_follows_older_url():
+    requested = []
+    transport = httpx.MockTransport(_paginated_handler(3, requested))
+    pages = []
+
+    def add_page(chunks):
+        pages.append(_read_page(chunks))
+        return pages[-1]
+
+    with TricountClient(transport=transport) as client:
+        client.stream_registry_pages("reg-001", add_page)
+
+    assert [p["Response"][0]["page"] for p in pages] == [0, 1, 2]
+    assert requested == [0, 1, 2]
+
+
+def test_stream_registry_pages_reauthenticates_on_unauthorized(tmp_path):
+    calls = {"auth": 0, "registry": 0}
+    transport = httpx.MockTransport(_counting_handler(calls, registry_status=401))
+    cache = SessionCache(tmp_path / "session.json")
+
+    with TricountClient(transport=transport, session_cache=cache):
+        pass
+    with TricountClient(transport=transport, session_cache=cache) as client:
+        client.stream_registry_pages("reg-001", _read_page)
+
+    assert calls == {"auth": 2, "registry": 2}
+
+
+def test_stream_registry_pages_restarts_a_page_cut_by_a_read_error():
+    body = (RESPONSES_DIR / "basic_registries.json").read_bytes()
+    registry_calls = {"n": 0}
+
+    class CutStream(httpx.SyncByteStream):
+        def __iter__(self):
+            yield body[: len(body) // 2]
+            raise httpx.ReadError("connection reset")
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return AUTH_RESPONSE
+        registry_calls["n"] += 1
+        if registry_calls["n"] == 1:
+            return httpx.Response(200, stream=CutStream())
+        return httpx.Response(200, content=body)
+
+    builder = RegistryBuilder(hash_content=True)
+    with patch("tricount_extractor.client.client.time.sleep"):
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            client.stream_registry_pages("reg-001", builder.add_page_stream)
+    expected = RegistryBuilder(hash_content=True)
+    expected.add_page_stream([body])
+
+    assert registry_calls["n"] == 2
+    assert builder.content_hash == expected.content_hash
+    assert builder.build().entries == expected.build().entries
+
+
+def test_stream_registry_pages_reauthenticates_on_any_page():
+    calls = {"auth": 0, "registry": 0}
+    requested = []
+    inner = _paginated_handler(3, requested)
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return _counting_handler(calls)(request)
+        if requested and request.headers[ACCESS_TOKEN_HEADER] == "tok-1":
+            return httpx.Response(401)
+        return inner(request)
+
+    with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        client.stream_registry_pages("reg-001", _read_page)
+
+    assert calls["auth"] == 2
+    assert requested == [0, 1, 2]
@@ -0,0 +1,86 @@
+import json
+from unittest.mock import patch
+
+import httpx
+
+from tricount_extractor.client.client import TricountClient
+from tricount_extractor.instrumentation import MetricsRecorder
+
+
+def test_metrics_are_attributed_to_the_current_registry():
+    metrics = MetricsRecorder()
+
+    with metrics.registry("reg-001"):
+        with metrics.stage("fetch"):
+            pass
+        metrics.increment("bytes_received", 120)
+    metrics.increment("bytes_received", 30)
+
+    summary = metrics.to_json()
+    assert summary["registries"]["reg-001"]["stages"]["fetch"]["calls"] == 1
+    assert summary["registries"]["reg-001"]["counters"] == {"bytes_received": 120}
+    assert summary["totals"]["counters"] == {"bytes_received": 150}
+
+
+def test_prometheus_export_escapes_labels():
+    metrics = MetricsRecorder()
+    metrics.observe("write", 0.5, 'reg-"1"')
+    metrics.count("retries", 2, 'reg-"1"')
+    metrics.count("retries", 1, None)
+
+    lines = metrics.to_prometheus().splitlines()
+
+    assert "# TYPE tricount_stage_seconds_total counter" in lines
+    assert (
+        'tricount_stage_seconds_total{registry="reg-\\"1\\"",stage="write"} 0.5'
+        in lines
+    )
+    assert 'tricount_stage_calls_total{registry="reg-\\"1\\"",stage="write"} 1' in lines
+    assert "tricount_retries_total 1" in lines
+    assert 'tricount_retries_total{registry="reg-\\"1\\""} 2' in lines
+
+
+def test_metrics_files_are_written(tmp_path):
+    metrics = MetricsRecorder()
+    metrics.observe("auth", 0.25, None)
+
+    metrics.write_json(tmp_path / "metrics.json")
+    metrics.write_prometheus(tmp_path / "metrics.prom")
+
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    assert summary["totals"]["stages"]["auth"] == {"seconds": 0.25, "calls": 1}
+    assert (
+        'tricount_stage_seconds_total{stage="auth"} 0.25'
+        in (tmp_path / "metrics.prom").read_text()
+    )
+
+
+def test_client_counts_retries_and_bytes():
+    attempts = {"registry": 0}
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return httpx.Response(
+                200,
+                json={
+                    "Response": [
+                        {"Token": {"token": "tok"}},
+                        {"UserPerson": {"id": "uid"}},
+                    ]
+                },
+            )
+        attempts["registry"] += 1
+        if attempts["registry"] < 3:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, content=b'{"Response": []}')
+
+    metrics = MetricsRecorder()
+    with patch("tricount_extractor.client.client.time.sleep"):
+        with TricountClient(
+            transport=httpx.MockTransport(handler), instrumentation=metrics
+        ) as client:
+            with metrics.registry("reg-001"):
+                client.get_registry("reg-001")
+
+    counters = metrics.to_json()["registries"]["reg-001"]["counters"]
+    assert counters == {"retries": 2, "requests": 1, "bytes_received": 16}
@@ -1,12 +1,33 @@
+import asyncio
+import copy
 import json
 import pathlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from typing import Annotated
+from unittest.mock import patch
 
 import httpx
 import pandas as pd
 import pytest
 
-from tricount_extractor.main import Processor
+from tricount_extractor.archive import RegistryArchive
+from tricount_extractor.attachments import AttachmentDownloader, AttachmentStore
+from tricount_extractor.instrumentation import MetricsRecorder
+from tricount_extractor.checkpoint import DONE, FAILED, CheckpointJournal
+from tricount_extractor.client.client import ACCESS_TOKEN_HEADER
+from tricount_extractor.main import (
+    Processor,
+    RenderResult,
+    find_dumps,
+    read_registry_ids,
+)
+from tricount_extractor.manifest import MANIFEST_FILENAME
+from tricount_extractor.models.registry import Registry
+from tricount_extractor.saver import RegistrySaver
+from tricount_extractor.store import ConsolidatedStore
+from tricount_extractor.sync import SyncStateStore
+from tricount_extractor.watch import PollScheduler
 
 
 @pytest.fixture
@@ -413,3 +434,869 @@ def test_foreign_currency_shows_original_amount(
     compare_excel_files(
         generated_file, reference_excel_dir / "foreign_currency_trip_6.xlsx"
     )
+
+
+@pytest.fixture
+def transport_by_registry_id(
+    auth_response, basic_registry_data, registries_with_reimbursement_data
+):
+    responses = {
+        "reg-001": basic_registry_data,
+        "reg-002": registries_with_reimbursement_data,
+    }
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        registry_id = request.url.params["public_identifier_token"]
+        if (data := responses.get(registry_id)) is None:
+            return httpx.Response(404, json={"error": "Not found"})
+        return httpx.Response(200, json=data)
+
+    return httpx.MockTransport(handler)
+
+
+def test_process_concurrently_successfully(
+    transport_by_registry_id, tmp_path, reference_excel_dir
+):
+    processor = Processor()
+    processor.process(
+        ["reg-001", "reg-002"],
+        str(tmp_path),
+        transport=transport_by_registry_id,
+        concurrency=2,
+    )
+
+    saved_files = sorted(tmp_path.glob("*.xlsx"))
+    assert len(saved_files) == 2
+
+    for generated_file in saved_files:
+        reference_file = reference_excel_dir / generated_file.name
+        compare_excel_files(generated_file, reference_file)
+
+
+def test_process_concurrently_partial_failure_raises_exception_group(
+    transport_by_registry_id, tmp_path
+):
+    processor = Processor()
+
+    with pytest.raises(ExceptionGroup) as exc_info:
+        processor.process(
+            ["reg-001", "reg-404", "reg-002"],
+            str(tmp_path),
+            transport=transport_by_registry_id,
+            concurrency=3,
+        )
+
+    assert len(exc_info.value.exceptions) == 1
+    assert "reg-404" in str(exc_info.value.exceptions[0])
+
+    saved_files = list(tmp_path.glob("*.xlsx"))
+    assert len(saved_files) == 2
+
+
+@pytest.fixture
+def transport_paginated_income_registry(auth_response, income_registry_data):
+    registry = income_registry_data["Response"][0]["Registry"]
+    entries = registry["all_registry_entry"]
+    older_url = "/v1/user/test-user-id/registry?older_id=2"
+
+    def page(page_entries, pagination):
+        return {
+            "Response": [
+                {"Registry": {**registry, "all_registry_entry": page_entries}}
+            ],
+            "Pagination": pagination,
+        }
+
+    first_page = page(
+        entries[:2],
+        {"future_url": None, "newer_url": None, "older_url": older_url},
+    )
+    second_page = page(
+        entries[2:],
+        {"future_url": None, "newer_url": None, "older_url": None},
+    )
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        if request.url.params.get("older_id") == "2":
+            return httpx.Response(200, json=second_page)
+        return httpx.Response(200, json=first_page)
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_process_follows_registry_pagination(
+    transport_paginated_income_registry, tmp_path, reference_excel_dir, concurrency
+):
+    processor = Processor()
+    processor.process(
+        ["reg-007"],
+        str(tmp_path),
+        transport=transport_paginated_income_registry,
+        concurrency=concurrency,
+    )
+
+    saved_files = list(tmp_path.glob("*.xlsx"))
+    assert len(saved_files) == 1
+
+    generated_file = saved_files[0]
+    compare_excel_files(generated_file, reference_excel_dir / "income_trip_7.xlsx")
+
+
+@pytest.fixture
+def income_registry_sync_handler(auth_response, income_registry_data):
+    registry = income_registry_data["Response"][0]["Registry"]
+    entries = registry["all_registry_entry"]
+    future_url = "/v1/user/test-user-id/registry?newer_id=2"
+    state = {"registry": dict(registry), "entries": entries[:2], "delta": []}
+    requests = []
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        is_delta = "newer_id" in request.url.params
+        requests.append("delta" if is_delta else "full")
+        page_entries = state["delta"] if is_delta else state["entries"]
+        return httpx.Response(
+            200,
+            json={
+                "Response": [
+                    {
+                        "Registry": {
+                            **state["registry"],
+                            "all_registry_entry": page_entries,
+                        }
+                    }
+                ],
+                "Pagination": {
+                    "future_url": future_url,
+                    "newer_url": None,
+                    "older_url": None,
+                },
+            },
+        )
+
+    return handler, state, requests
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_process_sync_fetches_only_new_entries(
+    income_registry_sync_handler,
+    income_registry_data,
+    tmp_path,
+    reference_excel_dir,
+    concurrency,
+):
+    handler, state, requests = income_registry_sync_handler
+    transport = httpx.MockTransport(handler)
+    processor = Processor(sync_state=SyncStateStore(tmp_path / "state"))
+    output = tmp_path / "output"
+    output.mkdir()
+
+    processor.process(
+        ["reg-007"], str(output), transport=transport, concurrency=concurrency
+    )
+    entries = income_registry_data["Response"][0]["Registry"]["all_registry_entry"]
+    state["entries"] = entries
+    state["delta"] = entries[2:]
+    processor.process(
+        ["reg-007"], str(output), transport=transport, concurrency=concurrency
+    )
+
+    assert requests == ["full", "delta"]
+    saved_files = list(output.glob("*.xlsx"))
+    assert len(saved_files) == 1
+    compare_excel_files(saved_files[0], reference_excel_dir / "income_trip_7.xlsx")
+
+
+def test_process_sync_refetches_when_updated_without_new_entries(
+    income_registry_sync_handler, tmp_path
+):
+    handler, state, requests = income_registry_sync_handler
+    transport = httpx.MockTransport(handler)
+    processor = Processor(sync_state=SyncStateStore(tmp_path / "state"))
+
+    processor.process(["reg-007"], str(tmp_path), transport=transport)
+    state["registry"]["updated"] = "2030-01-01 00:00:00.000000"
+    processor.process(["reg-007"], str(tmp_path), transport=transport)
+
+    assert requests == ["full", "delta", "full"]
+
+
+def test_process_sync_refetches_when_an_old_entry_changed_with_a_new_one(
+    income_registry_sync_handler, income_registry_data, tmp_path
+):
+    handler, state, requests = income_registry_sync_handler
+    transport = httpx.MockTransport(handler)
+    processor = Processor(
+        saver=RegistrySaver(output_format="csv"),
+        sync_state=SyncStateStore(tmp_path / "state"),
+    )
+    state["registry"]["updated"] = "2025-01-02 10:00:00.000000"
+
+    processor.process(["reg-007"], str(tmp_path), transport=transport)
+    entries = copy.deepcopy(
+        income_registry_data["Response"][0]["Registry"]["all_registry_entry"]
+    )
+    entries[0]["RegistryEntry"]["description"] = "Edited"
+    state["registry"]["updated"] = "2025-01-03 12:00:00.000000"
+    state["entries"] = entries
+    state["delta"] = entries[2:]
+    processor.process(["reg-007"], str(tmp_path), transport=transport)
+
+    assert requests == ["full", "delta", "full"]
+    (folder,) = [p for p in tmp_path.iterdir() if p.name != "state"]
+    descriptions = pd.read_csv(folder / "entries.csv")["description"].tolist()
+    assert "Edited" in descriptions
+    assert len(descriptions) == 3
+
+
+@pytest.mark.parametrize(
+    ("response_file", "reference_file"),
+    [
+        ("basic_registries.json", "test_trip_1.xlsx"),
+        ("registries_with_reimboursement.json", "euro_trip_2.xlsx"),
+        ("unequal_registries.json", "dinner_group_3.xlsx"),
+        ("registry_with_single_attachment.json", "attachment_test_4.xlsx"),
+        ("registry_with_multiple_attachments.json", "multi_attachment_test_5.xlsx"),
+        ("registry_with_foreign_currency.json", "foreign_currency_trip_6.xlsx"),
+        ("registry_with_income.json", "income_trip_7.xlsx"),
+        ("registry_with_custom_category.json", "custom_category_trip_8.xlsx"),
+    ],
+)
+def test_streaming_excel_writer_matches_reference(
+    auth_response,
+    responses_dir,
+    reference_excel_dir,
+    tmp_path,
+    response_file,
+    reference_file,
+):
+    with open(responses_dir / response_file) as f:
+        registry_data = json.load(f)
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        return httpx.Response(200, json=registry_data)
+
+    processor = Processor(saver=RegistrySaver(excel_writer="streaming"))
+    processor.process(["reg"], str(tmp_path), transport=httpx.MockTransport(handler))
+
+    saved_files = list(tmp_path.glob("*.xlsx"))
+    assert len(saved_files) == 1
+    compare_excel_files(saved_files[0], reference_excel_dir / reference_file)
+
+
+def test_streaming_excel_writer_converts_rows_in_chunks(
+    transport_income_registry, tmp_path, reference_excel_dir, monkeypatch
+):
+    monkeypatch.setattr("tricount_extractor.saver.ROWS_PER_CHUNK", 2)
+    processor = Processor(saver=RegistrySaver(excel_writer="streaming"))
+    processor.process(["reg-007"], str(tmp_path), transport=transport_income_registry)
+
+    (saved_file,) = tmp_path.glob("*.xlsx")
+    compare_excel_files(saved_file, reference_excel_dir / "income_trip_7.xlsx")
+
+
+def read_tables(path: pathlib.Path, output_format: str) -> dict[str, pd.DataFrame]:
+    sheet_names = ["members", "entries", "allocations", "attachments", "balances"]
+    if output_format == "sqlite":
+        connection = sqlite3.connect(path)
+        try:
+            return {
+                name: pd.read_sql(
+                    f"SELECT * FROM {name}",
+                    connection,
+                    parse_dates=["date"] if name in ("entries", "allocations") else [],
+                )
+                for name in sheet_names
+            }
+        finally:
+            connection.close()
+    if output_format == "csv":
+        return {
+            name: pd.read_csv(
+                path / f"{name}.csv",
+                parse_dates=["date"] if name in ("entries", "allocations") else False,
+            )
+            for name in sheet_names
+        }
+    if output_format == "parquet":
+        return {name: pd.read_parquet(path / f"{name}.parquet") for name in sheet_names}
+    return {name: pd.read_feather(path / f"{name}.arrow") for name in sheet_names}
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow", "csv", "sqlite"])
+def test_process_writes_table_formats(
+    transport_income_registry, tmp_path, reference_excel_dir, output_format
+):
+    if output_format in ("parquet", "arrow"):
+        pytest.importorskip("pyarrow")
+    processor = Processor(saver=RegistrySaver(output_format=output_format))
+    processor.process(["reg-007"], str(tmp_path), transport=transport_income_registry)
+
+    saved_paths = list(tmp_path.iterdir())
+    assert len(saved_paths) == 1
+
+    reference_path = reference_excel_dir / "income_trip_7.xlsx"
+    for name, generated_df in read_tables(saved_paths[0], output_format).items():
+        reference_df = pd.read_excel(reference_path, sheet_name=name, index_col=0)
+        for column in generated_df.select_dtypes("category"):
+            generated_df[column] = generated_df[column].astype(str)
+        pd.testing.assert_frame_equal(
+            generated_df, reference_df.reset_index(drop=True), check_dtype=False
+        )
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_arrow_formats_keep_dtypes_and_categoricals(
+    transport_income_registry, income_registry_data, tmp_path, output_format
+):
+    pytest.importorskip("pyarrow")
+    processor = Processor(saver=RegistrySaver(output_format=output_format))
+    processor.process(["reg-007"], str(tmp_path), transport=transport_income_registry)
+
+    (saved_path,) = tmp_path.iterdir()
+    expected = Registry.from_json(income_registry_data).to_dataframe()
+    for name, df in read_tables(saved_path, output_format).items():
+        pd.testing.assert_frame_equal(df, expected[name])
+    entries = expected["entries"]
+    assert entries["entry_id"].dtype == "int64"
+    assert entries["date"].dtype == "datetime64[us]"
+    assert isinstance(entries["category"].dtype, pd.CategoricalDtype)
+
+
+@pytest.fixture
+def transport_fetch_and_render_failures(
+    auth_response,
+    basic_registry_data,
+    registries_with_reimbursement_data,
+    no_registries_data,
+):
+    responses = {
+        "reg-001": basic_registry_data,
+        "reg-002": registries_with_reimbursement_data,
+        "reg-000": no_registries_data,
+    }
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        registry_id = request.url.params["public_identifier_token"]
+        if (data := responses.get(registry_id)) is None:
+            return httpx.Response(404, json={"error": "Not found"})
+        return httpx.Response(200, json=data)
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_process_renders_in_process_pool(
+    transport_fetch_and_render_failures, tmp_path, reference_excel_dir, concurrency
+):
+    processor = Processor(render_workers=2)
+
+    with pytest.raises(ExceptionGroup) as exc_info:
+        processor.process(
+            ["reg-001", "reg-404", "reg-000", "reg-002"],
+            str(tmp_path),
+            transport=transport_fetch_and_render_failures,
+            concurrency=concurrency,
+        )
+
+    errors = [str(e) for e in exc_info.value.exceptions]
+    assert len(errors) == 2
+    assert "reg-404" in errors[0]
+    assert "reg-000" in errors[1]
+
+    saved_files = sorted(tmp_path.glob("*.xlsx"))
+    assert len(saved_files) == 2
+    for generated_file in saved_files:
+        compare_excel_files(generated_file, reference_excel_dir / generated_file.name)
+
+
+def test_process_fetches_at_full_concurrency_with_a_pool(
+    auth_response, income_registry_data, tmp_path
+):
+    state = {"in_flight": 0, "peak": 0}
+
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if "session-registry-installation" in str(request.url):
+                return auth_response
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.05)
+            state["in_flight"] -= 1
+            return httpx.Response(200, json=income_registry_data)
+
+    processor = Processor(saver=RegistrySaver(output_format="csv"), render_workers=1)
+    processor.process(
+        [f"reg-{i}" for i in range(8)],
+        str(tmp_path),
+        transport=Transport(),
+        concurrency=8,
+    )
+
+    assert state["peak"] == 8
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_pool_workers_decode_the_response_bodies(
+    transport_fetch_and_render_failures, tmp_path, concurrency
+):
+    processor = Processor(saver=RegistrySaver(output_format="csv"), render_workers=1)
+
+    submitted = []
+    submit = ProcessPoolExecutor.submit
+
+    def record_submit(pool, fn, pages, folder):
+        submitted.append(pages)
+        return submit(pool, fn, pages, folder)
+
+    with patch.object(ProcessPoolExecutor, "submit", record_submit):
+        processor.process(
+            ["reg-001"],
+            str(tmp_path),
+            transport=transport_fetch_and_render_failures,
+            concurrency=concurrency,
+        )
+
+    assert [[type(page) for page in pages] for pages in submitted] == [[bytes]]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.parametrize(
+    ("concurrency", "render_workers"), [(1, None), (3, None), (1, 2), (3, 2)]
+)
+def test_process_records_stage_metrics(
+    transport_fetch_and_render_failures, tmp_path, concurrency, render_workers
+):
+    metrics = MetricsRecorder()
+    processor = Processor(render_workers=render_workers, instrumentation=metrics)
+
+    with pytest.raises(ExceptionGroup):
+        processor.process(
+            ["reg-001", "reg-404"],
+            str(tmp_path),
+            transport=transport_fetch_and_render_failures,
+            concurrency=concurrency,
+        )
+
+    summary = metrics.to_json()
+    registries = summary["registries"]
+    assert set(registries[""]["stages"]) == {"auth"}
+    assert set(registries["reg-001"]["stages"]) >= {
+        "fetch",
+        "decode",
+        "parse",
+        "dataframe",
+        "write",
+    }
+    assert registries["reg-001"]["counters"]["registries_saved"] == 1
+    assert registries["reg-001"]["counters"]["bytes_received"] > 0
+    assert registries["reg-404"]["counters"]["registries_failed"] == 1
+    assert summary["totals"]["counters"]["requests"] == 3
+
+
+@pytest.mark.parametrize(
+    ("concurrency", "render_workers"), [(1, None), (3, None), (1, 2), (3, 2)]
+)
+def test_process_skips_unchanged_registries(
+    transport_single_success, tmp_path, capsys, concurrency, render_workers
+):
+    def process(metrics: MetricsRecorder) -> None:
+        processor = Processor(
+            render_workers=render_workers, skip_unchanged=True, instrumentation=metrics
+        )
+        processor.process(
+            ["reg-001"],
+            str(tmp_path),
+            transport=transport_single_success,
+            concurrency=concurrency,
+        )
+
+    process(MetricsRecorder())
+    saved_file = next(tmp_path.glob("*.xlsx"))
+    modified = saved_file.stat().st_mtime_ns
+    capsys.readouterr()
+    metrics = MetricsRecorder()
+    process(metrics)
+
+    assert f"unchanged, kept '{saved_file}'" in capsys.readouterr().out
+    assert saved_file.stat().st_mtime_ns == modified
+    registry = metrics.to_json()["registries"]["reg-001"]
+    assert registry["counters"]["registries_skipped"] == 1
+    assert "registries_saved" not in registry["counters"]
+    assert "dataframe" not in registry["stages"]
+    manifest = json.loads((tmp_path / MANIFEST_FILENAME).read_text())
+    assert manifest["reg-001"]["path"] == str(saved_file)
+
+
+def test_process_rerenders_changed_or_missing_registries(
+    auth_response, basic_registry_data, tmp_path, capsys
+):
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        return httpx.Response(200, json=basic_registry_data)
+
+    transport = httpx.MockTransport(handler)
+    processor = Processor(skip_unchanged=True)
+
+    processor.process(["reg-001"], str(tmp_path), transport=transport)
+    entries = basic_registry_data["Response"][0]["Registry"]["all_registry_entry"]
+    entries[0]["RegistryEntry"]["description"] = "Edited"
+    processor.process(["reg-001"], str(tmp_path), transport=transport)
+    saved_file = next(tmp_path.glob("*.xlsx"))
+    saved_file.unlink()
+    processor.process(["reg-001"], str(tmp_path), transport=transport)
+    processor.process(["reg-001"], str(tmp_path), transport=transport)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split("'")[2].strip() for line in lines] == [
+        "saved",
+        "saved",
+        "saved",
+        "unchanged, kept",
+    ]
+    assert saved_file.exists()
+
+
+def test_process_skips_unchanged_synced_registry(
+    income_registry_sync_handler, tmp_path, capsys
+):
+    handler, _, requests = income_registry_sync_handler
+    transport = httpx.MockTransport(handler)
+    processor = Processor(
+        sync_state=SyncStateStore(tmp_path / "state"), skip_unchanged=True
+    )
+    output = tmp_path / "output"
+    output.mkdir()
+
+    processor.process(["reg-007"], str(output), transport=transport)
+    processor.process(["reg-007"], str(output), transport=transport)
+
+    assert requests == ["full", "delta"]
+    assert "unchanged" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_read_registry_ids_skips_blank_lines_and_comments(tmp_path):
+    path = tmp_path / "ids.txt"
+    path.write_text("reg-001\n\n# batch 2\n  reg-002  # retried\nreg-003")
+
+    assert list(read_registry_ids(str(path))) == ["reg-001", "reg-002", "reg-003"]
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_process_resumes_from_checkpoint(
+    auth_response, basic_registry_data, tmp_path, concurrency
+):
+    failing = {"reg-002"}
+    requested = []
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return auth_response
+        registry_id = request.url.params["public_identifier_token"]
+        requested.append(registry_id)
+        if registry_id in failing:
+            return httpx.Response(404, json={"error": "Not found"})
+        return httpx.Response(200, json=basic_registry_data)
+
+    transport = httpx.MockTransport(handler)
+    path = tmp_path / "checkpoint.jsonl"
+    registry_ids = ["reg-001", "reg-002", "reg-003"]
+    journal = CheckpointJournal(path)
+
+    with pytest.raises(ExceptionGroup):
+        Processor(checkpoint=journal).process(
+            iter(registry_ids),
+            str(tmp_path),
+            transport=transport,
+            concurrency=concurrency,
+        )
+    assert [journal.status(i) for i in registry_ids] == [DONE, FAILED, DONE]
+
+    failing.clear()
+    requested.clear()
+    journal = CheckpointJournal(path)
+    Processor(checkpoint=journal).process(
+        journal.remaining(iter(registry_ids)),
+        str(tmp_path),
+        transport=transport,
+        concurrency=concurrency,
+    )
+
+    assert requested == ["reg-002"]
+    assert [journal.status(i) for i in registry_ids] == [DONE, DONE, DONE]
+
+
+class _StopWatch(Exception):
+    pass
+
+
+def test_watch_renders_changed_registries_and_renews_session(
+    basic_registry_data, tmp_path, capsys
+):
+    tokens = []
+    expired = set()
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            tokens.append(f"tok-{len(tokens) + 1}")
+            return httpx.Response(
+                200,
+                json={
+                    "Response": [
+                        {"Token": {"token": tokens[-1]}},
+                        {"UserPerson": {"id": "uid"}},
+                    ]
+                },
+            )
+        if request.headers[ACCESS_TOKEN_HEADER] in expired:
+            return httpx.Response(401)
+        if request.url.params["public_identifier_token"] == "reg-002":
+            return httpx.Response(404, json={"error": "Not found"})
+        return httpx.Response(200, json=basic_registry_data)
+
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    scheduler = PollScheduler(
+        ["reg-001", "reg-002"], interval=10.0, clock=lambda: now[0], sleep=sleep
+    )
+    polls = []
+
+    def after_poll() -> None:
+        polls.append(now[0])
+        # the session expires after the first poll
+        expired.add("tok-1")
+        if len(polls) == 3:
+            raise _StopWatch
+
+    with pytest.raises(_StopWatch):
+        Processor().watch(
+            scheduler,
+            str(tmp_path),
+            transport=httpx.MockTransport(handler),
+            after_poll=after_poll,
+        )
+
+    out = capsys.readouterr().out
+    assert "failed to process tricount reg-002" in out
+    lines = [line for line in out.splitlines() if "registry ID 'reg-001'" in line]
+    assert "saved" in lines[0]
+    assert "unchanged, kept" in lines[1]
+    assert polls == [0.0, 5.0, 10.0]
+    assert sleeps == [5.0, 5.0]
+    assert tokens == ["tok-1", "tok-2"]
+    assert "reg-001" in json.loads((tmp_path / MANIFEST_FILENAME).read_text())
+
+
+def test_convert_renders_saved_dumps_in_pool(
+    responses_dir, reference_excel_dir, tmp_path, capsys
+):
+    dumps = tmp_path / "dumps"
+    (dumps / "2024").mkdir(parents=True)
+    (dumps / ".cache").mkdir()
+    for name, target in [
+        ("basic_registries.json", "2024/basic.json"),
+        ("registries_with_reimboursement.json", "reimbursement.json"),
+        ("basic_registries.json", ".cache/hidden.json"),
+    ]:
+        (dumps / target).write_bytes((responses_dir / name).read_bytes())
+    (dumps / "truncated.json").write_text('{"Response": [{"Registry": ')
+    output = tmp_path / "output"
+    output.mkdir()
+    metrics = MetricsRecorder()
+    processor = Processor(
+        render_workers=2, skip_unchanged=True, instrumentation=metrics
+    )
+
+    found = list(find_dumps(str(dumps)))
+    with pytest.raises(ExceptionGroup) as exc_info:
+        processor.convert(found, str(output))
+
+    assert [pathlib.Path(d).relative_to(dumps).as_posix() for d in found] == [
+        "2024/basic.json",
+        "reimbursement.json",
+        "truncated.json",
+    ]
+    assert len(exc_info.value.exceptions) == 1
+    assert "truncated.json" in str(exc_info.value.exceptions[0])
+    saved_files = sorted(output.glob("*.xlsx"))
+    assert [f.name for f in saved_files] == ["euro_trip_2.xlsx", "test_trip_1.xlsx"]
+    for generated_file in saved_files:
+        compare_excel_files(generated_file, reference_excel_dir / generated_file.name)
+    out = capsys.readouterr().out
+    assert out.count("read and parsed") == out.count("MB/s)") == 2
+    summary = metrics.to_json()["registries"][found[0]]
+    assert (
+        summary["counters"]["bytes_read"] == (dumps / "2024/basic.json").stat().st_size
+    )
+
+    processor.convert(found[:2], str(output))
+
+    assert capsys.readouterr().out.count("unchanged, kept") == 2
+
+
+def test_conversion_throughput_leaves_out_the_write(tmp_path, capsys):
+    dump = tmp_path / "dump.json"
+    dump.write_bytes(b" " * 2_000_000)
+    result = RenderResult(
+        str(tmp_path / "out.xlsx"),
+        None,
+        skipped=False,
+        timings=[("decode", 0.5), ("parse", 1.5), ("dataframe", 3.0), ("write", 20.0)],
+    )
+
+    Processor()._record_conversion(str(dump), result)
+
+    assert "read and parsed 2.0 MB in 2.00s (1.0 MB/s)" in capsys.readouterr().out
+
+
+def test_registry_from_file_matches_lazy_load(responses_dir):
+    path = str(responses_dir / "basic_registries.json")
+
+    registry = Registry.from_file(path)
+    lazy = Registry.from_file(path, lazy=True)
+
+    assert registry.title == lazy.title
+    assert [e.id for e in registry.entries] == [e.id for e in lazy.entries]
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_process_archives_fetched_responses(
+    transport_single_success, basic_registry_data, tmp_path, concurrency
+):
+    archive = RegistryArchive(tmp_path / "archive", compression="gzip")
+    output = tmp_path / "output"
+    output.mkdir()
+    processor = Processor(archive=archive)
+
+    for _ in range(2):
+        processor.process(
+            ["reg-001"],
+            str(output),
+            transport=transport_single_success,
+            concurrency=concurrency,
+        )
+
+    snapshots = archive.snapshots("reg-001")
+    assert [s.new_entries for s in snapshots] == [1, 0]
+    assert archive.rebuild("reg-001", 1) == [basic_registry_data]
+    assert len(list(output.glob("*.xlsx"))) == 1
+
+
+@pytest.mark.parametrize("render_workers", [None, 2])
+def test_process_downloads_attachments(
+    transport_multiple_attachments, multiple_attachments_data, tmp_path, render_workers
+):
+    downloaded = []
+
+    def handler(request):
+        downloaded.append(str(request.url))
+        return httpx.Response(200, content=str(request.url).encode())
+
+    store = AttachmentStore(tmp_path / "attachments")
+    processor = Processor(
+        render_workers=render_workers,
+        attachments=AttachmentDownloader(store, transport=httpx.MockTransport(handler)),
+    )
+    output = tmp_path / "output"
+    output.mkdir()
+
+    processor.process(
+        ["reg-005"], str(output), transport=transport_multiple_attachments
+    )
+    processor.process(
+        ["reg-005"], str(output), transport=transport_multiple_attachments
+    )
+
+    entries = multiple_attachments_data["Response"][0]["Registry"]["all_registry_entry"]
+    urls = {
+        url["url"]
+        for entry in entries
+        for attachment in entry["RegistryEntry"].get("attachment", [])
+        for url in attachment["urls"]
+    }
+    assert len(urls) > 1
+    assert sorted(downloaded) == sorted(urls)
+    assert all(store.get(url) is not None for url in urls)
+
+
+@pytest.mark.parametrize("render_workers", [None, 2])
+def test_process_retries_failed_attachments_of_unchanged_registries(
+    transport_multiple_attachments, tmp_path, render_workers
+):
+    requests = []
+
+    def handler(request):
+        requests.append(str(request.url))
+        # the very first download fails
+        if len(requests) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, content=str(request.url).encode())
+
+    store = AttachmentStore(tmp_path / "attachments")
+    processor = Processor(
+        render_workers=render_workers,
+        skip_unchanged=True,
+        attachments=AttachmentDownloader(store, transport=httpx.MockTransport(handler)),
+    )
+    output = tmp_path / "output"
+    output.mkdir()
+
+    processor.process(
+        ["reg-005"], str(output), transport=transport_multiple_attachments
+    )
+    failed = requests[0]
+    assert store.get(failed) is None
+    processor.process(
+        ["reg-005"], str(output), transport=transport_multiple_attachments
+    )
+
+    assert requests.count(failed) == 2
+    assert len(requests) == len(set(requests)) + 1
+    assert store.get(failed) is not None
+
+
+@pytest.mark.parametrize(
+    ("concurrency", "render_workers"), [(1, None), (3, None), (1, 2)]
+)
+def test_process_upserts_registries_into_consolidated_store(
+    transport_fetch_and_render_failures, tmp_path, concurrency, render_workers
+):
+    processor = Processor(
+        saver=RegistrySaver(output_format="consolidated"),
+        render_workers=render_workers,
+    )
+
+    for _ in range(2):
+        processor.process(
+            ["reg-001", "reg-002"],
+            str(tmp_path),
+            transport=transport_fetch_and_render_failures,
+            concurrency=concurrency,
+        )
+
+    assert [p.name for p in tmp_path.glob("*.sqlite")] == ["registries.sqlite"]
+    store = ConsolidatedStore(tmp_path / "registries.sqlite")
+    counts = store.query(
+        "SELECT r.title, COUNT(e.entry_id) AS n FROM registries r "
+        "JOIN entries e USING (registry_id) GROUP BY r.title ORDER BY r.title"
+    )
+    assert counts["title"].tolist() == ["Euro Trip", "Test Trip"]
+    assert (counts["n"] > 0).all()
+    assert counts["n"].sum() == len(store.query("SELECT * FROM entries"))
@@ -0,0 +1,44 @@
+from tricount_extractor.manifest import MANIFEST_FILENAME, Fingerprint, RenderManifest
+
+
+def _fingerprint(path: str, content_hash: str = "abc") -> Fingerprint:
+    return Fingerprint(
+        updated="2024-01-01T00:00:00",
+        content_hash=content_hash,
+        output_format="xlsx",
+        path=path,
+    )
+
+
+def test_manifest_round_trip(tmp_path):
+    output = tmp_path / "trip_1.xlsx"
+    output.touch()
+    fingerprint = _fingerprint(str(output))
+    manifest = RenderManifest.in_folder(tmp_path)
+    manifest.record("reg-001", fingerprint)
+    manifest.save()
+
+    reloaded = RenderManifest(tmp_path / MANIFEST_FILENAME)
+
+    assert reloaded.get("reg-001") == fingerprint
+    assert reloaded.get("reg-002") is None
+    assert fingerprint.matches(reloaded.get("reg-001"))
+    assert not _fingerprint(str(output), "def").matches(reloaded.get("reg-001"))
+    output.unlink()
+    assert not fingerprint.matches(reloaded.get("reg-001"))
+
+
+def test_unreadable_manifest_is_empty(tmp_path):
+    (tmp_path / MANIFEST_FILENAME).write_text('{"reg-001": {"updated": "x"}}')
+
+    manifest = RenderManifest.in_folder(tmp_path)
+
+    assert manifest.get("reg-001") is None
+
+
+def test_manifest_is_not_written_without_change(tmp_path):
+    manifest = RenderManifest.in_folder(tmp_path / "output")
+
+    manifest.save()
+
+    assert not (tmp_path / "output").exists()
@@ -0,0 +1,263 @@
+import dataclasses
+import datetime
+import json
+import pathlib
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from tricount_extractor.models.entry import Entry
+from tricount_extractor.models.lazy import LazyEntries
+from tricount_extractor.models.registry import (
+    EmptyRegistry,
+    Registry,
+    RegistryBuilder,
+)
+from tricount_extractor.models.stream import read_pagination
+
+RESPONSES = pathlib.Path(__file__).parent / "data/responses"
+
+
+@pytest.fixture
+def income_registry() -> Registry:
+    with open(RESPONSES / "registry_with_income.json") as f:
+        return Registry.from_json(json.load(f))
+
+
+def test_balance_timeline_accumulates_per_date(income_registry):
+    timeline = income_registry.to_balance_timeline()
+
+    expected = pd.DataFrame(
+        {"Alice": [20.0, 70.0, 55.0], "Bob": [-20.0, -70.0, -55.0]},
+        index=pd.DatetimeIndex(
+            ["2025-01-01 12:00:00", "2025-01-02 10:00:00", "2025-01-03 09:00:00"],
+            name="date",
+        ).as_unit("us"),
+    )
+    pd.testing.assert_frame_equal(timeline, expected, check_names=False)
+
+
+def test_balances_as_of_date(income_registry):
+    balances = income_registry.balances_as_of(datetime.datetime(2025, 1, 2, 23))
+
+    assert balances.set_index("member")["balance"].to_dict() == {
+        "Alice": 70.0,
+        "Bob": -70.0,
+    }
+
+
+def test_balances_as_of_date_before_first_entry(income_registry):
+    balances = income_registry.balances_as_of(datetime.datetime(2024, 1, 1))
+
+    assert balances["balance"].tolist() == [0.0, 0.0]
+
+
+def test_last_timeline_row_matches_balances_sheet(income_registry):
+    timeline = income_registry.to_balance_timeline()
+    sheet = income_registry.to_dataframe()["balances"]
+
+    assert timeline.iloc[-1].to_dict() == sheet.set_index("member")["balance"].to_dict()
+
+
+def test_to_dataframe_column_dtypes(income_registry):
+    dfs = income_registry.to_dataframe()
+
+    entries = dfs["entries"]
+    assert entries["entry_id"].dtype == "int64"
+    assert entries["date"].dtype == "datetime64[us]"
+    assert entries["amount"].dtype == "float64"
+    assert entries["is_reimbursement"].dtype == "bool"
+    for column in ["currency", "original_currency", "payer", "category"]:
+        assert isinstance(entries[column].dtype, pd.CategoricalDtype), column
+    allocations = dfs["allocations"]
+    assert allocations["entry_id"].dtype == "int64"
+    assert allocations["date"].dtype == "datetime64[us]"
+    assert allocations["share"].dtype == "float64"
+    assert isinstance(allocations["participant"].dtype, pd.CategoricalDtype)
+    assert dfs["balances"]["balance"].dtype == "float64"
+
+
+def test_aware_dates_are_taken_in_utc():
+    data = _load_response(RESPONSES / "basic_registries.json")
+    entries = data["Response"][0]["Registry"]["all_registry_entry"]
+    entries[0]["RegistryEntry"]["date"] = "2025-01-01T12:00:00+02:00"
+
+    dfs = Registry.from_json(data).to_dataframe()
+
+    expected = pd.Timestamp("2025-01-01 10:00:00")
+    assert dfs["entries"]["date"].tolist() == [expected]
+    assert set(dfs["allocations"]["date"]) == {expected}
+
+
+def test_attachments_sheet_dtypes():
+    data = _load_response(RESPONSES / "registry_with_multiple_attachments.json")
+
+    attachments = Registry.from_json(data).to_dataframe()["attachments"]
+
+    assert attachments["entry_id"].dtype == "int64"
+    assert len(attachments) > 1
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_registry_without_entry_raises_empty_registry(lazy):
+    data = _load_response(RESPONSES / "basic_registries.json")
+    data["Response"][0]["Registry"]["all_registry_entry"] = []
+
+    registry = Registry.from_json(data, lazy=lazy)
+
+    with pytest.raises(EmptyRegistry, match=str(registry.id)):
+        registry.to_dataframe()
+
+
+def _iter_chunks(content: bytes, size: int):
+    return (content[i : i + size] for i in range(0, len(content), size))
+
+
+@pytest.mark.parametrize("path", sorted(RESPONSES.glob("*.json")), ids=lambda p: p.stem)
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_add_page_stream_matches_from_json(path, chunk_size):
+    content = path.read_bytes()
+    builder = RegistryBuilder()
+
+    page = builder.add_page_stream(_iter_chunks(content, chunk_size))
+
+    assert builder.build() == Registry.from_json(json.loads(content))
+    assert page["Response"][0]["Registry"]["all_registry_entry"] == []
+    assert page["Pagination"] == json.loads(content)["Pagination"]
+
+
+def test_add_page_stream_appends_the_next_pages():
+    content = (RESPONSES / "registry_with_income.json").read_bytes()
+    expected = Registry.from_json(json.loads(content))
+    builder = RegistryBuilder()
+
+    builder.add_page_stream([content])
+    builder.add_page_stream([content])
+
+    assert builder.build().entries == expected.entries * 2
+
+
+def test_add_page_stream_rejects_a_truncated_body():
+    content = (RESPONSES / "registry_with_income.json").read_bytes()
+
+    with pytest.raises(ValueError):
+        RegistryBuilder().add_page_stream([content[:-10]])
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"Response": [], "Pagination": {"older_url": "/page/2"}}\n',
+        b'{"Pagination": {"older_url": "/page/2"}, "Response": ["Pagination"]}',
+        b'{"Response": [{"Pagination": {}}], "Pagination": {"older_url": "/page/2"}}',
+    ],
+    ids=["last_key", "first_key", "nested_key"],
+)
+def test_read_pagination_of_a_raw_body(body):
+    assert read_pagination(body) == {"older_url": "/page/2"}
+
+
+def test_entries_share_member_and_currency_strings(income_registry):
+    members = income_registry.members
+    entries = income_registry.entries
+
+    for entry in entries:
+        payer = next(m for m in members if m.uuid == entry.payer_uuid)
+        assert entry.payer_name is payer.display_name
+        assert entry.amount.currency is entries[0].amount.currency
+        for allocation in entry.allocations:
+            assert allocation.amount.currency is entries[0].amount.currency
+            assert 0 <= allocation.member_index < len(members)
+    assert not hasattr(entries[0], "__dict__")
+
+
+def _load_response(path: pathlib.Path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("path", sorted(RESPONSES.glob("*.json")), ids=lambda p: p.stem)
+def test_lazy_registry_matches_eager_registry(path):
+    data = _load_response(path)
+
+    lazy = Registry.from_json(data, lazy=True)
+    eager = Registry.from_json(data)
+
+    assert isinstance(lazy.entries, LazyEntries)
+    assert lazy == eager
+    assert list(lazy.entries) == eager.entries
+
+
+def test_lazy_registry_metadata_parses_no_entry():
+    data = _load_response(RESPONSES / "registry_with_multiple_attachments.json")
+
+    with patch.object(Entry, "from_json", side_effect=AssertionError):
+        registry = Registry.from_json(data, lazy=True)
+        entries = registry.entries[1:]
+
+    assert registry.title == Registry.from_json(data).title
+    assert isinstance(entries, LazyEntries)
+    assert len(entries) == len(registry.entries) - 1
+
+
+def test_lazy_registry_to_dataframe_matches_eager_registry(income_registry):
+    data = _load_response(RESPONSES / "registry_with_income.json")
+
+    lazy_dfs = Registry.from_json(data, lazy=True).to_dataframe()
+
+    for name, df in income_registry.to_dataframe().items():
+        pd.testing.assert_frame_equal(lazy_dfs[name], df)
+
+
+@pytest.mark.parametrize(
+    "name", [f.name for f in dataclasses.fields(Entry)], ids=lambda name: name
+)
+def test_lazy_entries_field_matches_entry_attribute(income_registry, name):
+    data = _load_response(RESPONSES / "registry_with_income.json")
+
+    values = Registry.from_json(data, lazy=True).entries.field(name)
+
+    assert values == [getattr(e, name) for e in income_registry.entries]
+
+
+def test_lazy_entries_where_selects_on_one_field(income_registry):
+    data = _load_response(RESPONSES / "registry_with_income.json")
+    since = datetime.datetime(2025, 1, 2)
+
+    entries = Registry.from_json(data, lazy=True).entries.where(
+        "date", lambda date: date >= since
+    )
+
+    assert entries == [e for e in income_registry.entries if e.date >= since]
+
+
+def test_lazy_entries_unknown_field_raises():
+    data = _load_response(RESPONSES / "registry_with_income.json")
+
+    with pytest.raises(AttributeError):
+        Registry.from_json(data, lazy=True).entries.field("missing")
+
+
+def test_lazy_registry_resolves_members_only_met_in_entries():
+    data = _load_response(RESPONSES / "basic_registries.json")
+    data["Response"][0]["Registry"]["memberships"].pop()
+
+    lazy = Registry.from_json(data, lazy=True)
+    eager = Registry.from_json(data)
+
+    assert lazy.members == eager.members
+    for name, df in eager.to_dataframe().items():
+        pd.testing.assert_frame_equal(lazy.to_dataframe()[name], df)
+
+
+def test_builder_joins_lazy_and_streamed_pages():
+    content = (RESPONSES / "registry_with_income.json").read_bytes()
+    expected = Registry.from_json(json.loads(content))
+    builder = RegistryBuilder(lazy=True)
+
+    builder.add_page(json.loads(content))
+    builder.add_page_stream([content])
+    builder.add_page(json.loads(content))
+
+    assert list(builder.build().entries) == expected.entries * 3
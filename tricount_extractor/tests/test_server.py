@@ -0,0 +1,169 @@
+import copy
+import io
+import json
+import pathlib
+import threading
+
+import httpx
+import pandas as pd
+import pytest
+
+from tricount_extractor.client.client import TricountClient
+from tricount_extractor.models.registry import Registry
+from tricount_extractor.server import RegistryCache, RegistryServer, RegistryService
+
+RESPONSES_DIR = pathlib.Path(__file__).parent / "data" / "responses"
+AUTH_PAYLOAD = {
+    "Response": [
+        {"Token": {"token": "tok"}},
+        {"UserPerson": {"id": "uid"}},
+    ]
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def basic_registry_data() -> dict:
+    with open(RESPONSES_DIR / "basic_registries.json") as f:
+        return json.load(f)
+
+
+def _registry(data: dict, updated: str | None = None) -> Registry:
+    data = copy.deepcopy(data)
+    if updated is not None:
+        data["Response"][0]["Registry"]["updated"] = updated
+    return Registry.from_json(data)
+
+
+def test_cache_evicts_least_recently_used(basic_registry_data):
+    cache = RegistryCache(max_entries=2)
+    registry = _registry(basic_registry_data)
+    cache.put("a", registry)
+    cache.put("b", registry)
+
+    assert cache.get("a") is not None
+    cache.put("c", registry)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_cache_expires_and_keeps_tables_of_same_update(basic_registry_data):
+    clock = FakeClock()
+    cache = RegistryCache(ttl=10.0, clock=clock)
+    cached = cache.put("a", _registry(basic_registry_data))
+    members = cached.encode("members", "json")
+
+    clock.now = 11.0
+    assert cache.get("a") is None
+    assert cache.put("a", _registry(basic_registry_data)) is cached
+    assert cache.get("a").encode("members", "json") is members
+
+    updated = _registry(basic_registry_data, updated="2030-01-01T00:00:00")
+    assert cache.put("a", updated) is not cached
+
+
+def test_service_fetches_different_registries_in_parallel(basic_registry_data):
+    both_requested = threading.Barrier(2, timeout=5)
+    requested = []
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return httpx.Response(200, json=AUTH_PAYLOAD)
+        requested.append(request.url.params["public_identifier_token"])
+        both_requested.wait()
+        return httpx.Response(200, json=basic_registry_data)
+
+    with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        service = RegistryService(client)
+        threads = [
+            threading.Thread(target=service.registry, args=(registry_id,))
+            for registry_id in ("a", "a", "b")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert sorted(requested) == ["a", "b"]
+    assert not both_requested.broken
+
+
+@pytest.fixture
+def server(basic_registry_data):
+    requested = []
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return httpx.Response(200, json=AUTH_PAYLOAD)
+        registry_id = request.url.params["public_identifier_token"]
+        requested.append(registry_id)
+        if registry_id == "missing":
+            return httpx.Response(404, json={"error": "Not found"})
+        return httpx.Response(200, json=basic_registry_data)
+
+    with TricountClient(transport=httpx.MockTransport(handler)) as client:
+        server = RegistryServer(RegistryService(client), quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address[:2]
+        try:
+            yield f"http://{host}:{port}", requested
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_server_answers_tables_from_cache(server, basic_registry_data):
+    url, requested = server
+    expected = _registry(basic_registry_data).to_dataframe()
+
+    members = httpx.get(f"{url}/registries/reg-001/members")
+    balances = httpx.get(f"{url}/registries/reg-001/balances")
+
+    assert members.status_code == 200
+    assert members.headers["Content-Type"] == "application/json"
+    assert [m["member_name"] for m in members.json()] == (
+        expected["members"]["member_name"].tolist()
+    )
+    assert len(balances.json()) == len(expected["balances"])
+    assert requested == ["reg-001"]
+
+
+def test_server_answers_parquet(server, basic_registry_data):
+    pytest.importorskip("pyarrow")
+    url, _ = server
+    expected = _registry(basic_registry_data).to_dataframe()["entries"]
+
+    response = httpx.get(f"{url}/registries/reg-001/entries?format=parquet")
+
+    assert response.status_code == 200
+    df = pd.read_parquet(io.BytesIO(response.content))
+    assert len(df) == len(expected)
+
+
+@pytest.mark.parametrize(
+    ("path", "status_code"),
+    [
+        ("/registries/reg-001/unknown", 404),
+        ("/registries/reg-001/members?format=xml", 400),
+        ("/registries/missing/members", 404),
+        ("/other", 404),
+    ],
+)
+def test_server_reports_errors(server, path, status_code):
+    url, _ = server
+
+    response = httpx.get(f"{url}{path}")
+
+    assert response.status_code == status_code
+    assert "error" in response.json()
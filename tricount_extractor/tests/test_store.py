@@ -0,0 +1,125 @@
+import copy
+import json
+import pathlib
+import sqlite3
+import threading
+
+import pytest
+
+from tricount_extractor.models.registry import Registry
+from tricount_extractor.store import ConsolidatedStore
+
+RESPONSES_DIR = pathlib.Path(__file__).parent / "data" / "responses"
+
+
+def _load(name: str) -> dict:
+    with open(RESPONSES_DIR / name) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def store(tmp_path) -> ConsolidatedStore:
+    store = ConsolidatedStore(tmp_path / "registries.sqlite")
+    store.create()
+    return store
+
+
+def _upsert(store: ConsolidatedStore, data: dict) -> Registry:
+    registry = Registry.from_json(data)
+    store.upsert(registry, registry.to_dataframe(member_uuids=True))
+    return registry
+
+
+def test_upsert_replaces_the_rows_of_one_registry(store):
+    basic = _load("basic_registries.json")
+    first = _upsert(store, basic)
+    second = _upsert(store, _load("registries_with_reimboursement.json"))
+    edited = copy.deepcopy(basic)
+    entries = edited["Response"][0]["Registry"]["all_registry_entry"]
+    entries[0]["RegistryEntry"]["description"] = "Edited"
+    _upsert(store, edited)
+
+    counts = store.query(
+        "SELECT registry_id, COUNT(*) AS n FROM entries GROUP BY registry_id"
+    )
+    assert dict(zip(counts["registry_id"], counts["n"])) == {
+        first.id: len(first.entries),
+        second.id: len(second.entries),
+    }
+    descriptions = store.query(
+        "SELECT description FROM entries WHERE registry_id = ?", (first.id,)
+    )
+    assert descriptions["description"].tolist() == ["Edited"]
+    registries = store.query("SELECT registry_id, title FROM registries")
+    assert sorted(registries["title"]) == ["Euro Trip", "Test Trip"]
+
+
+def test_allocations_carry_member_uuid_and_category(store):
+    registry = _upsert(store, _load("registries_with_reimboursement.json"))
+    allocations = registry.to_dataframe(member_uuids=True)["allocations"]
+    members = {m.display_name: m.uuid for m in registry.members}
+
+    stored = store.query(
+        "SELECT participant, member_uuid, category, date FROM allocations"
+    )
+
+    assert len(stored) == len(allocations)
+    assert stored["member_uuid"].tolist() == [members[p] for p in stored["participant"]]
+    assert stored["category"].notna().all()
+    assert stored["date"].str.match(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$").all()
+
+
+def test_cross_registry_aggregates_use_indexes(store):
+    _upsert(store, _load("basic_registries.json"))
+    _upsert(store, _load("registries_with_reimboursement.json"))
+
+    spend = store.query(
+        "SELECT member_uuid, SUM(share) AS spend FROM allocations "
+        "WHERE category = ? AND date >= ? GROUP BY member_uuid",
+        ("UNCATEGORIZED", "2000-01-01"),
+    )
+    plan = store.query(
+        "EXPLAIN QUERY PLAN SELECT SUM(share) FROM allocations "
+        "WHERE category = ? AND date >= ?",
+        ("FOOD", "2024-01-01"),
+    )
+
+    assert "allocations_category_date" in " ".join(plan["detail"])
+    assert spend["member_uuid"].notna().all()
+
+
+def test_members_sharing_a_name_keep_their_uuid(store):
+    data = _load("basic_registries.json")
+    memberships = data["Response"][0]["Registry"]["memberships"]
+    memberships[1]["RegistryMembershipNonUser"]["alias"]["display_name"] = "Alice"
+    _upsert(store, data)
+
+    payers = store.query("SELECT payer_uuid FROM entries")
+    members = store.query(
+        "SELECT participant, member_uuid FROM allocations ORDER BY member_uuid"
+    )
+    balances = store.query("SELECT member_uuid, balance FROM balances")
+
+    assert payers["payer_uuid"].tolist() == ["user-a"]
+    assert members["participant"].tolist() == ["Alice", "Alice"]
+    assert members["member_uuid"].tolist() == ["user-a", "user-b"]
+    assert dict(zip(balances["member_uuid"], balances["balance"])) == {
+        "user-a": 10.0,
+        "user-b": -10.0,
+    }
+
+
+def test_upsert_waits_for_another_writer(store):
+    data = _load("basic_registries.json")
+    writer = sqlite3.connect(store.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    upsert = threading.Thread(target=_upsert, args=(store, data))
+    upsert.start()
+    upsert.join(timeout=0.2)
+    assert upsert.is_alive()
+
+    writer.execute("COMMIT")
+    writer.close()
+    upsert.join()
+
+    assert len(store.query("SELECT * FROM registries")) == 1
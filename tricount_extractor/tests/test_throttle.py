@@ -0,0 +1,164 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from tricount_extractor.client.async_client import AsyncTricountClient
+from tricount_extractor.client.client import TricountClient
+from tricount_extractor.client.retry import RetryPolicy
+from tricount_extractor.client.throttle import AimdController, Throttle, TokenBucket
+from tricount_extractor.instrumentation import MetricsRecorder
+
+AUTH_PAYLOAD = {
+    "Response": [
+        {"Token": {"token": "tok"}},
+        {"UserPerson": {"id": "uid"}},
+    ]
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.com")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_token_bucket_spaces_out_requests_after_a_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(2.0, burst=2.0, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+    clock.now = 2.0
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(0.0)
+
+
+def test_aimd_controller_grows_additively_and_halves_once_per_cooldown():
+    clock = FakeClock()
+    controller = AimdController(
+        initial=2.0, minimum=1.0, maximum=4.0, cooldown=1.0, clock=clock
+    )
+
+    controller.on_healthy()
+    controller.on_healthy()
+    assert controller.value == pytest.approx(2.0 + 1 / 2 + 1 / 2.5)
+
+    controller.on_congestion()
+    controller.on_congestion()
+    assert controller.value == pytest.approx((2.0 + 1 / 2 + 1 / 2.5) / 2)
+
+    clock.now = 1.0
+    for _ in range(3):
+        controller.on_congestion()
+        clock.now += 1.0
+    assert controller.value == 1.0
+
+    for _ in range(100):
+        controller.on_healthy()
+    assert controller.value == 4.0
+
+
+def test_throttle_backs_off_on_throttling_and_timeouts_only():
+    clock = FakeClock()
+    throttle = Throttle(max_concurrency=8, max_rate=10.0, clock=clock)
+    assert throttle.concurrency_limit == 8
+    assert throttle.rate_limit == 10.0
+
+    assert not throttle.record(0.1, _status_error(404))
+    assert throttle.concurrency_limit == 8
+    assert throttle.record(0.1, _status_error(429))
+    assert (throttle.concurrency_limit, throttle.rate_limit) == (4, 5.0)
+    clock.now = 2.0
+    assert throttle.record(30.0, httpx.ReadTimeout("slow"))
+    assert (throttle.concurrency_limit, throttle.rate_limit) == (2, 2.5)
+
+    # slow successes hold the limits
+    throttle.record(10.0)
+    assert throttle.concurrency_limit == 2
+    for _ in range(20):
+        throttle.record(0.1)
+    assert throttle.concurrency_limit > 2
+    assert throttle.rate_limit > 2.5
+
+
+def test_throttle_without_maximum_sets_no_limit():
+    throttle = Throttle()
+
+    assert throttle.record(0.1, _status_error(503))
+    assert (throttle.concurrency_limit, throttle.rate_limit) == (None, None)
+    assert throttle.reserve() == 0.0
+
+
+def test_client_lowers_rate_when_throttled_and_exports_limits():
+    responses = [httpx.Response(429), httpx.Response(200, json={"Response": []})]
+
+    def handler(request):
+        if "session-registry-installation" in str(request.url):
+            return httpx.Response(200, json=AUTH_PAYLOAD)
+        return responses.pop(0)
+
+    metrics = MetricsRecorder()
+    with patch("tricount_extractor.client.client.time.sleep"):
+        with TricountClient(
+            transport=httpx.MockTransport(handler),
+            max_rate=4.0,
+            retry_policy=RetryPolicy(jitter=0.0),
+            instrumentation=metrics,
+        ) as client:
+            with metrics.registry("reg-001"):
+                client.get_registry("reg-001")
+
+    summary = metrics.to_json()
+    assert summary["registries"]["reg-001"]["counters"]["throttled"] == 1
+    # halved by the 429, then one healthy response
+    assert summary["gauges"]["rate_limit"] == pytest.approx(2.0 + 1 / 2)
+    # the sync client sends one request at a time, it has no concurrency limit
+    assert "concurrency_limit" not in summary["gauges"]
+    assert "tricount_rate_limit 2.5" in metrics.to_prometheus().splitlines()
+
+
+def test_async_client_adapts_in_flight_requests():
+    state = {"in_flight": 0, "peaks": [], "throttle": True}
+
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if "session-registry-installation" in str(request.url):
+                return httpx.Response(200, json=AUTH_PAYLOAD)
+            state["in_flight"] += 1
+            state["peaks"].append(state["in_flight"])
+            await asyncio.sleep(0)
+            state["in_flight"] -= 1
+            if state["throttle"]:
+                state["throttle"] = False
+                return httpx.Response(429)
+            return httpx.Response(200, json={"Response": []})
+
+    async def run():
+        async with AsyncTricountClient(
+            transport=Transport(),
+            concurrency=8,
+            retry_policy=RetryPolicy(jitter=0.0),
+        ) as client:
+            assert client.throttle.concurrency_limit == 8
+            await asyncio.gather(*(client.get_registry(f"reg-{i}") for i in range(40)))
+            return client.throttle.concurrency_limit
+
+    with patch("tricount_extractor.client.async_client.asyncio.sleep", new=AsyncMock()):
+        limit = asyncio.run(run())
+
+    assert max(state["peaks"]) <= 8
+    assert limit == 8
@@ -0,0 +1,77 @@
+import pytest
+
+from tricount_extractor.watch import PollScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _scheduler(registry_ids, clock: FakeClock, **kwargs) -> PollScheduler:
+    return PollScheduler(
+        registry_ids, interval=8.0, clock=clock, sleep=clock.sleep, **kwargs
+    )
+
+
+def test_first_polls_are_spread_over_the_interval():
+    clock = FakeClock()
+    scheduler = _scheduler(["a", "b", "a", "c", "d"], clock)
+
+    polled = []
+    for _ in range(4):
+        registry_id = scheduler.next()
+        polled.append((registry_id, clock.now))
+        scheduler.record(registry_id, changed=True)
+
+    assert polled == [("a", 0.0), ("b", 2.0), ("c", 4.0), ("d", 6.0)]
+    # the first poll only sets the baseline
+    assert scheduler.next() == "a"
+    assert clock.now == 8.0
+
+
+def test_changed_registries_are_polled_more_often():
+    clock = FakeClock()
+    scheduler = _scheduler(["a"], clock)
+    scheduler.record(scheduler.next(), changed=False)
+
+    waits = []
+    for changed in [True, False, False, False]:
+        scheduler.record(scheduler.next(), changed=changed)
+        waits.append(scheduler.due_at("a") - clock.now)
+
+    assert waits == [2.0, 4.0, 8.0, 8.0]
+    assert clock.sleeps == [8.0, 2.0, 4.0, 8.0]
+
+
+def test_most_recently_changed_registry_goes_first():
+    clock = FakeClock()
+    scheduler = _scheduler(["a", "b", "c"], clock, active_interval=8.0)
+    for _ in range(3):
+        scheduler.record(scheduler.next(), changed=False)
+    clock.now = 10.0
+    scheduler.record("b", changed=True)
+    clock.now = 11.0
+    scheduler.record("c", changed=True)
+
+    clock.now = 30.0
+    assert scheduler.next() == "c"
+    scheduler.record("c", changed=False)
+    assert scheduler.next() == "b"
+    scheduler.record("b", changed=False)
+    assert scheduler.next() == "a"
+
+
+def test_scheduler_needs_registries():
+    with pytest.raises(ValueError):
+        PollScheduler([], interval=60.0)
+    with pytest.raises(ValueError):
+        PollScheduler(["a"], interval=0.0)
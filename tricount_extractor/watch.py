@@ -0,0 +1,83 @@
+import math
+import time
+from collections.abc import Callable, Iterable
+
+
+class PollScheduler:
+    """
+    When to poll each registry of a watched fleet.
+
+    The first polls are spread evenly over `interval`, in the order given, so
+    the registries are not all fetched at once. A registry found changed is
+    polled again after `active_interval`, each poll without change doubles
+    its wait up to `interval`. When several registries are due, the most
+    recently changed one goes first.
+    """
+
+    def __init__(
+        self,
+        registry_ids: Iterable[str],
+        *,
+        interval: float,
+        active_interval: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if interval <= 0:
+            msg = f"interval must be positive, got {interval}"
+            raise ValueError(msg)
+        ids = list(dict.fromkeys(registry_ids))
+        if len(ids) == 0:
+            msg = "no registry to watch"
+            raise ValueError(msg)
+        self._interval = interval
+        self._active_interval = min(
+            active_interval if active_interval is not None else interval / 4,
+            interval,
+        )
+        self._clock = clock
+        self._sleep = sleep
+
+        now = clock()
+        step = interval / len(ids)
+        self._due = {registry_id: now + i * step for i, registry_id in enumerate(ids)}
+        self._wait = dict.fromkeys(ids, interval)
+        self._changed_at: dict[str, float] = {}
+        self._polled: set[str] = set()
+
+    def due_at(self, registry_id: str) -> float:
+        return self._due[registry_id]
+
+    def next(self) -> str:
+        """Wait until a registry is due and return it."""
+        now = self._clock()
+        earliest = min(self._due.values())
+        if earliest > now:
+            self._sleep(earliest - now)
+            now = max(self._clock(), earliest)
+        due = [registry_id for registry_id, at in self._due.items() if at <= now]
+        return max(
+            due,
+            key=lambda registry_id: (
+                self._changed_at.get(registry_id, -math.inf),
+                -self._due[registry_id],
+            ),
+        )
+
+    def record(self, registry_id: str, *, changed: bool) -> None:
+        """
+        Schedule the next poll of a registry after the outcome of a poll.
+
+        The first poll of a registry only sets the baseline, it never counts
+        as a change.
+        """
+        now = self._clock()
+        first_poll = registry_id not in self._polled
+        self._polled.add(registry_id)
+        if changed and not first_poll:
+            self._changed_at[registry_id] = now
+            wait = self._active_interval
+        else:
+            wait = min(2 * self._wait[registry_id], self._interval)
+        self._wait[registry_id] = wait
+        self._due[registry_id] = now + wait